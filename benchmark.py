@@ -0,0 +1,305 @@
+"""Offline throughput benchmark of the recognition pipeline, no camera needed.
+
+Feeds recorded video files and/or image directories through FacePipeline
+and FaceEngine, the same code path as the apps, and prints a JSON report:
+frames per second, per-stage latency percentiles, peak RSS and
+recognition counts. Several settings can be compared in one run; each
+one runs in its own process, so peak RSS and caches do not leak between
+them.
+
+    python benchmark.py entrada.mp4
+    python benchmark.py grabaciones/ fotos/ --strategy full downscale roi -o resultado.json
+
+Uses gallery.bin (and the cascade settings) of the current directory,
+like the apps. Face Mesh and MobileNetSSD run in their own workers in
+the apps and are not part of this path.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import subprocess
+import sys
+import time
+import cv2
+import numpy as np
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+IMAGE_EXTENSIONS = (".bmp", ".jpeg", ".jpg", ".png", ".tif", ".tiff", ".webp")
+STAGES = ("decode", "detect", "track", "identify", "pipeline")
+
+# Same recognition threshold as the apps
+CONFIDENCE_THRESHOLD = 65
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process, in MB"""
+    if resource is not None:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Bytes on macOS, kilobytes elsewhere
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    if sys.platform == "win32":
+        import ctypes
+        from ctypes import wintypes
+
+        class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+            _fields_ = [("cb", wintypes.DWORD), ("PageFaultCount", wintypes.DWORD),
+                        ("PeakWorkingSetSize", ctypes.c_size_t), ("WorkingSetSize", ctypes.c_size_t),
+                        ("QuotaPeakPagedPoolUsage", ctypes.c_size_t), ("QuotaPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaPeakNonPagedPoolUsage", ctypes.c_size_t),
+                        ("QuotaNonPagedPoolUsage", ctypes.c_size_t),
+                        ("PagefileUsage", ctypes.c_size_t), ("PeakPagefileUsage", ctypes.c_size_t)]
+
+        counters = PROCESS_MEMORY_COUNTERS()
+        counters.cb = ctypes.sizeof(counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return counters.PeakWorkingSetSize / (1024 * 1024)
+    return None
+
+
+def read_frames(path, fps=None):
+    """Yield (frame, seconds since the start of `path`) from a video or image directory"""
+    if os.path.isdir(path):
+        names = sorted(n for n in os.listdir(path) if n.lower().endswith(IMAGE_EXTENSIONS))
+        interval = 1.0 / (fps or 30.0)
+        for i, name in enumerate(names):
+            frame = cv2.imread(os.path.join(path, name))
+            if frame is not None:
+                yield frame, i * interval
+        return
+
+    cap = cv2.VideoCapture(path)
+    if not cap.isOpened():
+        raise ValueError(f"No se pudo abrir {path}")
+    interval = 1.0 / (fps or cap.get(cv2.CAP_PROP_FPS) or 30.0)
+    i = 0
+    try:
+        while True:
+            ok, frame = cap.read()
+            if not ok:
+                break
+            yield frame, i * interval
+            i += 1
+    finally:
+        cap.release()
+
+
+class StageTimer:
+    """Wall time per call of wrapped methods, in ms, grouped by stage"""
+
+    def __init__(self):
+        self.samples = {stage: [] for stage in STAGES}
+        self.enabled = True
+
+    def wrap(self, obj, method, stage):
+        original = getattr(obj, method)
+
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                self.add(stage, (time.perf_counter() - start) * 1000)
+
+        setattr(obj, method, timed)
+
+    def add(self, stage, ms):
+        if self.enabled:
+            self.samples[stage].append(ms)
+
+    def summary(self):
+        result = {}
+        for stage, samples in self.samples.items():
+            if not samples:
+                continue
+            values = np.array(samples)
+            p50, p95, p99 = np.percentile(values, [50, 95, 99])
+            result[stage] = {
+                "calls": len(values),
+                "mean_ms": round(float(values.mean()), 3),
+                "p50_ms": round(float(p50), 3),
+                "p95_ms": round(float(p95), 3),
+                "p99_ms": round(float(p99), 3),
+                "max_ms": round(float(values.max()), 3),
+            }
+        return result
+
+
+def run(inputs, settings, warmup=10, limit=None, fps=None):
+    """Replay `inputs` with one set of settings, returns the report dict"""
+    from face_engine import FaceEngine
+    from pipeline import FacePipeline
+
+    engine = FaceEngine(face_mesh=False, object_detection=False)
+    engine.detection_strategy = settings["strategy"]
+    engine.detection_scale = settings["scale"]
+    engine.scale_calibration = settings["calibration"]
+    pipeline = FacePipeline(engine, detect_interval=settings["detect_interval"])
+
+    timer = StageTimer()
+    timer.wrap(engine, "detect_faces", "detect")
+    timer.wrap(engine, "identify_batch", "identify")
+    timer.wrap(pipeline.tracker, "update", "track")
+    timer.wrap(pipeline.tracker, "predict", "track")
+
+    # Counters
+    frames = 0
+    face_frames = 0
+    faces_seen = 0
+    faces_identified = 0
+    tracks = set()
+    identified = {}  # track id -> employee id, first committed identity
+
+    identify = engine.identify_batch
+
+    def counted_identify(gray, boxes, *args):
+        nonlocal faces_identified
+        if timer.enabled:
+            faces_identified += len(boxes)
+        return identify(gray, boxes, *args)
+
+    engine.identify_batch = counted_identify
+
+    start_clock = time.time()
+    offset = 0.0
+    measured_time = 0.0
+    for path in inputs:
+        # Each recording is a different scene, tracks do not carry over
+        pipeline.reset()
+        source = read_frames(path, fps)
+        ts = 0.0
+        while limit is None or frames < limit:
+            # The first `warmup` frames load caches and are not measured
+            timer.enabled = frames >= warmup
+            started = time.perf_counter()
+            try:
+                frame, ts = next(source)
+            except StopIteration:
+                break
+            decoded = time.perf_counter()
+            # Replayed timestamps keep the tracker and voter intervals of
+            # the recording, however fast or slow the replay is
+            result = pipeline.process(frame, start_clock + offset + ts)
+            done = time.perf_counter()
+            frames += 1
+            if not timer.enabled:
+                continue
+
+            timer.add("decode", (decoded - started) * 1000)
+            timer.add("pipeline", (done - decoded) * 1000)
+            measured_time += done - started
+            if result["faces"]:
+                face_frames += 1
+                faces_seen += len(result["faces"])
+            for track_id, (employee_id, conf) in zip(result["track_ids"], result["identities"]):
+                tracks.add(track_id)
+                if employee_id is not None and conf < CONFIDENCE_THRESHOLD:
+                    identified.setdefault(track_id, employee_id)
+        source.close()
+        offset += ts + 1.0
+
+    measured = max(frames - warmup, 0)
+    peak = peak_rss_mb()
+    employees = {}
+    for employee_id in identified.values():
+        employees[str(employee_id)] = employees.get(str(employee_id), 0) + 1
+    return {
+        "settings": settings,
+        "frames": frames,
+        "measured_frames": measured,
+        "seconds": round(measured_time, 3),
+        "fps": round(measured / measured_time, 2) if measured_time else None,
+        "stages": timer.summary(),
+        "peak_rss_mb": round(peak, 1) if peak is not None else None,
+        "recognition": {
+            "frames_with_faces": face_frames,
+            "faces": faces_seen,
+            "faces_identified": faces_identified,
+            "tracks": len(tracks),
+            "identified_tracks": len(identified),
+            "employees": employees,
+        },
+        "scale_calibrator": engine.scale_calibrator.stats(),
+    }
+
+
+def _run_in_child(conn, inputs, settings, warmup, limit, fps):
+    try:
+        conn.send(run(inputs, settings, warmup, limit, fps))
+    except Exception as e:
+        conn.send({"settings": settings, "error": str(e)})
+    finally:
+        conn.close()
+
+
+def _commit():
+    """Current git commit, so reports of different versions can be told apart"""
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5)
+        return out.stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark del reconocimiento sobre videos o carpetas de imágenes")
+    parser.add_argument("inputs", nargs="+", help="archivos de video o carpetas de imágenes")
+    parser.add_argument("--strategy", nargs="+", default=["full"], choices=["full", "downscale", "roi"],
+                        help="estrategias de detección a comparar (FaceEngine.detection_strategy)")
+    parser.add_argument("--detect-interval", nargs="+", type=int, default=[5],
+                        help="cada cuántos cuadros corre el detector Haar (FacePipeline)")
+    parser.add_argument("--scale", type=float, default=0.5, help="detection_scale de las estrategias reducidas")
+    parser.add_argument("--no-calibration", action="store_true", help="desactiva ScaleCalibrator")
+    parser.add_argument("--fps", type=float, help="cuadros por segundo de la grabación (por defecto el del video, 30 en carpetas)")
+    parser.add_argument("--warmup", type=int, default=10, help="cuadros iniciales que no se miden")
+    parser.add_argument("--limit", type=int, help="máximo de cuadros por configuración")
+    parser.add_argument("-o", "--output", help="guarda el JSON en este archivo además de imprimirlo")
+    args = parser.parse_args(argv)
+
+    for path in args.inputs:
+        if not os.path.exists(path):
+            parser.error(f"no existe: {path}")
+
+    # Spawned processes start clean on every platform
+    context = multiprocessing.get_context("spawn")
+    runs = []
+    for strategy in args.strategy:
+        for interval in args.detect_interval:
+            settings = {"strategy": strategy, "detect_interval": interval, "scale": args.scale,
+                        "calibration": not args.no_calibration}
+            print(f"Midiendo {settings}...", file=sys.stderr)
+            receiver, sender = context.Pipe(duplex=False)
+            child = context.Process(target=_run_in_child,
+                                    args=(sender, args.inputs, settings, args.warmup, args.limit, args.fps))
+            child.start()
+            sender.close()
+            try:
+                runs.append(receiver.recv())
+            except EOFError:
+                runs.append({"settings": settings, "error": f"el proceso terminó con código {child.exitcode}"})
+            child.join()
+
+    report = {
+        "commit": _commit(),
+        "date": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "python": sys.version.split()[0],
+        "opencv": cv2.__version__,
+        "inputs": args.inputs,
+        "runs": runs,
+    }
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    print(text)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    return 1 if any("error" in r for r in runs) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
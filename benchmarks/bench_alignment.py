@@ -0,0 +1,128 @@
+"""Face alignment: recognition accuracy and cost per face, plain resize vs FaceAligner.
+
+Synthetic look-alike identities (a blurred noise texture shared at 80%
+plus their own, with dark eyes at the canonical positions) are enrolled with frontal shots and probed with
+±20° roll, 60-300 px faces, box jitter and noisy Face Mesh eye points,
+once with alignment off (plain resize of the box) and once on. The cost
+is align + equalize + LBP per face against LBP on the raw crop (the
+path before alignment), by face size. Galleries are written to a
+temporary directory.
+
+    python benchmarks/bench_alignment.py [identidades]
+"""
+import os
+import sys
+import tempfile
+import time
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from face_engine import FaceEngine
+
+TRAIN = 10
+PROBES = 10
+WIDTH, HEIGHT = 640, 480
+# Face Mesh eye corners (MESH_EYE_CORNERS) and their place on a 200 px face
+EYE_POINTS = ((33, (60, 76)), (133, (60, 76)), (362, (140, 76)), (263, (140, 76)))
+
+
+def texture(rng):
+    return cv2.GaussianBlur(rng.integers(0, 256, (200, 200)).astype(np.float32), (0, 0), 4)
+
+
+def identity(rng, common):
+    face = cv2.normalize(0.8 * common + 0.2 * texture(rng), None, 30, 220, cv2.NORM_MINMAX)
+    for x in (60, 140):
+        cv2.circle(face, (x, 76), 12, 20, -1)
+    return face.astype(np.uint8)
+
+
+def render(rng, face, angle, side):
+    """Gray frame with the face rotated and scaled, its jittered box and mesh points"""
+    frame = rng.integers(80, 120, (HEIGHT, WIDTH)).astype(np.uint8)
+    cx, cy = rng.uniform(side * 0.6, WIDTH - side * 0.6), rng.uniform(side * 0.6, HEIGHT - side * 0.6)
+    M = cv2.getRotationMatrix2D((100, 100), angle, side / 200.0)
+    M[:, 2] += (cx - 100, cy - 100)
+    warped = cv2.warpAffine(face, M, (WIDTH, HEIGHT), flags=cv2.INTER_LINEAR)
+    mask = cv2.warpAffine(np.full((200, 200), 255, np.uint8), M, (WIDTH, HEIGHT))
+    frame[mask > 0] = warped[mask > 0]
+    frame = np.clip(frame + rng.normal(0, 6, frame.shape), 0, 255).astype(np.uint8)
+    jitter = side * 0.05
+    box = (int(cx - side / 2 + rng.uniform(-jitter, jitter)),
+           int(cy - side / 2 + rng.uniform(-jitter, jitter)), int(side), int(side))
+    points = np.zeros((468, 2), np.float32)
+    for index, (x, y) in EYE_POINTS:
+        points[index] = M @ (x, y, 1) + rng.normal(0, 1.5, 2)
+    return frame, box, [points]
+
+
+def accuracy(faces, aligned):
+    rng = np.random.default_rng(2)
+    engine = FaceEngine(face_mesh=False, object_detection=False)
+    engine.alignment = aligned
+    for label, face in enumerate(faces, 1):
+        crops = []
+        for _ in range(TRAIN):
+            frame, box, points = render(rng, face, rng.uniform(-5, 5), rng.uniform(90, 200))
+            crops.append(engine.align_faces(frame, [box], points if aligned else None)[0].copy())
+        engine.train_model(crops, [label] * TRAIN, aligned=True)
+
+    hits, distances = 0, []
+    for label, face in enumerate(faces, 1):
+        for _ in range(PROBES):
+            frame, box, points = render(rng, face, rng.uniform(-20, 20), rng.uniform(60, 300))
+            found, distance = engine.identify_batch(frame, [box], points if aligned else None)[0]
+            hits += found == label
+            distances.append(distance)
+    return engine, hits / (len(faces) * PROBES), float(np.mean(distances))
+
+
+def cost(engine, face, side, repeat=20):
+    """ms per face: LBP on the raw crop, and align + equalize + LBP"""
+    frame, box, points = render(np.random.default_rng(3), face, 10, side)
+    x, y, w, h = box
+    crop = frame[y:y + h, x:x + w]
+    start = time.perf_counter()
+    for _ in range(repeat):
+        engine.lbp_histograms(engine.preprocess_face(crop)[None])
+    raw_ms = (time.perf_counter() - start) * 1000 / repeat
+    start = time.perf_counter()
+    for _ in range(repeat):
+        aligned = engine.aligner.align(frame, [box], points)
+        engine.lbp_histograms(engine.preprocess_face(aligned[0])[None])
+    aligned_ms = (time.perf_counter() - start) * 1000 / repeat
+    return raw_ms, aligned_ms
+
+
+def benchmark(identities=60):
+    rng = np.random.default_rng(1)
+    common = texture(rng)
+    faces = [identity(rng, common) for _ in range(identities)]
+    cwd = os.getcwd()
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {}
+        for aligned in (False, True):
+            # FaceEngine keeps gallery.bin and gallery.idx in the working directory
+            directory = os.path.join(tmp, "aligned" if aligned else "plain")
+            os.makedirs(directory)
+            os.chdir(directory)
+            try:
+                results[aligned] = accuracy(faces, aligned)
+            finally:
+                os.chdir(cwd)
+    engine = results[True][0]
+    return ([(aligned, acc, dist) for aligned, (_, acc, dist) in results.items()],
+            [(side, *cost(engine, faces[0], side)) for side in (60, 150, 300, 400)])
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 60
+    recognition, costs = benchmark(count)
+    print(f"{count} identidades, {TRAIN} muestras y {PROBES} pruebas por identidad")
+    for aligned, acc, dist in recognition:
+        print(f"  {'alineado' if aligned else 'sin alinear':12s} acierto {acc:.3f}  distancia media {dist:.1f}")
+    print("lado px  recorte ms  alineado ms")
+    for side, raw_ms, aligned_ms in costs:
+        print(f"{side:7d}  {raw_ms:10.2f}  {aligned_ms:11.2f}")
@@ -0,0 +1,67 @@
+"""ms per displayed frame and peak NumPy allocation: old main_qt path vs FrameView.
+
+Needs a QApplication; on a server run it offscreen:
+
+    QT_QPA_PLATFORM=offscreen python benchmarks/bench_frame_view.py
+"""
+import os
+import sys
+import time
+import tracemalloc
+import cv2
+import numpy as np
+from PyQt6.QtCore import Qt
+from PyQt6.QtGui import QImage, QPixmap
+from PyQt6.QtWidgets import QApplication, QLabel
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from frame_view import FrameView
+
+
+def convert_cv_qt(cv_img, width, height):
+    """Previous display path of main_qt.py"""
+    rgb_image = cv2.cvtColor(cv_img, cv2.COLOR_BGR2RGB)
+    h, w, ch = rgb_image.shape
+    convert_to_Qt_format = QImage(rgb_image.data, w, h, ch * w, QImage.Format.Format_RGB888)
+    p = convert_to_Qt_format.scaled(width, height, Qt.AspectRatioMode.KeepAspectRatio)
+    return QPixmap.fromImage(p)
+
+
+def benchmark(frames=300, frame_size=(640, 480), label_sizes=((640, 480), (960, 720))):
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    rng = np.random.default_rng(0)
+    source = rng.integers(0, 256, (frame_size[1], frame_size[0], 3), np.uint8)
+    results = []
+    for width, height in label_sizes:
+        label = QLabel()
+        label.resize(width, height)
+        view = FrameView(label)
+        paths = {
+            "convert_cv_qt": lambda f: label.setPixmap(convert_cv_qt(f, width, height)),
+            "FrameView": view.show,
+        }
+        for name, show in paths.items():
+            show(source)  # warm up, FrameView builds its buffer here
+            tracemalloc.start()
+            start = time.perf_counter()
+            for _ in range(frames):
+                show(source)
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            results.append({
+                "label": f"{width}x{height}",
+                "path": name,
+                "ms_per_frame": elapsed * 1000 / frames,
+                "numpy_peak_kb": peak / 1024,
+            })
+        label.deleteLater()
+    app.processEvents()
+    return results
+
+
+if __name__ == "__main__":
+    print("etiqueta  ruta           ms/cuadro  pico NumPy KB")
+    for row in benchmark():
+        print(f"{row['label']:9s} {row['path']:14s} {row['ms_per_frame']:9.3f}  {row['numpy_peak_kb']:13.1f}")
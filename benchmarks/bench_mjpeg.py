@@ -0,0 +1,82 @@
+"""Preview cost per frame: base64 in the page (old Flet path) vs MJPEGServer.
+
+Reports CPU ms per frame of this process (the MJPEG client runs in
+another one) and bytes per frame. The base64 figure leaves out the Flet
+diff and websocket send of the old path, which come on top of it.
+
+    python benchmarks/bench_mjpeg.py [segundos]
+"""
+import base64
+import multiprocessing
+import os
+import socket
+import sys
+import time
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mjpeg_server import BOUNDARY, MJPEGServer
+
+
+def read_stream(url, results):
+    """Minimal MJPEG client (own process), counts frames and bytes until the server stops"""
+    host, port = url.split("/")[2].split(":")
+    frames = size = 0
+    marker = b"--" + BOUNDARY.encode("ascii")
+    with socket.create_connection((host, int(port))) as sock:
+        sock.sendall(b"GET /stream.mjpg HTTP/1.0\r\n\r\n")
+        while True:
+            data = sock.recv(1 << 16)
+            if not data:
+                break
+            size += len(data)
+            frames += data.count(marker)
+    results.put((frames, size))
+
+
+def benchmark(seconds=5.0, fps=30, quality=70):
+    rng = np.random.default_rng(0)
+    # Smooth synthetic frame with noise, compresses like a camera image
+    base = cv2.resize(rng.integers(0, 256, (48, 64, 3), np.uint8), (640, 480))
+    frames = [cv2.add(base, rng.integers(0, 20, base.shape, np.uint8)) for _ in range(8)]
+    results = {}
+
+    def run(publish):
+        count, sent = 0, 0
+        cpu, start = time.process_time(), time.monotonic()
+        while time.monotonic() - start < seconds:
+            sent += publish(frames[count % len(frames)])
+            count += 1
+            time.sleep(max(0.0, start + count / fps - time.monotonic()))
+        elapsed = time.monotonic() - start
+        return count, elapsed, (time.process_time() - cpu) * 1000, sent
+
+    def base64_path(frame):
+        _, buffer = cv2.imencode(".jpg", frame, [int(cv2.IMWRITE_JPEG_QUALITY), quality])
+        return len(base64.b64encode(buffer).decode("utf-8"))
+
+    count, elapsed, cpu_ms, sent = run(base64_path)
+    results["base64"] = {"fps": count / elapsed, "cpu_ms_per_frame": cpu_ms / count,
+                         "bytes_per_frame": sent / count}
+
+    server = MJPEGServer(quality=quality).start()
+    received = multiprocessing.Queue()
+    client = multiprocessing.Process(target=read_stream, args=(server.stream_url, received))
+    client.start()
+    time.sleep(0.5)
+    count, elapsed, cpu_ms, _ = run(lambda frame: server.publish(frame) * 0)
+    server.stop()
+    frames, size = received.get()
+    client.join()
+    results["mjpeg"] = {"fps": frames / elapsed, "cpu_ms_per_frame": cpu_ms / count,
+                        "bytes_per_frame": size / max(frames, 1)}
+    return results
+
+
+if __name__ == "__main__":
+    seconds = float(sys.argv[1]) if len(sys.argv) > 1 else 5.0
+    print("ruta     fps    CPU ms/cuadro  bytes/cuadro")
+    for name, row in benchmark(seconds).items():
+        print(f"{name:7s} {row['fps']:5.1f}  {row['cpu_ms_per_frame']:13.2f}  {row['bytes_per_frame']:12.0f}")
@@ -0,0 +1,40 @@
+"""ms per frame of the face overlay for 1..8 faces: original vs OverlayRenderer.
+
+    python benchmarks/bench_overlay.py
+"""
+import os
+import sys
+import time
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [ROOT, os.path.join(ROOT, "tests")]
+
+from overlay import OverlayRenderer
+from test_overlay import reference_draw_face
+
+
+def benchmark(max_faces=8, frames=200, width=640, height=480):
+    rng = np.random.default_rng(1)
+    frame = rng.integers(0, 256, (height, width, 3), np.uint8)
+    renderer = OverlayRenderer()
+    results = []
+    for count in range(1, max_faces + 1):
+        faces = [(40 + 70 * i, 60 + 15 * i, 120, 140, (0, 255, 0), "Empleado") for i in range(count)]
+        timings = []
+        for draw in (reference_draw_face, renderer.draw_face):
+            img = frame.copy()
+            start = time.perf_counter()
+            for n in range(frames):
+                for x, y, w, h, color, label in faces:
+                    # Small jitter, like tracked boxes
+                    draw(img, x + n % 3, y, w, h, color, label, n / 30.0)
+            timings.append((time.perf_counter() - start) * 1000 / frames)
+        results.append((count, *timings))
+    return results
+
+
+if __name__ == "__main__":
+    print("rostros  original ms  OverlayRenderer ms")
+    for count, reference_ms, renderer_ms in benchmark():
+        print(f"{count:8d}  {reference_ms:11.3f}  {renderer_ms:18.3f}")
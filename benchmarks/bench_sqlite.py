@@ -0,0 +1,110 @@
+"""SQLite calls/s: a new connection per call (original DatabaseManager) vs persistent tuned connections.
+
+Both databases have the current schema, 200 employees and the same
+attendance rows; the per-call one keeps the default rollback journal and
+pragmas, the other is used through DatabaseManager.get_connection() (one
+connection per thread, WAL and PRAGMAS). The statements are the same on
+both sides, so only the connection handling differs.
+
+    python benchmarks/bench_sqlite.py [marcas]
+"""
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database_manager import DatabaseManager
+
+EMPLOYEES = 200
+THREADS = 4
+
+NAME = "SELECT name FROM employees WHERE id = ?"
+LAST = '''
+    SELECT action_type, timestamp FROM attendance
+    WHERE employee_id = ? ORDER BY timestamp DESC LIMIT 1
+'''
+INSERT = "INSERT INTO attendance (employee_id, action_type, status) VALUES (?, 'IN', 'ON_TIME')"
+
+
+def populate(path, punches):
+    db = DatabaseManager(path)
+    conn = db.get_connection()
+    rng = random.Random(0)
+    conn.executemany("INSERT INTO employees (name, dni) VALUES (?, ?)",
+                     [(f"Empleado {i}", str(i)) for i in range(EMPLOYEES)])
+    conn.executemany(
+        "INSERT INTO attendance (employee_id, timestamp, action_type, status) "
+        "VALUES (?, datetime('now', ?), ?, 'ON_TIME')",
+        [(rng.randint(1, EMPLOYEES), f"-{i} seconds", rng.choice(("IN", "OUT"))) for i in range(punches)])
+    conn.commit()
+    db.close()
+
+
+def per_call(path):
+    def run(sql, args, write=False):
+        conn = sqlite3.connect(path)
+        row = conn.execute(sql, args).fetchone()
+        if write:
+            conn.commit()
+        conn.close()
+        return row
+    return run
+
+
+def persistent(db):
+    def run(sql, args, write=False):
+        conn = db.get_connection()
+        row = conn.execute(sql, args).fetchone()
+        if write:
+            conn.commit()
+        return row
+    return run
+
+
+def rate(run, sql, calls, write=False, threads=1):
+    def work():
+        for i in range(calls):
+            run(sql, (i % EMPLOYEES + 1,), write)
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    start = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return threads * calls / (time.perf_counter() - start)
+
+
+def benchmark(punches=20000):
+    with tempfile.TemporaryDirectory() as tmp:
+        old_path, new_path = os.path.join(tmp, "old.db"), os.path.join(tmp, "new.db")
+        for path in (old_path, new_path):
+            populate(path, punches)
+        # The original connections never changed the journal mode
+        conn = sqlite3.connect(old_path)
+        conn.execute("PRAGMA journal_mode=DELETE")
+        conn.close()
+
+        db = DatabaseManager(new_path)
+        results = []
+        for label, sql, calls, write, threads in (
+                ("nombre", NAME, 3000, False, 1),
+                (f"nombre ({THREADS} hilos)", NAME, 3000, False, THREADS),
+                ("última marca", LAST, 1000, False, 1),
+                ("marca (insert + commit)", INSERT, 300, True, 1)):
+            results.append((label, rate(per_call(old_path), sql, calls, write, threads),
+                            rate(persistent(db), sql, calls, write, threads)))
+        db.close()
+    return results
+
+
+if __name__ == "__main__":
+    punches = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    print(f"{EMPLOYEES} empleados, {punches} marcas; llamadas/s")
+    print("consulta                  por llamada   persistente")
+    for label, old_rate, new_rate in benchmark(punches):
+        print(f"{label:24s}  {old_rate:11,.0f}  {new_rate:12,.0f}")
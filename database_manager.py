@@ -1,13 +1,346 @@
 import sqlite3
+import sys
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
 import numpy as np
 import io
+from migrations import migrate
+
+# Applied to every new connection. WAL lets readers run while a kiosk
+# writes; NORMAL only syncs at checkpoints, which is safe with WAL (a power
+# loss can drop the last commits but never corrupts the database).
+PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA cache_size=-8000",   # 8 MB page cache per connection
+    "PRAGMA temp_store=MEMORY",
+)
+
+# Folds one punch (:employee_id, :action_type, :status, :timestamp) into
+# daily_summary. Used for every insert and, in timestamp order, by
+# rebuild_daily_summary(), so both always agree. Worked time is the sum of
+# IN -> OUT pairs of the same local day.
+SUMMARY_STATEMENTS = (
+    '''
+    INSERT OR IGNORE INTO daily_summary (employee_id, day)
+    VALUES (:employee_id, date(:timestamp, 'localtime'))
+    ''',
+    '''
+    UPDATE daily_summary SET
+        punches = punches + 1,
+        late_count = late_count + (:status = 'LATE'),
+        first_in = CASE WHEN :action_type = 'IN' AND (first_in IS NULL OR :timestamp < first_in)
+                        THEN :timestamp ELSE first_in END,
+        last_out = CASE WHEN :action_type = 'OUT' AND (last_out IS NULL OR :timestamp > last_out)
+                        THEN :timestamp ELSE last_out END,
+        worked_seconds = worked_seconds + CASE
+            WHEN :action_type = 'OUT' AND open_in IS NOT NULL
+            THEN MAX(0, strftime('%s', :timestamp) - strftime('%s', open_in))
+            ELSE 0 END,
+        open_in = CASE :action_type WHEN 'IN' THEN COALESCE(open_in, :timestamp)
+                                    WHEN 'OUT' THEN NULL ELSE open_in END
+    WHERE employee_id = :employee_id AND day = date(:timestamp, 'localtime')
+    ''',
+)
+
+
+# Employee with its last punch, the subquery is answered from
+# idx_attendance_employee_ts
+EMPLOYEE_QUERY = '''
+    SELECT e.id, e.name, e.dni, a.action_type, a.timestamp
+    FROM employees e
+    LEFT JOIN attendance a ON a.id = (
+        SELECT id FROM attendance WHERE employee_id = e.id
+        ORDER BY timestamp DESC LIMIT 1)
+'''
+
+# Minimum time between two punches of the same employee
+PUNCH_COOLDOWN = 60
+
+# Inserts a punch unless the employee's previous one (the last at or
+# before :timestamp, so a journal replayed after newer punches is still
+# checked against its own predecessor) is less than :cooldown old or has
+# the same action on the same local day (IN after IN). Check and insert
+# are one statement, so kiosks sharing the database cannot both pass the
+# check; the previous punch is read from idx_attendance_employee_ts.
+PUNCH_INSERT = '''
+    INSERT OR IGNORE INTO attendance (event_id, employee_id, action_type, status, timestamp)
+    SELECT :event_id, :employee_id, :action_type, :status, :timestamp
+    WHERE NOT EXISTS (
+        SELECT 1 FROM (
+            SELECT action_type, timestamp FROM attendance
+            WHERE employee_id = :employee_id AND timestamp <= :timestamp
+            ORDER BY timestamp DESC LIMIT 1
+        ) AS last
+        WHERE last.timestamp BETWEEN datetime(:timestamp, :cooldown) AND :timestamp
+           OR (last.action_type = :action_type
+               AND date(last.timestamp, 'localtime') = date(:timestamp, 'localtime'))
+    )
+'''
+
+_MISSING = object()
+
+# EmployeeDirectory.get(wait=False) of an employee not loaded yet
+LOADING = object()
+
+
+def utc_now():
+    """Current time in the format and time zone of CURRENT_TIMESTAMP"""
+    return datetime.now(timezone.utc).strftime("%Y-%m-%d %H:%M:%S")
+
+
+class EmployeeDirectory:
+    """Bounded in-memory cache of employee id -> name, dni and last punch.
+
+    Lookups are a dict hit in the recognition hot path; a miss costs one
+    indexed query on the calling thread's connection. At most `capacity`
+    employees are kept (least recently used are dropped), unknown ids are
+    cached too so an unregistered face does not query every frame.
+
+    DatabaseManager updates the cache on its own writes and commits them
+    through commit(). Writes from other processes (another kiosk, the
+    rebuild CLI) are noticed through PRAGMA data_version, probed at most
+    every `check_interval` seconds, which clears the whole cache.
+
+    GUI threads must not wait for SQLite: with a `loader` (a function
+    that runs fn(*args) on another thread, like DatabaseExecutor.submit),
+    lookups with wait=False return LOADING on a miss and both the query
+    and the data_version probe run on the loader instead.
+    """
+
+    def __init__(self, db, capacity=1024, check_interval=1.0, loader=None):
+        self.db = db
+        self.capacity = capacity
+        self.check_interval = check_interval
+        self.loader = loader
+        self._entries = OrderedDict()  # id -> (name, dni, last) or None
+        self._lock = threading.Lock()
+        self._loading = set()  # ids queued on the loader
+        self._checking = False
+        self._probe = None
+        self._data_version = None
+        self._next_check = 0.0
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def get(self, employee_id, wait=True):
+        """(name, dni, last) of an employee, None if it does not exist.
+
+        `last` is the (action_type, timestamp) of the last punch or None.
+        With wait=False and a loader, a miss returns LOADING and the
+        employee is loaded in the background.
+        """
+        background = not wait and self.loader is not None
+        if background:
+            self._check_version_later()
+        else:
+            self._check_version()
+        with self._lock:
+            entry = self._entries.get(employee_id, _MISSING)
+            if entry is not _MISSING:
+                self._entries.move_to_end(employee_id)
+                self.hits += 1
+                return entry
+            self.misses += 1
+            queue = background and employee_id not in self._loading
+            if queue:
+                self._loading.add(employee_id)
+        if queue:
+            self.loader(self._load, employee_id)
+        if background:
+            return LOADING
+        return self._load(employee_id)
+
+    def name(self, employee_id, wait=True):
+        entry = self.get(employee_id, wait)
+        if entry is LOADING:
+            return "Cargando..."
+        return entry[0] if entry else "Desconocido"
+
+    def last_attendance(self, employee_id, wait=True):
+        """Same result as DatabaseManager.get_last_attendance(), or LOADING"""
+        entry = self.get(employee_id, wait)
+        if entry is LOADING:
+            return LOADING
+        return entry[2] if entry else None
+
+    def warm(self):
+        """Load up to `capacity` employees in one query, returns the count"""
+        rows = self.db.get_connection().execute(
+            EMPLOYEE_QUERY + "ORDER BY e.id LIMIT ?", (self.capacity,)).fetchall()
+        with self._lock:
+            for row in rows:
+                self._store(row[0], self._entry(row))
+        return len(rows)
+
+    def invalidate(self, employee_id=None):
+        """Drop one employee, or everything when employee_id is None"""
+        with self._lock:
+            if employee_id is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(employee_id, None)
+            self.invalidations += 1
+
+    def commit(self, conn):
+        """Commit a write of this process, whose changes the caller caches.
+
+        The probe's data_version also moves for this process's connections,
+        so it is read right before the commit (the open write transaction
+        keeps other writers out) and right after it: commits of other
+        processes until then still clear the cache, ours do not.
+        """
+        with self._lock:
+            if self._data_version is not None and self._read_version() != self._data_version:
+                self._entries.clear()
+                self.invalidations += 1
+            conn.commit()
+            self._data_version = self._read_version()
+
+    def note_attendance(self, employee_id, action_type, timestamp):
+        """Record a punch just committed through this process"""
+        with self._lock:
+            entry = self._entries.get(employee_id)
+            if entry and (entry[2] is None or timestamp >= entry[2][1]):
+                self._entries[employee_id] = (entry[0], entry[1], (action_type, timestamp))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "capacity": self.capacity,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+            }
+
+    def close(self):
+        with self._lock:
+            if self._probe is not None:
+                self._probe.close()
+                self._probe = None
+                self._data_version = None
+
+    def _entry(self, row):
+        last = (row[3], row[4]) if row[3] is not None else None
+        return (row[1], row[2], last)
+
+    def _load(self, employee_id):
+        try:
+            row = self.db.get_connection().execute(
+                EMPLOYEE_QUERY + "WHERE e.id = ?", (employee_id,)).fetchone()
+            entry = self._entry(row) if row else None
+            with self._lock:
+                self._store(employee_id, entry)
+            return entry
+        finally:
+            with self._lock:
+                self._loading.discard(employee_id)
+
+    def _store(self, employee_id, entry):
+        self._entries[employee_id] = entry
+        self._entries.move_to_end(employee_id)
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+
+    def _check_version(self):
+        now = time.monotonic()
+        if now < self._next_check:
+            return
+        with self._lock:
+            if now < self._next_check:
+                return
+            self._next_check = now + self.check_interval
+            version = self._read_version()
+            if self._data_version is not None and version != self._data_version:
+                self._entries.clear()
+                self.invalidations += 1
+            self._data_version = version
+
+    def _check_version_later(self):
+        with self._lock:
+            if self._checking or time.monotonic() < self._next_check:
+                return
+            self._checking = True
+        self.loader(self._checked_later)
+
+    def _checked_later(self):
+        try:
+            self._check_version()
+        finally:
+            self._checking = False
+
+    def _read_version(self):
+        # data_version only moves for commits of *other* connections, so
+        # the probe has its own one and sees every writer (see commit())
+        if self._probe is None:
+            self._probe = sqlite3.connect(self.db.db_path, timeout=self.db.timeout,
+                                          check_same_thread=False)
+        return self._probe.execute("PRAGMA data_version").fetchone()[0]
+
 
 class DatabaseManager:
-    def __init__(self, db_path="attendance.db"):
+    """SQLite access with one persistent connection per thread.
+
+    Connections are opened on first use by each thread (Qt/Flet UI thread,
+    inference and worker threads) and reused afterwards, so the statement
+    cache of sqlite3 is effective. A thread never shares its connection.
+    Connections of finished threads are closed on the next connect, and
+    close() closes all of them.
+    """
+
+    def __init__(self, db_path="attendance.db", timeout=10.0, cached_statements=128,
+                 cooldown=PUNCH_COOLDOWN):
         self.db_path = db_path
+        self.timeout = timeout
+        self.cached_statements = cached_statements
+        self.cooldown = cooldown
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = {}  # thread -> connection
+        # Bring older attendance.db files up to the current schema
+        migrate(self.get_connection())
+        self.directory = EmployeeDirectory(self)
+        # employee_id -> (action_type, timestamp) of the last punch seen by
+        # this process, rejects repeated punches without a write transaction
+        self.last_events = self._load_last_events()
+        self.rejected = 0
 
     def get_connection(self):
-        return sqlite3.connect(self.db_path)
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+        return conn
+
+    def _connect(self):
+        # check_same_thread=False only so close() can run from another
+        # thread, each connection is used by the thread that opened it
+        conn = sqlite3.connect(self.db_path, timeout=self.timeout,
+                               cached_statements=self.cached_statements,
+                               check_same_thread=False)
+        for pragma in PRAGMAS:
+            conn.execute(pragma)
+        with self._lock:
+            for thread in [t for t in self._connections if not t.is_alive()]:
+                self._connections.pop(thread).close()
+            self._connections[threading.current_thread()] = conn
+        return conn
+
+    def close(self):
+        """Close every connection, threads reconnect on their next call"""
+        with self._lock:
+            connections = list(self._connections.values())
+            self._connections.clear()
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+        self.directory.close()
 
     def add_employee(self, name, dni, email, encoding, photo_path):
         conn = self.get_connection()
@@ -20,19 +353,19 @@ class DatabaseManager:
                 VALUES (?, ?, ?, ?, ?)
             ''', (name, dni, email, encoding_bytes, photo_path))
             employee_id = cursor.lastrowid
-            conn.commit()
+            self.directory.commit(conn)
+            # The id may be cached as unknown
+            self.directory.invalidate(employee_id)
             return employee_id
         except sqlite3.IntegrityError:
+            conn.rollback()
             return None
-        finally:
-            conn.close()
 
     def get_all_employees(self):
         conn = self.get_connection()
         cursor = conn.cursor()
         cursor.execute('SELECT id, name, dni, email FROM employees')
         rows = cursor.fetchall()
-        conn.close()
         return rows
 
     def get_employee_name(self, employee_id):
@@ -40,7 +373,6 @@ class DatabaseManager:
         cursor = conn.cursor()
         cursor.execute('SELECT name FROM employees WHERE id = ?', (employee_id,))
         row = cursor.fetchone()
-        conn.close()
         return row[0] if row else "Desconocido"
 
     def get_all_encodings(self):
@@ -48,7 +380,6 @@ class DatabaseManager:
         cursor = conn.cursor()
         cursor.execute('SELECT id, face_encoding FROM employees')
         rows = cursor.fetchall()
-        conn.close()
         
         known_encodings = []
         known_ids = []
@@ -63,30 +394,174 @@ class DatabaseManager:
         self.mark_attendance(employee_id, action_type, status)
 
     def mark_attendance(self, employee_id, action_type, status):
-        # Avoid double logging within 1 minute
+        """Record a punch now, False if it repeats the last one (see PUNCH_INSERT)"""
+        event = {"event_id": None, "employee_id": employee_id, "action_type": action_type,
+                 "status": status, "timestamp": utc_now()}
+        return self.mark_attendance_batch([event])[0]
+
+    def mark_attendance_batch(self, events):
+        """Insert journaled events in one transaction.
+
+        `events` are dicts with event_id, employee_id, action_type, status
+        and timestamp. Returns one bool per event, False when the event_id
+        was already stored or the punch repeats the employee's last one.
+        """
+        inserted = [not self._in_cooldown(event) for event in events]
+        if not any(inserted):
+            self.rejected += len(events)
+            return inserted
+
         conn = self.get_connection()
         cursor = conn.cursor()
-        
-        # Check last log
-        cursor.execute('''
-            SELECT timestamp FROM attendance 
-            WHERE employee_id = ? 
-            ORDER BY timestamp DESC LIMIT 1
-        ''', (employee_id,))
-        last_log = cursor.fetchone()
-        
-        if last_log:
-            # Simple check: if last log was less than 60 seconds ago, skip
-            # (In a real app, use datetime parsing)
-            pass 
+        cooldown = f"-{self.cooldown} seconds"
+        try:
+            for i, event in enumerate(events):
+                if not inserted[i]:
+                    continue
+                cursor.execute(PUNCH_INSERT, dict(event, cooldown=cooldown))
+                inserted[i] = cursor.rowcount == 1
+                if inserted[i]:
+                    self._add_to_summary(cursor, event)
+            self.directory.commit(conn)
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        for event, ok in zip(events, inserted):
+            if ok:
+                self._note_punch(event)
+            else:
+                self.rejected += 1
+        return inserted
+
+    def _in_cooldown(self, event):
+        # Only the cooldown is decided here: if another process punched
+        # since, its punch is newer still. The IN/OUT state needs the
+        # database (another kiosk may have recorded the OUT), and so does
+        # an event older than the last punch (a replayed journal), whose
+        # predecessor is not the punch cached here.
+        last = self.last_events.get(event["employee_id"])
+        if last is None or last[1] > event["timestamp"]:
+            return False
+        start = datetime.strptime(event["timestamp"], "%Y-%m-%d %H:%M:%S") - timedelta(seconds=self.cooldown)
+        return last[1] > start.strftime("%Y-%m-%d %H:%M:%S")
+
+    def _note_punch(self, event):
+        employee_id, action_type, timestamp = event["employee_id"], event["action_type"], event["timestamp"]
+        with self._lock:
+            last = self.last_events.get(employee_id)
+            if last is None or timestamp >= last[1]:
+                self.last_events[employee_id] = (action_type, timestamp)
+        self.directory.note_attendance(employee_id, action_type, timestamp)
+
+    def _load_last_events(self):
+        rows = self.get_connection().execute(EMPLOYEE_QUERY + "WHERE a.id IS NOT NULL")
+        return {row[0]: (row[3], row[4]) for row in rows}
 
+    def _add_to_summary(self, cursor, event):
+        # SUMMARY_STATEMENTS fold punches in timestamp order: a punch older
+        # than others of its day (a replayed journal) refolds that day
+        later = cursor.execute('''
+            SELECT 1 FROM attendance
+            WHERE employee_id = :employee_id AND timestamp > :timestamp
+              AND timestamp < datetime(date(:timestamp, 'localtime'), '+1 day', 'utc')
+            LIMIT 1
+        ''', event).fetchone()
+        if later is None:
+            for statement in SUMMARY_STATEMENTS:
+                cursor.execute(statement, event)
+            return
         cursor.execute('''
-            INSERT INTO attendance (employee_id, action_type, status)
-            VALUES (?, ?, ?)
-        ''', (employee_id, action_type, status))
-        conn.commit()
-        conn.close()
-        return True
+            DELETE FROM daily_summary
+            WHERE employee_id = :employee_id AND day = date(:timestamp, 'localtime')
+        ''', event)
+        day = cursor.execute('''
+            SELECT employee_id, action_type, status, timestamp FROM attendance
+            WHERE employee_id = :employee_id
+              AND timestamp >= datetime(date(:timestamp, 'localtime'), 'utc')
+              AND timestamp < datetime(date(:timestamp, 'localtime'), '+1 day', 'utc')
+            ORDER BY timestamp, id
+        ''', event).fetchall()
+        columns = ("employee_id", "action_type", "status", "timestamp")
+        for row in day:
+            for statement in SUMMARY_STATEMENTS:
+                cursor.execute(statement, dict(zip(columns, row)))
+
+    def rebuild_daily_summary(self, date_from=None):
+        """Recompute daily_summary from attendance (from a local date on).
+
+        Migration 4 fills the table from the existing punches; this is
+        needed after punches were inserted out of order. Returns the number
+        of punches replayed.
+        """
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        replayed = 0
+        try:
+            if date_from is None:
+                cursor.execute("DELETE FROM daily_summary")
+                events = conn.execute('''
+                    SELECT employee_id, action_type, status, timestamp FROM attendance
+                    ORDER BY timestamp, id
+                ''')
+            else:
+                cursor.execute("DELETE FROM daily_summary WHERE day >= ?", (date_from,))
+                # Local midnight converted to the stored (UTC) time
+                events = conn.execute('''
+                    SELECT employee_id, action_type, status, timestamp FROM attendance
+                    WHERE timestamp >= datetime(?, 'utc')
+                    ORDER BY timestamp, id
+                ''', (date_from,))
+            columns = ("employee_id", "action_type", "status", "timestamp")
+            while True:
+                chunk = [dict(zip(columns, row)) for row in events.fetchmany(10000)]
+                if not chunk:
+                    break
+                # All base rows of the chunk first, then the updates in order
+                for statement in SUMMARY_STATEMENTS:
+                    cursor.executemany(statement, chunk)
+                replayed += len(chunk)
+            self.directory.commit(conn)
+        except sqlite3.Error:
+            conn.rollback()
+            raise
+        return replayed
+
+    def get_daily_summary_page(self, limit=200, after=None, date_from=None, date_to=None, employee_id=None):
+        """One page of daily_summary, newest day first.
+
+        Same keyset pagination and filters as get_attendance_page(), on
+        (day, employee_id). Rows are (day, name, dni, first_in, last_out,
+        hours, late_count, punches, employee_id) with local times.
+        """
+        conditions, params = [], []
+        if after is not None:
+            conditions.append("(s.day, s.employee_id) < (?, ?)")
+            params.extend(after)
+        if date_from is not None:
+            conditions.append("s.day >= ?")
+            params.append(date_from)
+        if date_to is not None:
+            conditions.append("s.day <= ?")
+            params.append(date_to)
+        if employee_id is not None:
+            conditions.append("s.employee_id = ?")
+            params.append(employee_id)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT s.day, e.name, e.dni,
+                   time(s.first_in, 'localtime'), time(s.last_out, 'localtime'),
+                   printf('%.2f', s.worked_seconds / 3600.0), s.late_count, s.punches,
+                   s.employee_id
+            FROM daily_summary s
+            JOIN employees e ON s.employee_id = e.id
+            {where}
+            ORDER BY s.day DESC, s.employee_id DESC
+            LIMIT ?
+        ''', params + [limit])
+        return cursor.fetchall()
 
     def get_last_attendance(self, employee_id):
         """Get the last attendance record for an employee"""
@@ -100,8 +575,45 @@ class DatabaseManager:
             LIMIT 1
         ''', (employee_id,))
         row = cursor.fetchone()
-        conn.close()
         return row  # Returns (action_type, timestamp) or None
+
+    def get_attendance_page(self, limit=200, after=None, date_from=None, date_to=None, employee_id=None):
+        """One page of the attendance report, newest first.
+
+        Keyset pagination: `after` is the (timestamp, id) of the last row
+        of the previous page, so every page is an index range read however
+        deep the user scrolled. `date_from`/`date_to` are inclusive local
+        'YYYY-MM-DD' dates, the days of daily_summary. Rows are (timestamp,
+        name, dni, action_type, status, id).
+        """
+        conditions, params = [], []
+        if after is not None:
+            conditions.append("(a.timestamp, a.id) < (?, ?)")
+            params.extend(after)
+        # Timestamps are UTC: the bounds are local midnights converted to
+        # UTC once, so the filter stays a range on idx_attendance_ts
+        if date_from is not None:
+            conditions.append("a.timestamp >= datetime(?, 'utc')")
+            params.append(date_from)
+        if date_to is not None:
+            conditions.append("a.timestamp < datetime(?, '+1 day', 'utc')")
+            params.append(date_to)
+        if employee_id is not None:
+            conditions.append("a.employee_id = ?")
+            params.append(employee_id)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        conn = self.get_connection()
+        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT a.timestamp, e.name, e.dni, a.action_type, a.status, a.id
+            FROM attendance a
+            JOIN employees e ON a.employee_id = e.id
+            {where}
+            ORDER BY a.timestamp DESC, a.id DESC
+            LIMIT ?
+        ''', params + [limit])
+        return cursor.fetchall()
     
     def get_attendance_report(self):
         conn = self.get_connection()
@@ -113,5 +625,14 @@ class DatabaseManager:
             ORDER BY a.timestamp DESC
         ''')
         rows = cursor.fetchall()
-        conn.close()
         return rows
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2 or sys.argv[1] != "rebuild-summary":
+        print("Uso: python database_manager.py rebuild-summary [AAAA-MM-DD]")
+        sys.exit(1)
+    db = DatabaseManager()
+    replayed = db.rebuild_daily_summary(sys.argv[2] if len(sys.argv) > 2 else None)
+    print(f"Resumen diario reconstruido con {replayed} marcas")
+    db.close()
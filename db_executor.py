@@ -0,0 +1,274 @@
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from database_manager import utc_now
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Windows locks byte ranges: lock one far past the end of any journal, so
+# the lock never covers the lines being written
+_LOCK_OFFSET = 1 << 30
+
+_STOP = object()
+
+
+class AttendanceJournal:
+    """Append-only file of punches not yet committed to SQLite.
+
+    One JSON event per line, fsync'd before the event is sent to the
+    database and cleared once every event in it is committed. Inserts are
+    idempotent (attendance.event_id is UNIQUE), so replaying a line that
+    was committed just before a crash is harmless.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = None
+
+    def lock(self):
+        """Lock the journal for this process, False if another process holds it"""
+        f = open(self.path, "ab")
+        try:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                f.seek(_LOCK_OFFSET)
+                msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        except OSError:
+            f.close()
+            return False
+        self._lock = f
+        return True
+
+    def unlock(self):
+        # Closing the handle releases the lock
+        if self._lock is not None:
+            self._lock.close()
+            self._lock = None
+
+    def remove(self):
+        self.unlock()
+        try:
+            os.remove(self.path)
+        except OSError:
+            pass
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return []
+        events = []
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    # Torn last line of a write interrupted by a crash
+                    continue
+        return events
+
+    def append(self, events):
+        with open(self.path, "a", encoding="utf-8") as f:
+            for event in events:
+                f.write(json.dumps(event) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+
+    def clear(self):
+        with open(self.path, "w", encoding="utf-8") as f:
+            f.flush()
+            os.fsync(f.fileno())
+
+
+def claim_journal(path):
+    """Lock the first free journal among `path`, `path`.1, `path`.2...
+
+    Every process writing to the same database gets its own journal.
+    Returns (journal, orphans): orphans are the other journals nobody
+    holds, left with punches by processes that are gone; they are locked
+    too so the punches can be written and the files removed.
+    """
+    directory, name = os.path.split(os.path.abspath(path))
+    numbers = sorted(int(f[len(name) + 1:]) for f in os.listdir(directory)
+                     if f.startswith(name + ".") and f[len(name) + 1:].isdigit())
+    journal = None
+    orphans = []
+    for n in [0] + numbers:
+        candidate = AttendanceJournal(f"{path}.{n}" if n else path)
+        if not candidate.lock():
+            continue
+        if journal is None:
+            journal = candidate
+        elif os.path.getsize(candidate.path):
+            orphans.append(candidate)
+        else:
+            candidate.remove()
+    n = numbers[-1] if numbers else 0
+    while journal is None:
+        n += 1
+        candidate = AttendanceJournal(f"{path}.{n}")
+        if candidate.lock():
+            journal = candidate
+    return journal, orphans
+
+
+class DatabaseExecutor(threading.Thread):
+    """Runs the database work of a front end on one background thread.
+
+    submit() queues any callable (usually a DatabaseManager method) and
+    returns a concurrent.futures.Future, so UI threads never wait for
+    SQLite. Calls run in submission order: a read queued after a punch
+    sees it.
+
+    mark_attendance() journals the punch and writes it in a batch: punches
+    queued within `batch_window` seconds (up to `batch_size`) share one
+    transaction. When the database is busy or a write fails the punches
+    stay in the journal and are retried every `retry_interval` seconds,
+    also after a restart. The future resolves once the punch is committed.
+
+    The journal is locked for the life of the executor. By default it is
+    `<database>.journal` (see claim_journal() for several processes).
+    """
+
+    def __init__(self, db, journal_path=None, batch_size=64, batch_window=0.02,
+                 retry_interval=2.0):
+        super().__init__(daemon=True)
+        self.db = db
+        if journal_path is None:
+            self.journal, self._orphans = claim_journal(db.db_path + ".journal")
+        else:
+            self.journal, self._orphans = AttendanceJournal(journal_path), []
+            if not self.journal.lock():
+                raise RuntimeError(f"{journal_path} is in use by another process")
+        self.batch_size = batch_size
+        self.batch_window = batch_window
+        self.retry_interval = retry_interval
+        self._queue = queue.Queue()
+        # Journaled punches waiting for a commit, as (event, future)
+        self._pending = [(event, None) for journal in [self.journal] + self._orphans
+                         for event in journal.load()]
+
+        # Counters
+        self.batches = 0    # committed transactions
+        self.committed = 0  # punches written
+        self.failures = 0   # failed write attempts
+
+    def submit(self, fn, *args, **kwargs):
+        """Run fn(*args, **kwargs) on the database thread"""
+        future = Future()
+        self._queue.put((fn, args, kwargs, future))
+        return future
+
+    def mark_attendance(self, employee_id, action_type, status):
+        """Queue a punch, the future resolves to True once it is committed"""
+        event = {
+            "event_id": uuid.uuid4().hex,
+            "employee_id": employee_id,
+            "action_type": action_type,
+            "status": status,
+            "timestamp": utc_now(),
+        }
+        future = Future()
+        self._queue.put((None, event, None, future))
+        return future
+
+    def stop(self):
+        """Finish the queued work, then stop the thread"""
+        self._queue.put(_STOP)
+        if self.is_alive():
+            self.join()
+        self.journal.unlock()
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize(),
+            "pending": len(self._pending),
+            "batches": self.batches,
+            "committed": self.committed,
+            "failures": self.failures,
+        }
+
+    def run(self):
+        # Punches left in the journal by a previous run
+        self._flush()
+        item = None
+        while True:
+            if item is None:
+                try:
+                    item = self._queue.get(timeout=self.retry_interval if self._pending else None)
+                except queue.Empty:
+                    self._flush()
+                    continue
+            if item is _STOP:
+                break
+
+            fn, args, kwargs, future = item
+            item = None
+            if fn is None:
+                item = self._collect(args, future)
+                self._flush()
+            elif future.set_running_or_notify_cancel():
+                try:
+                    future.set_result(fn(*args, **kwargs))
+                except Exception as e:
+                    future.set_exception(e)
+        self._flush()
+
+    def _collect(self, event, future):
+        """Gather the punches of one batch, returns the next non-punch item"""
+        batch = [(event, future)]
+        following = None
+        deadline = time.monotonic() + self.batch_window
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP or item[0] is not None:
+                following = item
+                break
+            batch.append((item[1], item[3]))
+
+        batch = [(e, f) for e, f in batch if f.set_running_or_notify_cancel()]
+        try:
+            self.journal.append([e for e, _ in batch])
+        except OSError as e:
+            # Still written to the database, only crash safety is lost
+            print(f"No se pudo escribir el diario de asistencia: {e}")
+        self._pending.extend(batch)
+        return following
+
+    def _flush(self):
+        if not self._pending:
+            return
+        try:
+            inserted = self.db.mark_attendance_batch([e for e, _ in self._pending])
+        except sqlite3.Error as e:
+            self.failures += 1
+            print(f"Error al guardar asistencia, se reintentará: {e}")
+            return
+
+        pending, self._pending = self._pending, []
+        self.batches += 1
+        self.committed += sum(inserted)
+        try:
+            self.journal.clear()
+        except OSError as e:
+            print(f"No se pudo vaciar el diario de asistencia: {e}")
+        for orphan in self._orphans:
+            orphan.remove()
+        self._orphans = []
+        for (_, future), ok in zip(pending, inserted):
+            if future is not None:
+                future.set_result(ok)
@@ -1,13 +1,12 @@
 import cv2
 import os
+import struct
+import threading
+import time
+import zlib
+from collections import deque
 import numpy as np
-import mediapipe as mp
-try:
-    import mediapipe.solutions.face_mesh as mp_face_mesh
-    import mediapipe.solutions.drawing_utils as mp_drawing
-    MEDIAPIPE_AVAILABLE = True
-except ImportError:
-    MEDIAPIPE_AVAILABLE = False
+from gallery_store import GalleryStore, FLAG_ALIGNED, convert_trainer_yml
 
 # Classes for MobileNetSSD
 CLASSES = ["background", "avion", "bicicleta", "pajaro", "bote",
@@ -15,10 +14,603 @@ CLASSES = ["background", "avion", "bicicleta", "pajaro", "bote",
            "perro", "caballo", "moto", "persona", "planta", "oveja",
            "sofa", "tren", "monitor"]
 
+# Canonical (width, height) crop used by batched recognition
+FACE_SIZE = (100, 100)
+
+# Binary histogram gallery (see gallery_store.py), replaces trainer.yml
+GALLERY_PATH = "gallery.bin"
+INDEX_PATH = "gallery.idx"
+LEGACY_MODEL_PATH = "trainer.yml"
+
+# Face Mesh eye corner indices, one pair per eye
+MESH_EYE_CORNERS = ((33, 133), (362, 263))
+
+
+def load_mediapipe():
+    """Import MediaPipe Face Mesh on demand, returns (face_mesh, drawing_utils) or None.
+
+    Importing mediapipe loads its native framework and protobuf modules,
+    so it only happens when a FaceEngine actually uses Face Mesh.
+    """
+    try:
+        import mediapipe.solutions.face_mesh as mp_face_mesh
+        import mediapipe.solutions.drawing_utils as mp_drawing
+    except ImportError:
+        return None
+    return mp_face_mesh, mp_drawing
+
+
+def chi_square(probes, gallery, gallery_sums=None, rows=None, max_elements=1 << 22):
+    """HISTCMP_CHISQR_ALT distance from every probe to every gallery row.
+
+    Uses sum(2*(a-b)^2/(a+b)) = 2*(sum(a) + sum(b) - 4*sum(a*b/(a+b))),
+    where only bins that are non-zero in the probes can contribute to the
+    last term. LBP histograms are sparse, so this only touches a small
+    subset of the columns. The gallery is processed in chunks to bound
+    the temporary (probes x rows x columns) array. `rows` restricts the
+    comparison to a subset of gallery rows (sums are indexed the same way).
+    """
+    if rows is None:
+        rows = np.arange(len(gallery))
+    if gallery_sums is None:
+        gallery_sums = np.asarray(gallery[rows]).sum(axis=1, dtype=np.float64)
+    else:
+        gallery_sums = gallery_sums[rows]
+    cols = np.flatnonzero(probes.any(axis=0))
+    a = probes[:, cols].astype(np.float64)
+    probe_sums = probes.sum(axis=1, dtype=np.float64)
+    shared = np.empty((len(probes), len(rows)))
+    step = max(1, max_elements // max(1, a.size))
+    for start in range(0, len(rows), step):
+        b = gallery[np.ix_(rows[start:start+step], cols)].astype(np.float64)
+        num = a[:, None, :] * b[None, :, :]
+        den = a[:, None, :] + b[None, :, :]
+        ratio = np.divide(num, den, out=np.zeros_like(num), where=den > 0)
+        shared[:, start:start+step] = ratio.sum(axis=2)
+    return 2.0 * (probe_sums[:, None] + gallery_sums[None, :] - 4.0 * shared)
+
+
+# Index sidecar file (little endian):
+#   header    128 bytes: magic, version, dim, coarse dim, bins per cell,
+#             capacity, gallery file id and rows covered, labels, runs,
+#             inverted lists, labels when the lists were built, metadata
+#             offset, length and crc32
+#   rows      capacity records of coarse float32[C] + prototype float32[D]
+#   metadata  labels int64[L], samples per label int64[L], prototype sums
+#             float64[L], runs int64[R, 3] (label, first row, end row),
+#             centroids float32[nlist, C], list of each label int64[L]
+# Everything in it is derived from gallery.bin: a sidecar that is missing,
+# damaged or does not match the gallery is rebuilt from the gallery.
+INDEX_MAGIC = b"FTGALIDX"
+INDEX_VERSION = 1
+INDEX_HEADER = struct.Struct("<8sIQIIQ16sQQQQQQQI16x")
+
+
+class GalleryIndex:
+    """Nearest-neighbour index over LBPH training histograms.
+
+    Every employee is summarized by a prototype (mean histogram). Prototypes
+    are grouped into an inverted file: a coarse version of each prototype
+    (bins of every cell summed in groups) is assigned to the closest of
+    ~sqrt(N) chi-square k-means centroids. A search only scores the
+    prototypes of the `nprobe` closest lists, then reranks the best labels
+    against their stored samples so distances keep the LBPH meaning
+    (minimum distance to any training sample).
+
+    Below `min_ivf_size` labels every prototype is scored (no lists): at
+    the app's dimension the inverted file saves little time there and
+    costs recall.
+
+    With a `path`, the per-label data lives in that sidecar file next to
+    the gallery (prototypes memory-mapped), so open() does not read the
+    gallery samples.
+
+    search() may run on another thread than add(): both hold the index
+    lock, and a new label is only published once its entry is complete.
+    """
+
+    def __init__(self, bins_per_cell, coarse_bins=64, nprobe=16, candidates=8,
+                 min_ivf_size=2048, kmeans_iterations=5, path=None):
+        self.bins_per_cell = bins_per_cell
+        self.coarse_bins = min(coarse_bins, bins_per_cell)
+        self.nprobe = nprobe
+        self.candidates = candidates
+        self.min_ivf_size = min_ivf_size
+        self.kmeans_iterations = kmeans_iterations
+        self.path = path
+        self._lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self._clear()
+
+    def _clear(self):
+        self.samples = {}         # label -> list of ((n, D) samples, row sums)
+        self.runs = []            # (label, first row, end row) in the gallery
+        self.labels = []          # prototype row -> label
+        self.rows = {}            # label -> prototype row
+        # Per-label rows, preallocated and doubled when full so an insert
+        # only writes its own row; the first len(labels) rows are valid
+        self._records = None      # (capacity,) coarse + prototype, float32
+        self._sums = None         # (capacity,) float64
+        self._counts = None       # (capacity,) int64, samples per label
+        self.centroids = None     # (nlist, C) float32, None = brute force
+        self.lists = []           # nlist lists of prototype rows
+        self.built_size = 0
+
+    def __len__(self):
+        return len(self.labels)
+
+    @property
+    def prototypes(self):
+        return None if self._records is None else self._records["prototype"][:len(self.labels)]
+
+    @property
+    def coarse(self):
+        return None if self._records is None else self._records["coarse"][:len(self.labels)]
+
+    @property
+    def prototype_sums(self):
+        return None if self._sums is None else self._sums[:len(self.labels)]
+
+    def open(self, store):
+        """Index the samples of a GalleryStore, returns False if it was rebuilt.
+
+        A sidecar that matches the store only costs its per-label data and
+        inverted lists (no k-means). Otherwise (first start, another
+        gallery, an interrupted save) the whole gallery is read once and
+        the sidecar written again.
+        """
+        with self._lock:
+            if self._load(store):
+                return True
+            self.build(store.histograms, store.labels, store.row_sums)
+        self.save(store)
+        return False
+
+    def build(self, histograms, labels, row_sums=None):
+        """(Re)build the index from a (N, D) histogram matrix and N labels.
+
+        Samples are kept as slices of `histograms`, so a memory-mapped
+        gallery is not copied into RAM.
+        """
+        labels = np.asarray(labels).ravel()
+        bounds = np.flatnonzero(np.diff(labels)) + 1
+        with self._lock:
+            self._clear()
+            for start, stop in zip(np.r_[0, bounds], np.r_[bounds, len(labels)]):
+                if stop > start:
+                    sums = None if row_sums is None else row_sums[start:stop]
+                    self._insert(int(labels[start]), histograms[start:stop], sums, int(start))
+            self._rebuild_lists()
+
+    def add(self, histograms, label, row_sums=None, start=None):
+        """Incremental insert of new samples for one label.
+
+        `start` is the gallery row of the first sample; save() records it
+        so a reopened index finds the samples without reading the gallery.
+        """
+        label = int(label)
+        with self._lock:
+            row = self._insert(label, histograms, row_sums, start)
+            if self.centroids is None or len(self.labels) >= 4 * max(1, self.built_size):
+                self._rebuild_lists()
+            else:
+                for members in self.lists:
+                    if row in members:
+                        members.remove(row)
+                nearest = chi_square(self.coarse[row:row+1], self.centroids).argmin()
+                self.lists[nearest].append(row)
+
+    def save(self, store):
+        """Write the per-label data to the sidecar, as of the rows of `store`"""
+        if self.path is None:
+            return
+        with self._lock:
+            count = len(self.labels)
+            records = self._records
+            capacity = 0 if records is None else len(records)
+            runs = np.array(self.runs, dtype="<i8").reshape(-1, 3)
+            assign = np.full(count, -1, dtype="<i8")
+            for c, members in enumerate(self.lists):
+                assign[np.asarray(members, dtype=np.int64)] = c
+            metadata = b"".join([np.array(self.labels, dtype="<i8").tobytes(),
+                                 self._counts[:count].astype("<i8").tobytes() if count else b"",
+                                 self._sums[:count].astype("<f8").tobytes() if count else b"",
+                                 runs.tobytes(),
+                                 b"" if self.centroids is None else self.centroids.astype("<f4").tobytes(),
+                                 assign.tobytes()])
+            built_size, nlist = self.built_size, len(self.lists)
+        offset = INDEX_HEADER.size + capacity * self._record_dtype(store.dim).itemsize
+        if records is not None:
+            records.flush()
+        with open(self.path, "r+b" if os.path.exists(self.path) else "wb") as f:
+            f.seek(offset)
+            f.write(metadata)
+            f.flush()
+            os.fsync(f.fileno())
+            # The header is the commit point
+            f.seek(0)
+            f.write(INDEX_HEADER.pack(INDEX_MAGIC, INDEX_VERSION, store.dim, self._coarse_dim(store.dim),
+                                      self.bins_per_cell, capacity, store.file_id, len(store), count,
+                                      len(runs), nlist, built_size, offset,
+                                      len(metadata), zlib.crc32(metadata)))
+            f.flush()
+            os.fsync(f.fileno())
+
+    def search(self, probes, k=1):
+        """Top-k (label, distance) pairs for every probe, best first"""
+        with self._lock:
+            if not self.labels:
+                return [[] for _ in range(len(probes))]
+            prototypes, prototype_sums = self.prototypes, self.prototype_sums
+            results = []
+            for probe in probes:
+                probe = probe[None, :]
+                if self.centroids is None:
+                    rows = np.arange(len(prototypes))
+                else:
+                    coarse = self._fold(probe)
+                    order = chi_square(coarse, self.centroids)[0].argsort()[:self.nprobe]
+                    rows = np.array(sorted(r for c in order for r in self.lists[c]), dtype=np.int64)
+                    if len(rows) == 0:
+                        rows = np.arange(len(prototypes))
+
+                # Shortlist labels by prototype distance, then rerank on samples
+                proto_dist = chi_square(probe, prototypes, prototype_sums, rows)[0]
+                shortlist = rows[proto_dist.argsort()[:max(k, self.candidates)]]
+                scored = []
+                for row in shortlist:
+                    label = self.labels[row]
+                    dist = min(chi_square(probe, block, sums)[0].min() for block, sums in self.samples[label])
+                    scored.append((label, float(dist)))
+                scored.sort(key=lambda item: item[1])
+                results.append(scored[:k])
+            return results
+
+    def _fold(self, histograms):
+        n = len(histograms)
+        group = self.bins_per_cell // self.coarse_bins
+        return np.asarray(histograms).reshape(n, -1, self.coarse_bins, group).sum(axis=3).reshape(n, -1)
+
+    def _coarse_dim(self, dim):
+        return dim // (self.bins_per_cell // self.coarse_bins)
+
+    def _record_dtype(self, dim):
+        return np.dtype([("coarse", "<f4", (self._coarse_dim(dim),)), ("prototype", "<f4", (dim,))])
+
+    def _load(self, store):
+        """Map a sidecar that matches `store`, False if there is none"""
+        if self.path is None or not len(store) or not os.path.exists(self.path):
+            return False
+        try:
+            with open(self.path, "rb") as f:
+                (magic, version, dim, coarse_dim, bins_per_cell, capacity, file_id, rows, count,
+                 runs, nlist, built_size, offset, length, crc) = INDEX_HEADER.unpack(f.read(INDEX_HEADER.size))
+                f.seek(offset)
+                metadata = f.read(length)
+        except (OSError, struct.error):
+            return False
+        if ((magic, version, dim, bins_per_cell, file_id, rows)
+                != (INDEX_MAGIC, INDEX_VERSION, store.dim, self.bins_per_cell, store.file_id, len(store))
+                or coarse_dim != self._coarse_dim(dim) or count > capacity
+                or len(metadata) != length or zlib.crc32(metadata) != crc):
+            return False
+
+        self._clear()
+        values = np.frombuffer(metadata, dtype="<i8", count=2 * count)
+        self.labels = [int(label) for label in values[:count]]
+        self.rows = {label: row for row, label in enumerate(self.labels)}
+        self._counts = np.zeros(capacity, np.int64)
+        self._counts[:count] = values[count:]
+        self._sums = np.zeros(capacity, np.float64)
+        self._sums[:count] = np.frombuffer(metadata, dtype="<f8", count=count, offset=16 * count)
+        position = 24 * count
+        runs = np.frombuffer(metadata, dtype="<i8", count=3 * runs, offset=position).reshape(runs, 3)
+        for label, start, stop in runs.tolist():
+            self.runs.append((label, start, stop))
+            self.samples.setdefault(label, []).append(
+                (store.histograms[start:stop], store.row_sums[start:stop]))
+        position += runs.nbytes
+        if nlist:
+            self.centroids = np.frombuffer(metadata, dtype="<f4", count=nlist * coarse_dim,
+                                           offset=position).reshape(nlist, coarse_dim).copy()
+            position += self.centroids.nbytes
+            assign = np.frombuffer(metadata, dtype="<i8", count=count, offset=position)
+            self.lists = [list(np.flatnonzero(assign == c)) for c in range(nlist)]
+        self.built_size = built_size
+        self._records = np.memmap(self.path, dtype=self._record_dtype(dim), mode="r+",
+                                  offset=INDEX_HEADER.size, shape=(capacity,))
+        return True
+
+    def _reserve(self, count, dim):
+        """Make room for `count` labels, doubling the capacity when full"""
+        capacity = 0 if self._records is None else len(self._records)
+        if count <= capacity:
+            return
+        capacity = max(count, 2 * capacity, 16)
+        used = len(self.labels)
+        if self.path is None:
+            records = np.empty(capacity, self._record_dtype(dim))
+            if used:
+                records[:used] = self._records[:used]
+        else:
+            # Rows keep their place in the file, only the mapping grows
+            # (np.memmap extends the file, nothing is truncated or replaced)
+            if self._records is not None:
+                self._records.flush()
+            records = np.memmap(self.path, dtype=self._record_dtype(dim),
+                                mode="r+" if os.path.exists(self.path) else "w+",
+                                offset=INDEX_HEADER.size, shape=(capacity,))
+        sums = np.zeros(capacity, np.float64)
+        counts = np.zeros(capacity, np.int64)
+        if used:
+            sums[:used] = self._sums[:used]
+            counts[:used] = self._counts[:used]
+        self._records, self._sums, self._counts = records, sums, counts
+
+    def _insert(self, label, histograms, row_sums=None, start=None):
+        """Add samples to `label`, returns its prototype row.
+
+        The prototype is updated as a running mean from the new samples
+        alone, so the cost does not depend on how many samples or labels
+        are already indexed. A new label's row is filled before the label
+        is published in `labels`, `rows` and `samples`.
+        """
+        if row_sums is None:
+            row_sums = np.asarray(histograms).sum(axis=1, dtype=np.float64)
+        total = np.asarray(histograms).sum(axis=0, dtype=np.float64)
+        row = self.rows.get(label)
+        new = row is None
+        if new:
+            row = len(self.labels)
+            self._reserve(row + 1, total.shape[0])
+            count = len(histograms)
+        else:
+            count = self._counts[row] + len(histograms)
+            total += self._records["prototype"][row].astype(np.float64) * self._counts[row]
+        prototype = (total / count).astype(np.float32)
+        self._records["prototype"][row] = prototype
+        self._records["coarse"][row] = self._fold(prototype[None, :])[0]
+        self._sums[row] = prototype.sum(dtype=np.float64)
+        self._counts[row] = count
+        if start is not None:
+            self.runs.append((label, start, start + len(histograms)))
+        if new:
+            self.samples[label] = [(histograms, row_sums)]
+            self.rows[label] = row
+            self.labels.append(label)
+        else:
+            self.samples[label].append((histograms, row_sums))
+        return row
+
+    def _rebuild_lists(self):
+        """Chi-square k-means over the coarse prototypes"""
+        count = len(self.labels)
+        self.built_size = count
+        if count < self.min_ivf_size:
+            self.centroids = None
+            self.lists = []
+            return
+        nlist = int(np.sqrt(count))
+        rng = np.random.default_rng(0)
+        centroids = self.coarse[rng.choice(count, nlist, replace=False)].copy()
+        for _ in range(self.kmeans_iterations):
+            assign = chi_square(centroids, self.coarse).argmin(axis=0)
+            for c in range(nlist):
+                members = self.coarse[assign == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+        assign = chi_square(centroids, self.coarse).argmin(axis=0)
+        self.centroids = centroids
+        self.lists = [list(np.flatnonzero(assign == c)) for c in range(nlist)]
+
+
+class ScaleCalibrator:
+    """Learns the face-size band of a fixed kiosk from recent detections.
+
+    Once `min_samples` faces have been seen, detections use minSize/maxSize
+    from the `low_pct`..`high_pct` percentiles of recent face sizes widened
+    by `margin`, which skips most cascade pyramid levels. The full range is
+    used again when no face was seen for `idle_timeout` seconds, and every
+    `sweep_interval` calls so faces outside the band are still learned.
+    """
+
+    def __init__(self, history=200, min_samples=20, low_pct=5, high_pct=95,
+                 margin=0.25, idle_timeout=10.0, sweep_interval=10, default_min=30):
+        self.sizes = deque(maxlen=history)
+        self.min_samples = min_samples
+        self.low_pct = low_pct
+        self.high_pct = high_pct
+        self.margin = margin
+        self.idle_timeout = idle_timeout
+        self.sweep_interval = sweep_interval
+        self.default_min = default_min
+        self.last_seen = None
+        self.calls = 0
+        self.min_size = None
+        self.max_size = None
+        # Moving averages of detection time with the full and learned range
+        self.full_ms = None
+        self.calibrated_ms = None
+
+    def size_range(self, now):
+        """(min_side, max_side or None, calibrated) for the next detection"""
+        self.calls += 1
+        if (len(self.sizes) < self.min_samples or self.last_seen is None
+                or now - self.last_seen > self.idle_timeout
+                or self.calls % self.sweep_interval == 0):
+            return self.default_min, None, False
+        low, high = np.percentile(self.sizes, [self.low_pct, self.high_pct])
+        self.min_size = max(self.default_min, int(low * (1 - self.margin)))
+        self.max_size = int(high * (1 + self.margin)) + 1
+        return self.min_size, self.max_size, True
+
+    def observe(self, faces, now, elapsed_ms, calibrated):
+        for (_, _, w, h) in faces:
+            self.sizes.append(max(w, h))
+        if faces:
+            self.last_seen = now
+        attr = "calibrated_ms" if calibrated else "full_ms"
+        previous = getattr(self, attr)
+        setattr(self, attr, elapsed_ms if previous is None else 0.9 * previous + 0.1 * elapsed_ms)
+
+    def stats(self):
+        saved = None
+        if self.full_ms is not None and self.calibrated_ms is not None:
+            saved = self.full_ms - self.calibrated_ms
+        return {
+            "samples": len(self.sizes),
+            "min_size": self.min_size,
+            "max_size": self.max_size,
+            "full_ms": self.full_ms,
+            "calibrated_ms": self.calibrated_ms,
+            "saved_ms": saved,
+        }
+
+
+class FaceAligner:
+    """Rotates, scales and crops faces to a fixed canonical size.
+
+    Eye centers come from Face Mesh points when one of the faces matches
+    the box, otherwise from an eye cascade. They are mapped to
+    (`eye_x`, `eye_y`) and (1 - `eye_x`, `eye_y`) of the output; without an
+    eye pair the box is only scaled. The region around a large face is
+    first reduced with INTER_AREA, so the work per face does not depend on
+    the distance to the camera. align() writes into a reusable stack: the
+    returned crops are only valid until the next call.
+    """
+
+    def __init__(self, size=FACE_SIZE, eye_x=0.3, eye_y=0.38, margin=0.25):
+        self.size = size
+        self.eye_x = eye_x
+        self.eye_y = eye_y
+        self.margin = margin
+        self.eye_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_eye.xml')
+        self._stack = np.empty((4, size[1], size[0]), dtype=np.uint8)
+
+        # Counters per eye source
+        self.from_landmarks = 0
+        self.from_cascade = 0
+        self.unaligned = 0
+
+    def align(self, gray, boxes, points=None, detect_eyes=True):
+        """(N, H, W) uint8 canonical crops of the (x, y, w, h) boxes.
+
+        `points` are Face Mesh pixel coordinates, one array per face (see
+        FaceMeshWorker). With detect_eyes=False and no matching points the
+        crop is a plain INTER_AREA resize of the box.
+        """
+        if len(boxes) > len(self._stack):
+            self._stack = np.empty((len(boxes), self.size[1], self.size[0]), dtype=np.uint8)
+        out = self._stack[:len(boxes)]
+
+        for i, (x, y, w, h) in enumerate(boxes):
+            eyes = self._eyes_from_points(points, (x, y, w, h)) if points else None
+            if eyes is None and not detect_eyes:
+                self.unaligned += 1
+                cv2.resize(gray[y:y+h, x:x+w], self.size, dst=out[i], interpolation=cv2.INTER_AREA)
+                continue
+
+            roi, x0, y0, scale = self._region(gray, (x, y, w, h))
+            box = ((x - x0) * scale, (y - y0) * scale, w * scale, h * scale)
+            if eyes is not None:
+                self.from_landmarks += 1
+                eyes = [((ex - x0) * scale, (ey - y0) * scale) for ex, ey in eyes]
+            else:
+                eyes = self._eyes_from_cascade(roi, box)
+                if eyes is not None:
+                    self.from_cascade += 1
+                else:
+                    self.unaligned += 1
+            cv2.warpAffine(roi, self._transform(box, eyes), self.size, dst=out[i],
+                           flags=cv2.INTER_LINEAR, borderMode=cv2.BORDER_REPLICATE)
+        return out
+
+    def stats(self):
+        return {
+            "from_landmarks": self.from_landmarks,
+            "from_cascade": self.from_cascade,
+            "unaligned": self.unaligned,
+        }
+
+    def _region(self, gray, box):
+        """Box plus margin, reduced so the box is at most the output width"""
+        x, y, w, h = box
+        h_img, w_img = gray.shape[:2]
+        mx, my = int(w * self.margin), int(h * self.margin)
+        x0, y0 = max(0, x - mx), max(0, y - my)
+        roi = gray[y0:min(h_img, y + h + my), x0:min(w_img, x + w + mx)]
+        scale = self.size[0] / float(w)
+        if scale >= 1.0:
+            return roi, x0, y0, 1.0
+        return cv2.resize(roi, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA), x0, y0, scale
+
+    def _transform(self, box, eyes):
+        out_w, out_h = self.size
+        bx, by, bw, bh = box
+        if eyes is None:
+            sx, sy = out_w / bw, out_h / bh
+            return np.float32([[sx, 0, -bx * sx], [0, sy, -by * sy]])
+
+        (lx, ly), (rx, ry) = eyes
+        dx, dy = rx - lx, ry - ly
+        scale = (1.0 - 2 * self.eye_x) * out_w / max(np.hypot(dx, dy), 1e-6)
+        angle = np.arctan2(dy, dx)
+        a, b = scale * np.cos(angle), scale * np.sin(angle)
+        # Rotate and scale around the eye midpoint, then move it to the target
+        cx, cy = (lx + rx) / 2.0, (ly + ry) / 2.0
+        tx, ty = out_w / 2.0, self.eye_y * out_h
+        return np.float32([[a, b, tx - a * cx - b * cy],
+                           [-b, a, ty + b * cx - a * cy]])
+
+    def _eyes_from_points(self, points, box):
+        """(left, right) eye centers of the mesh face inside the box, or None"""
+        x, y, w, h = box
+        for face in points:
+            eyes = sorted(tuple(face[list(corners)].mean(axis=0)) for corners in MESH_EYE_CORNERS)
+            (lx, ly), (rx, ry) = eyes
+            mx, my = (lx + rx) / 2.0, (ly + ry) / 2.0
+            # Landmarks may be a few frames old, only trust them when they
+            # still agree with the box
+            if x <= mx <= x + w and y <= my <= y + h and 0.2 * w <= np.hypot(rx - lx, ry - ly) <= 0.7 * w:
+                return eyes
+        return None
+
+    def _eyes_from_cascade(self, roi, box):
+        """(left, right) eye centers found in the upper part of the box, or None"""
+        if self.eye_cascade.empty():
+            return None
+        bx, by, bw, bh = box
+        x0, y0 = int(bx), int(by + 0.15 * bh)
+        band = roi[y0:int(by + 0.6 * bh), x0:int(bx + bw)]
+        if band.size == 0:
+            return None
+        eyes = self.eye_cascade.detectMultiScale(
+            band, scaleFactor=1.1, minNeighbors=5,
+            minSize=(max(8, int(bw * 0.12)),) * 2, maxSize=(int(bw * 0.4),) * 2)
+
+        # Largest detection on each side of the box
+        left = right = None
+        for (ex, ey, ew, eh) in eyes:
+            center = (x0 + ex + ew / 2.0, y0 + ey + eh / 2.0)
+            if center[0] < bx + bw / 2.0:
+                if left is None or ew > left[1]:
+                    left = (center, ew)
+            elif right is None or ew > right[1]:
+                right = (center, ew)
+        if left is None or right is None:
+            return None
+        return left[0], right[0]
+
+
 class FaceEngine:
-    def __init__(self):
-        # MediaPipe Face Mesh
-        if MEDIAPIPE_AVAILABLE:
+    def __init__(self, face_mesh=True, object_detection=True):
+        # MediaPipe Face Mesh (a headless kiosk does not need it)
+        mediapipe = load_mediapipe() if face_mesh else None
+        if mediapipe:
+            mp_face_mesh, mp_drawing = mediapipe
             self.mp_face_mesh = mp_face_mesh
             self.face_mesh = self.mp_face_mesh.FaceMesh(
                 max_num_faces=1,
@@ -34,6 +626,8 @@ class FaceEngine:
         # Create LBPH Face Recognizer with balanced parameters
         # radius=2, neighbors=12 gives good accuracy without being too strict
         # grid_x=8, grid_y=8 provides good detail analysis
+        # Only its parameters are used: histograms are computed by
+        # lbp_histograms() and stored in the binary gallery
         self.recognizer = cv2.face.LBPHFaceRecognizer_create(
             radius=2,
             neighbors=12,
@@ -43,46 +637,128 @@ class FaceEngine:
         
         # Use better cascade for frontal face detection
         self.face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
+
+        # Detection strategy:
+        # "full": whole frame at full resolution (original behaviour)
+        # "downscale": whole frame resized by detection_scale
+        # "roi": only expanded regions around the faces being followed,
+        #        with a downscaled full sweep every full_sweep_interval calls
+        self.detection_strategy = "full"
+        self.detection_scale = 0.5
+        self.roi_margin = 0.5
+        self.full_sweep_interval = 5
+        self._detect_calls = 0
+
+        # Narrows the cascade size range to the learned face-size band
+        # (see scale_calibrator.stats() for the learned values)
+        self.scale_calibration = True
+        self.scale_calibrator = ScaleCalibrator()
+
+        # Canonical crops for recognition, enabled by load_model() unless
+        # the gallery was built from unaligned crops
+        self.aligner = FaceAligner()
+        self.alignment = True
         self.trained = False
         self.load_model()
 
         # Object Detection Initializaton
         self.net = None
-        if os.path.exists("MobileNetSSD_deploy.prototxt") and os.path.exists("MobileNetSSD_deploy.caffemodel"):
+        if (object_detection and os.path.exists("MobileNetSSD_deploy.prototxt")
+                and os.path.exists("MobileNetSSD_deploy.caffemodel")):
             self.net = cv2.dnn.readNetFromCaffe("MobileNetSSD_deploy.prototxt", "MobileNetSSD_deploy.caffemodel")
 
     def load_model(self):
-        if os.path.exists("trainer.yml"):
-            self.recognizer.read("trainer.yml")
+        # One-shot migration of the old text model
+        if not os.path.exists(GALLERY_PATH) and os.path.exists(LEGACY_MODEL_PATH):
+            print(f"Convirtiendo {LEGACY_MODEL_PATH} a {GALLERY_PATH}...")
+            convert_trainer_yml(LEGACY_MODEL_PATH, GALLERY_PATH)
+
+        gallery = GalleryStore(GALLERY_PATH, flags=FLAG_ALIGNED)
+        # A reload builds a new index and swaps it in, searches running
+        # meanwhile keep using the previous one
+        index = GalleryIndex(bins_per_cell=2 ** self.recognizer.getNeighbors(), path=INDEX_PATH)
+        if len(gallery) and not index.open(gallery):
+            print(f"Índice {INDEX_PATH} reconstruido desde {GALLERY_PATH}")
+        self.gallery, self.index = gallery, index
+        # Probes must be processed like the stored histograms
+        self.alignment = bool(self.gallery.flags & FLAG_ALIGNED)
+        if not self.alignment:
+            print("Galería sin alineación facial: vuelva a registrar a los empleados para activarla")
+        if len(self.gallery):
             self.trained = True
 
-    def train_model(self, faces, ids):
-        """Train model with preprocessed faces for better accuracy"""
+    def train_model(self, faces, ids, aligned=False):
+        """Train model with preprocessed faces for better accuracy.
+
+        `faces` are face crops, or canonical crops from align_faces() when
+        `aligned` is True.
+        """
         if not faces or not ids:
             return False
         
-        # Preprocess all faces before training
-        processed_faces = [self.preprocess_face(face) for face in faces]
+        # Canonical crops, then preprocess all faces before training
+        stack = np.empty((len(faces), FACE_SIZE[1], FACE_SIZE[0]), dtype=np.uint8)
+        for i, face in enumerate(faces):
+            if not aligned:
+                face = self.align_faces(face, [(0, 0, face.shape[1], face.shape[0])])[0]
+            stack[i] = self.preprocess_face(face)
         
         ids_array = np.array(ids, dtype=np.int32)
-        
-        if self.trained:
-            # Update existing model with new data
-            self.recognizer.update(processed_faces, ids_array)
-        else:
-            # First time training
-            self.recognizer.train(processed_faces, ids_array)
-            
-        self.recognizer.save("trainer.yml")
+
+        # Same histograms cv2's LBPH would store, appended to the gallery
+        # file without rewriting the existing employees
+        histograms = self.lbp_histograms(stack)
+        start = self.gallery.append(histograms, ids_array)
+
+        # Incremental insert into the gallery index, one call per run of
+        # rows of the same employee, then save its per-label data
+        for label in np.unique(ids_array):
+            positions = np.flatnonzero(ids_array == label)
+            for run in np.split(positions, np.flatnonzero(np.diff(positions) != 1) + 1):
+                first, end = start + int(run[0]), start + int(run[-1]) + 1
+                self.index.add(self.gallery.histograms[first:end], label,
+                               self.gallery.row_sums[first:end], first)
+        self.index.save(self.gallery)
+
         self.trained = True
         return True
 
-    def detect_faces(self, frame):
-        """Detect faces with standard parameters for maximum compatibility"""
+    def detect_faces(self, frame, hints=None):
+        """Detect faces with standard parameters for maximum compatibility.
+
+        `hints` are the boxes of faces already being followed; the "roi"
+        strategy searches only around them (see detection_strategy).
+        """
         gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
         
         # We removed equalizeHist here as it might interfere with some webcams/lighting conditions regarding the trained cascade
-        
+
+        self._detect_calls += 1
+        strategy = self.detection_strategy
+        if strategy == "roi":
+            full_sweep = not hints or self._detect_calls % self.full_sweep_interval == 0
+            if not full_sweep:
+                return self._detect_in_rois(gray, hints), gray
+            strategy = "downscale"
+
+        if strategy not in ("full", "downscale"):
+            raise ValueError(f"Unknown detection strategy: {strategy}")
+
+        now = time.time()
+        if self.scale_calibration:
+            min_side, max_side, calibrated = self.scale_calibrator.size_range(now)
+        else:
+            min_side, max_side, calibrated = 30, None, False
+
+        start = time.perf_counter()
+        scale = self.detection_scale if strategy == "downscale" else 1.0
+        faces = self._detect_scaled(gray, scale, min_side, max_side)
+        if self.scale_calibration:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.scale_calibrator.observe(faces, now, elapsed_ms, calibrated)
+        return faces, gray
+
+    def _detect(self, gray, min_size=(30, 30), max_size=None):
         # Standard parameters (original working values):
         # scaleFactor=1.1: standard step
         # minNeighbors=5: standard stability
@@ -91,10 +767,66 @@ class FaceEngine:
             gray, 
             scaleFactor=1.1, 
             minNeighbors=5, 
-            minSize=(30, 30),
+            minSize=min_size,
+            maxSize=max_size or (0, 0),
             flags=cv2.CASCADE_SCALE_IMAGE
         )
-        return faces, gray
+        return [tuple(int(v) for v in face) for face in faces]
+
+    def _detect_scaled(self, gray, scale, min_side=30, max_side=None):
+        """Detect on a frame resized by `scale` and map the boxes back.
+
+        min_side/max_side are face sizes in full-resolution pixels.
+        """
+        max_size = (max_side, max_side) if max_side else None
+        if scale >= 1.0:
+            return self._detect(gray, (min_side, min_side), max_size)
+        small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        # The cascade window is 24x24, smaller minimum sizes find nothing
+        min_side = max(24, int(min_side * scale))
+        if max_side:
+            max_size = (max(min_side, int(max_side * scale)),) * 2
+        return [tuple(int(round(v / scale)) for v in face)
+                for face in self._detect(small, (min_side, min_side), max_size)]
+
+    def _detect_in_rois(self, gray, hints):
+        """Search only expanded regions around the known face boxes"""
+        h_img, w_img = gray.shape[:2]
+        rois = []
+        for (x, y, w, h) in hints:
+            mx, my = int(w * self.roi_margin), int(h * self.roi_margin)
+            rois.append([max(0, x - mx), max(0, y - my), min(w_img, x + w + mx), min(h_img, y + h + my),
+                         min(w, h), max(w, h)])
+
+        # Merge overlapping regions so a face is never detected twice
+        merged = []
+        for roi in rois:
+            for other in merged:
+                if roi[0] < other[2] and other[0] < roi[2] and roi[1] < other[3] and other[1] < roi[3]:
+                    other[:4] = [min(roi[0], other[0]), min(roi[1], other[1]),
+                                 max(roi[2], other[2]), max(roi[3], other[3])]
+                    other[4], other[5] = min(roi[4], other[4]), max(roi[5], other[5])
+                    break
+            else:
+                merged.append(roi)
+
+        faces = []
+        for x0, y0, x1, y1, smallest, largest in merged:
+            # Faces move little between detections, bound the scan range
+            min_side = max(30, int(smallest * 0.6))
+            max_side = int(largest * 1.6)
+            for (x, y, w, h) in self._detect(gray[y0:y1, x0:x1], (min_side, min_side), (max_side, max_side)):
+                faces.append((x + x0, y + y0, w, h))
+        return faces
+
+    def align_faces(self, gray, boxes, points=None):
+        """Canonical FACE_SIZE crops of the face boxes (see FaceAligner).
+
+        The crops live in a reusable buffer, copy them to keep them.
+        """
+        if not self.alignment:
+            return self.aligner.align(gray, boxes, detect_eyes=False)
+        return self.aligner.align(gray, boxes, points)
 
     def preprocess_face(self, gray_face):
         """Preprocess face image - Simple version"""
@@ -106,21 +838,94 @@ class FaceEngine:
         """Identify face with preprocessing for better accuracy"""
         if not self.trained:
             return None, 100
-        
-        # Preprocess the face
-        processed_face = self.preprocess_face(gray_face)
-        
-        id_, confidence = self.recognizer.predict(processed_face)
-        
+
+        matches = self.identify_candidates(gray_face, k=1)
+        if not matches:
+            return None, 100
+        id_, confidence = matches[0]
+
         # LBPH confidence is distance (lower is better)
         # With our optimized parameters:
         # < 40: Excellent match
         # 40-50: Good match
         # 50-60: Fair match
         # > 60: Poor match (likely different person)
-        
+
         return id_, confidence
 
+    def identify_batch(self, gray, boxes, points=None):
+        """Identify every face box of a frame at once.
+
+        Crops are aligned to FACE_SIZE (using the Face Mesh `points` when
+        given) and equalized into one stack, LBP histograms are computed
+        with NumPy and looked up in the gallery index. Returns
+        [(id, distance), ...] in box order, with the same meaning as
+        identify().
+        """
+        if len(boxes) == 0:
+            return []
+        if not self.trained:
+            return [(None, 100)] * len(boxes)
+
+        stack = self.align_faces(gray, boxes, points)
+        for face in stack:
+            cv2.equalizeHist(face, dst=face)
+
+        probes = self.lbp_histograms(stack)
+        return [matches[0] if matches else (None, 100)
+                for matches in self.index.search(probes, k=1)]
+
+    def identify_candidates(self, gray_face, k=5):
+        """Top-k (id, distance) candidates for one face crop, best first"""
+        if not self.trained:
+            return []
+        face = self.align_faces(gray_face, [(0, 0, gray_face.shape[1], gray_face.shape[0])])
+        processed_face = self.preprocess_face(face[0])
+        return self.index.search(self.lbp_histograms(processed_face[None]), k=k)[0]
+
+    def lbp_histograms(self, faces):
+        """Spatial LBP histograms for a (N, H, W) uint8 stack, matching cv2.face.LBPH"""
+        radius = self.recognizer.getRadius()
+        neighbors = self.recognizer.getNeighbors()
+        grid_x = self.recognizer.getGridX()
+        grid_y = self.recognizer.getGridY()
+
+        # Extended (circular) LBP with the same bilinear sampling and
+        # float32 arithmetic as OpenCV's elbp()
+        src = faces.astype(np.float32)
+        n, rows, cols = faces.shape
+        out_h, out_w = rows - 2 * radius, cols - 2 * radius
+        center = src[:, radius:radius+out_h, radius:radius+out_w]
+        codes = np.zeros((n, out_h, out_w), dtype=np.int32)
+        for k in range(neighbors):
+            x = np.float32(radius * np.cos(2.0 * np.pi * k / float(neighbors)))
+            y = np.float32(-radius * np.sin(2.0 * np.pi * k / float(neighbors)))
+            fx, fy = int(np.floor(x)), int(np.floor(y))
+            cx, cy = int(np.ceil(x)), int(np.ceil(y))
+            tx, ty = x - np.float32(fx), y - np.float32(fy)
+            w1 = (1 - tx) * (1 - ty)
+            w2 = tx * (1 - ty)
+            w3 = (1 - tx) * ty
+            w4 = tx * ty
+
+            def shifted(dy, dx):
+                return src[:, radius+dy:radius+dy+out_h, radius+dx:radius+dx+out_w]
+
+            t = w1 * shifted(fy, fx) + w2 * shifted(fy, cx) + w3 * shifted(cy, fx) + w4 * shifted(cy, cx)
+            bit = (t > center) | (np.abs(t - center) < np.finfo(np.float32).eps)
+            codes |= bit.astype(np.int32) << k
+
+        # One normalized histogram per grid cell (2^neighbors bins each, so
+        # 4096 bins with neighbors=12), cells in row-major order
+        bins = 2 ** neighbors
+        cell_h, cell_w = out_h // grid_y, out_w // grid_x
+        cells = codes[:, :grid_y*cell_h, :grid_x*cell_w]
+        cells = cells.reshape(n, grid_y, cell_h, grid_x, cell_w).transpose(0, 1, 3, 2, 4)
+        cells = cells.reshape(n * grid_y * grid_x, cell_h * cell_w)
+        cells = cells + (np.arange(len(cells)) * bins)[:, None]
+        hist = np.bincount(cells.ravel(), minlength=n * grid_y * grid_x * bins)
+        return (hist.reshape(n, -1) / float(cell_h * cell_w)).astype(np.float32)
+
     def detect_objects(self, frame):
         if self.net is None:
             return []
@@ -150,24 +955,30 @@ class FaceEngine:
                 })
         return found_objects
 
-    def draw_face_mesh(self, frame):
-        if not MEDIAPIPE_AVAILABLE or self.face_mesh is None:
-            return frame
+    def face_landmarks(self, frame):
+        """Run Face Mesh on a BGR frame, returns the list of face landmarks"""
+        if self.face_mesh is None:
+            return []
         # Convert to RGB for MediaPipe
         rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
         results = self.face_mesh.process(rgb_frame)
-        
-        if results.multi_face_landmarks:
-            for face_landmarks in results.multi_face_landmarks:
-                self.mp_drawing.draw_landmarks(
-                    image=frame,
-                    landmark_list=face_landmarks,
-                    connections=self.mp_face_mesh.FACEMESH_CONTOURS,
-                    landmark_drawing_spec=None,
-                    connection_drawing_spec=self.mp_drawing.DrawingSpec(thickness=1, color=(0, 255, 0))
-                )
+        return results.multi_face_landmarks or []
+
+    def draw_landmarks(self, frame, landmarks):
+        """Draw landmarks returned by face_landmarks() on a frame"""
+        for face_landmarks in landmarks:
+            self.mp_drawing.draw_landmarks(
+                image=frame,
+                landmark_list=face_landmarks,
+                connections=self.mp_face_mesh.FACEMESH_CONTOURS,
+                landmark_drawing_spec=None,
+                connection_drawing_spec=self.mp_drawing.DrawingSpec(thickness=1, color=(0, 255, 0))
+            )
         return frame
 
+    def draw_face_mesh(self, frame):
+        return self.draw_landmarks(frame, self.face_landmarks(frame))
+
     def capture_training_images(self, cap, employee_id, count=30):
         # Helper to capture multiple shots of a new employee
         faces_data = []
@@ -179,9 +990,10 @@ class FaceEngine:
             if not ret: break
             
             faces, gray = self.detect_faces(frame)
-            for (x, y, w, h) in faces:
-                face_roi = gray[y:y+h, x:x+w]
-                faces_data.append(face_roi)
+            # Aligned in the full frame, before the margin is cropped away
+            aligned = self.align_faces(gray, faces).copy()
+            for (x, y, w, h), face in zip(faces, aligned):
+                faces_data.append(face)
                 ids_data.append(employee_id)
                 captured += 1
                 # Draw progress
@@ -190,4 +1002,4 @@ class FaceEngine:
             # This would be shown in the UI
             yield frame, captured
 
-        self.train_model(faces_data, ids_data)
+        self.train_model(faces_data, ids_data, aligned=True)
@@ -0,0 +1,119 @@
+import threading
+import time
+from collections import namedtuple
+import numpy as np
+
+FramePacket = namedtuple("FramePacket", "seq timestamp image slot")
+
+
+class FrameBuffer:
+    """Latest-frame-wins buffer between a capture thread and its consumers.
+
+    Frames are copied into preallocated slots and stamped with a sequence
+    number and capture time. Consumers always get the newest frame: frames
+    nobody read before a newer one arrived are dropped (and counted), never
+    queued. A consumer holds a lease on the slot until release(), so the
+    writer never overwrites a frame that is still being processed. Use
+    `slots` >= number of concurrent consumers + 2.
+    """
+
+    def __init__(self, slots=5):
+        self._slots = [None] * slots
+        self._leases = [0] * slots
+        self._seq = [0] * slots
+        self._stamp = [0.0] * slots
+        self._latest = None
+        self._latest_read = True
+        self._cond = threading.Condition()
+        self.closed = False
+
+        # Counters
+        self.written = 0    # frames published
+        self.reads = 0      # frames handed to consumers
+        self.dropped = 0    # published frames replaced before anyone read them
+        self.overruns = 0   # frames discarded because every slot was busy
+
+    def put(self, frame, timestamp=None):
+        """Publish a frame (single writer), returns its sequence number"""
+        if timestamp is None:
+            timestamp = time.time()
+        with self._cond:
+            slot = self._free_slot()
+            if slot is None:
+                self.overruns += 1
+                return None
+            self._leases[slot] += 1  # Reserved while copying
+
+        buf = self._slots[slot]
+        if buf is None or buf.shape != frame.shape or buf.dtype != frame.dtype:
+            buf = self._slots[slot] = np.empty_like(frame)
+        np.copyto(buf, frame)
+
+        with self._cond:
+            self._leases[slot] -= 1
+            self.written += 1
+            if self._latest is not None and not self._latest_read:
+                self.dropped += 1
+            self._latest = slot
+            self._latest_read = False
+            self._seq[slot] = self.written
+            self._stamp[slot] = timestamp
+            self._cond.notify_all()
+            return self.written
+
+    def acquire(self, after_seq=0, timeout=None):
+        """Lease the newest frame with seq > after_seq.
+
+        Blocks up to `timeout` seconds (0 polls, None waits forever) and
+        returns a FramePacket with a read-only image, or None on timeout or
+        close. Every packet must be given back with release().
+        """
+        with self._cond:
+            ready = self._cond.wait_for(
+                lambda: self.closed or (self._latest is not None and self._seq[self._latest] > after_seq),
+                timeout)
+            if not ready or self.closed:
+                return None
+            slot = self._latest
+            self._leases[slot] += 1
+            self._latest_read = True
+            self.reads += 1
+            image = self._slots[slot].view()
+            image.flags.writeable = False
+            return FramePacket(self._seq[slot], self._stamp[slot], image, slot)
+
+    def release(self, packet):
+        with self._cond:
+            self._leases[packet.slot] -= 1
+
+    def read(self, after_seq=0, timeout=None):
+        """Copy of the newest frame as (seq, timestamp, image) or None"""
+        packet = self.acquire(after_seq, timeout)
+        if packet is None:
+            return None
+        try:
+            return packet.seq, packet.timestamp, packet.image.copy()
+        finally:
+            self.release(packet)
+
+    def close(self):
+        """Wake up every waiting consumer, acquire() returns None from now on"""
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {
+                "written": self.written,
+                "reads": self.reads,
+                "dropped": self.dropped,
+                "overruns": self.overruns,
+                "latest_seq": self._seq[self._latest] if self._latest is not None else 0,
+            }
+
+    def _free_slot(self):
+        for slot, leases in enumerate(self._leases):
+            if slot != self._latest and leases == 0:
+                return slot
+        return None
@@ -0,0 +1,75 @@
+import cv2
+import numpy as np
+from PyQt6.QtGui import QImage, QPixmap
+
+
+class FrameView:
+    """Shows OpenCV BGR frames on a QLabel without copies in Qt.
+
+    Each frame is converted once by OpenCV (cv2.cvtColor BGR -> BGRA, after
+    a cv2.resize when it does not fit the label or `size`) into a buffer
+    reused across frames. Its bytes are the native Format_RGB32 layout, so
+    the QImage wrapping it needs no conversion and QPixmap.fromImage()
+    shares the pixels instead of copying them.
+
+    Because the label's pixmap points into the buffer, there are two
+    buffers used in turns: a frame is never written over the one on
+    screen. Buffers and their QImages are rebuilt only when the label or
+    frame size changes, and the old ones are kept alive until the label
+    shows a pixmap of the new ones.
+    """
+
+    def __init__(self, label, size=None):
+        self.label = label
+        self.size = size  # fixed (width, height), or None to follow the label
+        self._key = None
+        self._target = None
+        self._scaled = None    # BGR scratch for cv2.resize
+        self._buffers = []     # (BGRA array, QImage wrapping it)
+        self._retired = None
+        self._next = 0
+
+        # Counters
+        self.frames = 0
+        self.rebuilds = 0
+
+    def show(self, frame):
+        fh, fw = frame.shape[:2]
+        if self.size is not None:
+            bw, bh = self.size
+        else:
+            # Outer size, as the old fixed 640x480 fit: a styled border
+            # must not force a resize of every camera frame
+            bw, bh = self.label.width(), self.label.height()
+        key = (fw, fh, bw, bh)
+        if key != self._key:
+            self._rebuild(key)
+
+        buffer, image = self._buffers[self._next]
+        self._next = 1 - self._next
+        if self._scaled is not None:
+            frame = cv2.resize(frame, self._target, dst=self._scaled, interpolation=cv2.INTER_LINEAR)
+        cv2.cvtColor(frame, cv2.COLOR_BGR2BGRA, dst=buffer)
+        self.label.setPixmap(QPixmap.fromImage(image))
+        # The label no longer shows a pixmap of the previous buffers
+        self._retired = None
+        self.frames += 1
+
+    def stats(self):
+        return {"frames": self.frames, "rebuilds": self.rebuilds, "target": self._target}
+
+    def _rebuild(self, key):
+        fw, fh, bw, bh = key
+        # Same fit as QImage.scaled(..., KeepAspectRatio)
+        scale = min(bw / fw, bh / fh) if bw > 0 and bh > 0 else 1.0
+        tw, th = max(1, int(fw * scale)), max(1, int(fh * scale))
+        self._key = key
+        self._target = (tw, th)
+        self._scaled = None if (tw, th) == (fw, fh) else np.empty((th, tw, 3), np.uint8)
+        self._retired = self._buffers
+        self._buffers = []
+        for _ in range(2):
+            buffer = np.empty((th, tw, 4), np.uint8)
+            self._buffers.append((buffer, QImage(buffer.data, tw, th, tw * 4, QImage.Format.Format_RGB32)))
+        self._next = 0
+        self.rebuilds += 1
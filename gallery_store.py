@@ -0,0 +1,142 @@
+import os
+import struct
+import sys
+import numpy as np
+
+# File layout (little endian):
+#   header   64 bytes: magic, version, dtype code, dim, count, flags, file id
+#   rows     count records of label int32, 4 reserved bytes, row sum float64
+#            and histogram dtype[dim], appended at the end of the file
+# Every row carries its own label and sum, so new employees only append
+# records and then bump `count` in the header: existing data is never
+# rewritten or moved, and mappings of the file stay valid. The random file
+# id tells data derived from the gallery (the index sidecar) which file it
+# belongs to.
+MAGIC = b"FTGALLRY"
+VERSION = 1
+HEADER = struct.Struct("<8sIIQQI16s12x")
+DTYPES = {0: np.dtype("<f4"), 1: np.dtype("<f2")}
+DTYPE_CODES = {v: k for k, v in DTYPES.items()}
+
+# Histograms were computed on aligned canonical crops (see FaceAligner)
+FLAG_ALIGNED = 1
+
+
+class GalleryStore:
+    """Compact binary store of LBPH histograms, opened with np.memmap."""
+
+    def __init__(self, path, dtype=np.float16, flags=0):
+        self.path = path
+        self.dtype = np.dtype(dtype).newbyteorder("<")
+        self.dim = 0
+        self.count = 0
+        # Only used for new files, existing files keep their own
+        self.flags = flags
+        self.file_id = os.urandom(16)
+        if os.path.exists(path):
+            self._read_header()
+        self._map()
+
+    @property
+    def record(self):
+        return np.dtype([("label", "<i4"), ("reserved", "<i4"), ("sum", "<f8"),
+                         ("histogram", self.dtype, (self.dim,))])
+
+    def __len__(self):
+        return self.count
+
+    def append(self, histograms, labels):
+        """Append (n, dim) histograms with n labels, returns the first new row"""
+        labels = np.asarray(labels, dtype="<i4").ravel()
+        if len(histograms) != len(labels):
+            raise ValueError("histograms and labels must have the same length")
+        if self.dim == 0:
+            self.dim = histograms.shape[1]
+        elif histograms.shape[1] != self.dim:
+            raise ValueError(f"expected {self.dim} bins per histogram, got {histograms.shape[1]}")
+
+        if not os.path.exists(self.path):
+            self._write_empty()
+
+        start = self.count
+        with open(self.path, "r+b") as f:
+            f.seek(HEADER.size + start * self.record.itemsize)
+            f.write(self._records(histograms, labels).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+            # The header count is the commit point
+            self.count = start + len(labels)
+            f.seek(0)
+            f.write(self._header())
+            f.flush()
+            os.fsync(f.fileno())
+
+        self._map()
+        return start
+
+    def _records(self, histograms, labels):
+        records = np.zeros(len(labels), dtype=self.record)
+        records["label"] = labels
+        records["histogram"] = histograms
+        # Sums of the stored (rounded) values, as chi_square() needs them
+        records["sum"] = records["histogram"].sum(axis=1, dtype=np.float64)
+        return records
+
+    def _header(self):
+        return HEADER.pack(MAGIC, VERSION, DTYPE_CODES[self.dtype], self.dim,
+                           self.count, self.flags, self.file_id)
+
+    def _read_header(self):
+        with open(self.path, "rb") as f:
+            header = f.read(HEADER.size)
+        magic, version, code, dim, count, flags, file_id = HEADER.unpack(header)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{self.path} is not a gallery file (version {VERSION})")
+        self.dtype = DTYPES[code]
+        self.dim = dim
+        self.count = count
+        self.flags = flags
+        self.file_id = file_id
+
+    def _write_empty(self):
+        with open(self.path, "wb") as f:
+            f.write(self._header())
+
+    def _map(self):
+        """Memory-map labels, row sums and histograms, O(1) regardless of size"""
+        if self.count == 0:
+            self.labels = np.zeros(0, dtype="<i4")
+            self.row_sums = np.zeros(0)
+            self.histograms = np.zeros((0, self.dim), dtype=self.dtype)
+            return
+        records = np.memmap(self.path, dtype=self.record, mode="r",
+                            offset=HEADER.size, shape=(self.count,))
+        self.labels = records["label"]
+        self.row_sums = records["sum"]
+        self.histograms = records["histogram"]
+
+
+def convert_trainer_yml(yml_path, gallery_path, dtype=np.float16):
+    """One-shot conversion of a cv2 LBPH trainer.yml into a gallery file"""
+    import cv2
+
+    recognizer = cv2.face.LBPHFaceRecognizer_create()
+    recognizer.read(yml_path)
+    histograms = recognizer.getHistograms()
+    labels = np.asarray(recognizer.getLabels()).ravel()
+
+    store = GalleryStore(gallery_path, dtype=dtype)
+    if len(store):
+        raise ValueError(f"{gallery_path} already contains data")
+    # Append in chunks to keep memory bounded on large models
+    for start in range(0, len(histograms), 256):
+        chunk = np.vstack([h.reshape(1, -1) for h in histograms[start:start+256]])
+        store.append(chunk, labels[start:start+256])
+    return store
+
+
+if __name__ == "__main__":
+    src = sys.argv[1] if len(sys.argv) > 1 else "trainer.yml"
+    dst = sys.argv[2] if len(sys.argv) > 2 else "gallery.bin"
+    store = convert_trainer_yml(src, dst)
+    print(f"{src} -> {dst}: {len(store)} histogramas de {store.dim} bins")
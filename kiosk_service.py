@@ -0,0 +1,362 @@
+"""Headless attendance kiosk: camera -> detect -> identify -> attendance.
+
+Runs the same FacePipeline and database code as the desktop apps without
+any GUI toolkit (no PyQt6, flet, qtawesome or pyttsx3), for edge boxes
+that drive a door panel. The panel talks to a small JSON API on
+127.0.0.1:
+
+    GET  /status          state, counters and last recognition/punch
+    GET  /events          last punches (newest first)
+    POST /mode?action=X   IN, OUT or auto (IN/OUT from the last punch)
+    POST /reload          reload gallery.bin after new registrations
+    POST /stop            graceful shutdown
+
+SIGINT/SIGTERM stop the service (pending punches are written first),
+SIGHUP reloads the gallery.
+
+    python kiosk_service.py --source 0
+    python kiosk_service.py --source entrada.mp4 --port 8787
+"""
+import argparse
+import json
+import signal
+import sys
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+import cv2
+
+from database_manager import DatabaseManager
+from db_executor import DatabaseExecutor
+from face_engine import FaceEngine
+from frame_buffer import FrameBuffer
+from pipeline import FacePipeline
+
+# Same recognition threshold as the desktop apps
+CONFIDENCE_THRESHOLD = 65
+
+
+def punch_status(action_type, now):
+    """Same schedule rule as the desktop apps: IN after 09:15 is late"""
+    if action_type == "IN" and (now.hour > 9 or (now.hour == 9 and now.minute > 15)):
+        return "LATE"
+    return "ON_TIME"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.0"
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        if path == "/status":
+            self._reply(200, self.server.kiosk.status())
+        elif path == "/events":
+            self._reply(200, self.server.kiosk.recent_events())
+        else:
+            self._reply(404, {"error": "no encontrado"})
+
+    def do_POST(self):
+        url = urlsplit(self.path)
+        kiosk = self.server.kiosk
+        if url.path == "/mode":
+            action = parse_qs(url.query).get("action", [""])[0]
+            if kiosk.set_mode(action):
+                self._reply(200, {"mode": kiosk.mode})
+            else:
+                self._reply(400, {"error": "action debe ser IN, OUT o auto"})
+        elif url.path == "/reload":
+            kiosk.request_reload()
+            self._reply(202, {"reload": True})
+        elif url.path == "/stop":
+            kiosk.stop()
+            self._reply(202, {"stopping": True})
+        else:
+            self._reply(404, {"error": "no encontrado"})
+
+    def _reply(self, code, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class KioskService:
+    """Recognition loop plus punch logic, without any UI.
+
+    The capture thread keeps grabbing frames (so the camera never serves
+    stale ones) but only decodes them when the loop is due for a new one:
+    `fps` while someone is in view, `idle_fps` after `idle_after` seconds
+    without faces. Each committed identity (see IdentityVoter) punches once
+    per visit: a new track of an employee seen less than `presence_gap`
+    seconds ago (the tracker lost the face, the person is still there) does
+    not punch again. DatabaseManager rejects repeats within its cooldown.
+    """
+
+    def __init__(self, source=0, db_path="attendance.db", fps=10.0, idle_fps=2.0, idle_after=5.0,
+                 mode="auto", width=640, height=480, presence_gap=10.0):
+        self.source = source
+        self.fps = fps
+        self.idle_fps = idle_fps
+        self.idle_after = idle_after
+        self.presence_gap = presence_gap
+        self.mode = mode
+        self.width = width
+        self.height = height
+
+        self.db = DatabaseManager(db_path)
+        self.db_executor = DatabaseExecutor(self.db)
+        self.engine = FaceEngine(face_mesh=False, object_detection=False)
+        self.pipeline = FacePipeline(self.engine)
+
+        self.frame_buffer = None
+        self._stop_event = threading.Event()
+        self._reload = threading.Event()
+        self._lock = threading.Lock()
+        self._interval = 1.0 / fps
+        self._punched_tracks = set()
+        self._present = {}  # employee_id -> last time seen with a committed identity
+        self._events = deque(maxlen=20)
+        self._last_face = 0.0
+
+        # Counters
+        self.started = None
+        self.frames = 0
+        self.captured = 0
+        self.recognitions = 0
+        self.punches = 0
+        self.rejected = 0
+        self.last_recognition = None
+
+    # --- control -----------------------------------------------------
+
+    def set_mode(self, action):
+        if action not in ("IN", "OUT", "auto"):
+            return False
+        self.mode = action
+        return True
+
+    def request_reload(self):
+        self._reload.set()
+
+    def stop(self):
+        self._stop_event.set()
+        if self.frame_buffer:
+            self.frame_buffer.close()
+
+    def status(self):
+        with self._lock:
+            return {
+                "running": not self._stop_event.is_set(),
+                "source": str(self.source),
+                "mode": self.mode,
+                "uptime": round(time.time() - self.started, 1) if self.started else 0,
+                "idle": self._interval > 1.0 / self.fps,
+                "frames_captured": self.captured,
+                "frames_processed": self.frames,
+                "recognitions": self.recognitions,
+                "punches": self.punches,
+                "rejected": self.rejected,
+                "last_recognition": self.last_recognition,
+                "database": self.db_executor.stats(),
+                "directory": self.db.directory.stats(),
+            }
+
+    def recent_events(self):
+        with self._lock:
+            return list(self._events)
+
+    # --- loop --------------------------------------------------------
+
+    def run(self):
+        """Run until stop() or the end of a video file"""
+        if isinstance(self.source, int) and sys.platform == "win32":
+            cap = cv2.VideoCapture(self.source, cv2.CAP_DSHOW)  # same backend as the apps
+        else:
+            cap = cv2.VideoCapture(self.source)
+        if not cap.isOpened():
+            print(f"Error: no se pudo abrir la fuente de video {self.source}")
+            return False
+        cap.set(cv2.CAP_PROP_FRAME_WIDTH, self.width)
+        cap.set(cv2.CAP_PROP_FRAME_HEIGHT, self.height)
+        # A file is read at its own frame rate, a camera paces itself
+        file_fps = cap.get(cv2.CAP_PROP_FPS) if isinstance(self.source, str) else 0
+
+        self.started = time.time()
+        self.db_executor.start()
+        self.db_executor.submit(self.db.directory.warm)
+        self.frame_buffer = FrameBuffer(slots=3)
+        capture = threading.Thread(target=self._capture_loop, args=(cap, self.frame_buffer, file_fps),
+                                   daemon=True)
+        capture.start()
+        print(f"Kiosco iniciado ({self.source}), modo {self.mode}")
+
+        last_seq = 0
+        try:
+            while not self._stop_event.is_set():
+                if self._reload.is_set():
+                    self._reload.clear()
+                    self.engine.load_model()
+                    print("Galería recargada")
+                latest = self.frame_buffer.read(last_seq)
+                if latest is None:
+                    break
+                last_seq, timestamp, frame = latest
+                self._process(frame, timestamp)
+        finally:
+            self.stop()
+            capture.join(timeout=2)
+            # Pending punches are written (or left in the journal) before exit
+            self.db_executor.stop()
+            self.db.close()
+            print("Kiosco detenido")
+        return True
+
+    def _capture_loop(self, cap, frame_buffer, file_fps):
+        next_frame = 0.0
+        start = time.monotonic()
+        grabbed = 0
+        while not self._stop_event.is_set():
+            if not cap.grab():
+                break
+            grabbed += 1
+            now = time.monotonic()
+            if file_fps:
+                # Replay in real time, like a camera would deliver it
+                time.sleep(max(0.0, start + grabbed / file_fps - now))
+                now = time.monotonic()
+            if now < next_frame:
+                continue  # grabbed but never decoded
+            ok, frame = cap.retrieve()
+            if not ok:
+                break
+            next_frame = now + self._interval
+            frame_buffer.put(frame)
+            with self._lock:
+                self.captured += 1
+        frame_buffer.close()
+        cap.release()
+
+    def _process(self, frame, timestamp):
+        result = self.pipeline.process(frame, timestamp)
+        now = time.time()
+        if result["faces"]:
+            self._last_face = now
+        # Drop to idle_fps while nobody is in front of the camera
+        idle = now - self._last_face > self.idle_after
+        self._interval = 1.0 / (self.idle_fps if idle else self.fps)
+
+        live = set(result["track_ids"])
+        self._punched_tracks &= live
+        self._present = {e: seen for e, seen in self._present.items() if now - seen <= self.presence_gap}
+        for track_id, (employee_id, conf) in zip(result["track_ids"], result["identities"]):
+            if employee_id is None or conf >= CONFIDENCE_THRESHOLD:
+                continue
+            still_here = employee_id in self._present
+            self._present[employee_id] = now
+            if track_id in self._punched_tracks:
+                continue
+            self._punched_tracks.add(track_id)
+            # Same visit on a new track: no second punch (the opposite
+            # action in auto mode) until the face has left for a while
+            if not still_here:
+                self._punch(employee_id, conf)
+        with self._lock:
+            self.frames += 1
+
+    def _punch(self, employee_id, conf):
+        name = self.db.directory.name(employee_id)
+        action_type = self.mode
+        if action_type == "auto":
+            last = self.db.directory.last_attendance(employee_id)
+            action_type = "OUT" if last and last[0] == "IN" and self._same_day(last[1]) else "IN"
+        now = datetime.now()
+        status = punch_status(action_type, now)
+        with self._lock:
+            self.recognitions += 1
+            self.last_recognition = {"employee_id": employee_id, "name": name,
+                                     "confidence": round(float(conf), 1), "time": now.strftime("%H:%M:%S")}
+        future = self.db_executor.mark_attendance(employee_id, action_type, status)
+        future.add_done_callback(
+            lambda f: self._punched(f, employee_id, name, action_type, status, now))
+
+    def _punched(self, future, employee_id, name, action_type, status, now):
+        try:
+            ok = future.result()
+        except Exception as e:
+            print(f"Error al registrar asistencia: {e}")
+            return
+        action_text = "Entrada" if action_type == "IN" else "Salida"
+        with self._lock:
+            if ok:
+                self.punches += 1
+                self._events.appendleft({"employee_id": employee_id, "name": name, "action": action_type,
+                                         "status": status, "time": now.strftime("%Y-%m-%d %H:%M:%S")})
+            else:
+                self.rejected += 1
+        if ok:
+            print(f"{action_text} registrada: {name} ({status})")
+        else:
+            print(f"Marca repetida, no se registró: {name}")
+
+    @staticmethod
+    def _same_day(timestamp):
+        # Stored timestamps are UTC, compare local dates
+        stored = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S")
+        local = stored.replace(tzinfo=timezone.utc).astimezone()
+        return local.date() == datetime.now().date()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Kiosco de asistencia sin interfaz gráfica")
+    parser.add_argument("--source", default="0", help="índice de cámara o ruta/URL de video (por defecto 0)")
+    parser.add_argument("--db", default="attendance.db", help="base de datos SQLite")
+    parser.add_argument("--host", default="127.0.0.1", help="dirección de la API de control")
+    parser.add_argument("--port", type=int, default=8787, help="puerto de la API de control (0 = sin API)")
+    parser.add_argument("--fps", type=float, default=10.0, help="cuadros procesados por segundo con gente")
+    parser.add_argument("--idle-fps", type=float, default=2.0, help="cuadros por segundo sin rostros")
+    parser.add_argument("--mode", default="auto", choices=["auto", "IN", "OUT"], help="tipo de marca")
+    args = parser.parse_args(argv)
+
+    source = int(args.source) if args.source.isdigit() else args.source
+    kiosk = KioskService(source, db_path=args.db, fps=args.fps, idle_fps=args.idle_fps, mode=args.mode)
+
+    server = None
+    if args.port:
+        server = _Server((args.host, args.port), _Handler)
+        server.kiosk = kiosk
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        print(f"API de control en http://{args.host}:{server.server_address[1]}/status")
+
+    def on_signal(signum, frame):
+        print("Deteniendo kiosco...")
+        kiosk.stop()
+
+    signal.signal(signal.SIGINT, on_signal)
+    signal.signal(signal.SIGTERM, on_signal)
+    if hasattr(signal, "SIGHUP"):
+        signal.signal(signal.SIGHUP, lambda signum, frame: kiosk.request_reload())
+
+    try:
+        ok = kiosk.run()
+    finally:
+        if server:
+            server.shutdown()
+            server.server_close()
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
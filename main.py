@@ -7,19 +7,43 @@ from flet import (
     TextButton, MainAxisAlignment, ThemeMode, BoxFit, Icon
 )
 import cv2
-import base64
 import numpy as np
 import time
 import threading
-from database_manager import DatabaseManager
+from database_manager import DatabaseManager, LOADING
+from db_executor import DatabaseExecutor
 from face_engine import FaceEngine
+from frame_buffer import FrameBuffer
+from mjpeg_server import MJPEGServer, PreviewController
+from pipeline import FacePipeline
 from styles import AppColors, AppStyles
 
+REPORT_PAGE_SIZE = 200
+# The video Image gets one /frame.jpg URL of the preview server per frame
+# (a short string in the update instead of the whole JPEG in base64),
+# which every Flet target can load. True points it at the MJPEG stream
+# instead, so frames need no page update at all: only for targets whose
+# Image is known to play multipart/x-mixed-replace (a browser through
+# ft.app(main, view=ft.AppView.WEB_BROWSER)).
+PREVIEW_STREAM = False
+
 class AttendanceApp:
     def __init__(self, page: ft.Page):
         self.page = page
         self.db = DatabaseManager()
+        # Handlers queue their SQLite work here instead of waiting for it
+        self.db_executor = DatabaseExecutor(self.db)
+        self.db_executor.start()
+        # Employee names and last punches for the recognition loop,
+        # lookups that miss are loaded there too instead of in the loop
+        self.db.directory.loader = self.db_executor.submit
+        self.db_executor.submit(self.db.directory.warm)
         self.engine = FaceEngine()
+        self.pipeline = FacePipeline(self.engine)
+        # Camera preview over local HTTP instead of the Flet websocket,
+        # quality/size/fps follow the client (settings in /stats.json)
+        self.preview = MJPEGServer(controller=PreviewController()).start()
+        self.preview_seq = 0
         self.page.title = "FaceTrack Pro - Personnel Management"
         self.page.theme_mode = ThemeMode.DARK
         self.page.bgcolor = AppColors.BACKGROUND
@@ -28,11 +52,31 @@ class AttendanceApp:
         
         self.running = False
         self.cap = None
+        self.frame_buffer = None
+        self.capture_thread = None
         self.detected_employee_id = None
         self.detected_employee_name = None
         
         self.init_ui()
 
+    def db_call(self, callback, fn, *args):
+        """Run a DatabaseManager call on the database thread.
+
+        `callback` gets the result on that thread, so it must only touch
+        controls and call page.update().
+        """
+        future = self.db_executor.submit(fn, *args)
+        future.add_done_callback(lambda f: self._db_done(callback, f))
+        return future
+
+    def _db_done(self, callback, future):
+        try:
+            result = future.result()
+        except Exception as e:
+            print(f"Error de base de datos: {e}")
+            return
+        callback(result)
+
     def init_ui(self):
         # Sidebar Navigation
         self.rail = NavigationRail(
@@ -80,9 +124,13 @@ class AttendanceApp:
 
     def stop_camera(self):
         self.running = False
-        if self.cap:
-            self.cap.release()
-            self.cap = None
+        if self.frame_buffer:
+            self.frame_buffer.close()
+        # capture_thread releases the device when its loop ends
+        if self.capture_thread:
+            self.capture_thread.join(timeout=1)
+            self.capture_thread = None
+        self.cap = None
 
     def show_dashboard(self):
         # Use a local placeholder image to avoid 'src' error
@@ -179,41 +227,70 @@ class AttendanceApp:
             return
 
         self.running = True
+        self.pipeline.reset()
+        self.frame_buffer = FrameBuffer()
         # Do not clear src, as it causes a validation error in some Flet versions
+        self.show_preview()
         self.page.update()
-        threading.Thread(target=self.video_feed_thread, daemon=True).start()
+        self.capture_thread = threading.Thread(target=self.capture_loop, args=(self.cap, self.frame_buffer), daemon=True)
+        self.capture_thread.start()
+        threading.Thread(target=self.video_feed_thread, args=(self.frame_buffer,), daemon=True).start()
 
-    def video_feed_thread(self):
+    def show_preview(self):
+        """Point the video Image at the preview server"""
+        if PREVIEW_STREAM:
+            self.video_image.src = self.preview.stream_url
+
+    def publish_preview(self, frame):
+        seq = self.preview.publish(frame)
+        if not PREVIEW_STREAM and seq != self.preview_seq:
+            self.video_image.src = self.preview.frame_url(seq)
+            self.video_image.update()
+        self.preview_seq = seq
+
+    def capture_loop(self, cap, frame_buffer):
+        """Read the camera into the frame buffer until the camera is stopped"""
+        while self.running and cap.isOpened():
+            ret, frame = cap.read()
+            if not ret: break
+            frame_buffer.put(frame)
+        frame_buffer.close()
+        cap.release()
+
+    def video_feed_thread(self, frame_buffer):
         last_found_id = None
         cooldown = 0
         frame_count = 0
+        last_seq = 0
         
-        while self.running and self.cap.isOpened():
-            ret, frame = self.cap.read()
-            if not ret: break
+        while self.running:
+            # Always process the newest captured frame, never a backlog
+            latest = frame_buffer.read(last_seq)
+            if latest is None: break
+            last_seq, _, frame = latest
             frame_count += 1
 
-            # Process frame
-            faces, gray = self.engine.detect_faces(frame)
+            # Process frame (detection + tracking, LBPH only for new tracks)
+            result = self.pipeline.process(frame)
+            faces = result["faces"]
             if len(faces) > 0:
                 print(f"Rostros detectados: {len(faces)}")
             
             face_detected = False
-            for (x, y, w, h) in faces:
+            for (x, y, w, h), (id_, conf) in zip(faces, result["identities"]):
                 cv2.rectangle(frame, (x, y), (x+w, y+h), (99, 102, 241), 2) # Theme color
                 
-                # Recognize
-                id_, conf = self.engine.identify(gray[y:y+h, x:x+w])
-                
                 if id_ and conf < 65: # Confidence threshold - Increased for better tolerance
                     face_detected = True
+                    employee_name = self.db.directory.name(id_, wait=False)
                     # Found someone! Update UI but don't register yet
-                    if id_ != last_found_id or time.time() > cooldown:
+                    # (again once a name that was loading arrives)
+                    if (id_ != last_found_id or time.time() > cooldown
+                            or employee_name != self.detected_employee_name):
                         self.update_detected_employee(id_)
                         last_found_id = id_
                         cooldown = time.time() + 3 # 3 sec cooldown for UI updates
                         
-                    employee_name = self.db.get_employee_name(id_)
                     cv2.putText(frame, f"{employee_name} ({int(conf)})", (x, y-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
                 else:
                     cv2.putText(frame, "Desconocido", (x, y-10), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
@@ -223,45 +300,47 @@ class AttendanceApp:
                 self.clear_detected_employee()
 
             try:
-                # Convert to base64 for Flet (using lower quality for speed)
-                _, buffer = cv2.imencode(".jpg", frame, [int(cv2.IMWRITE_JPEG_QUALITY), 70])
-                img_base64 = base64.b64encode(buffer).decode("utf-8")
-                self.video_image.src_base64 = img_base64
+                # The Image reads the stream itself, the page is only
+                # updated when the detection state changes
+                self.publish_preview(frame)
                 
                 # Visual feedback that loop is running
                 if frame_count % 10 == 0:
                     self.status_text.value = f"Cámara activa - Feed OK ({frame_count})"
                     self.status_text.update()
-                
-                self.page.update() # Full page update ensures the image visibility changes are rendered
             except Exception as ex:
                 if self.running:
                     print(f"Feed error: {ex}")
                 break
-            time.sleep(0.01)
 
     def update_detected_employee(self, employee_id):
         """Update UI with detected employee information"""
         self.detected_employee_id = employee_id
-        self.detected_employee_name = self.db.get_employee_name(employee_id)
-        
-        # Get last access
-        last_access = self.db.get_last_attendance(employee_id)
+        self.detected_employee_name = self.db.directory.name(employee_id, wait=False)
         
         # Update UI
         self.employee_name_text.value = self.detected_employee_name
-        if last_access:
-            action_type = "Entrada" if last_access[0] == "IN" else "Salida"
-            self.last_access_text.value = f"Último acceso: {action_type}\n{last_access[1]}"
-        else:
-            self.last_access_text.value = "Sin registros previos"
+        self.show_last_access(employee_id, self.db.directory.last_attendance(employee_id, wait=False))
         
         # Show buttons
         self.btn_entrada.visible = True
         self.btn_salida.visible = True
         self.status_text.value = "Empleado detectado - Seleccione acción"
         self.status_text.color = AppColors.PRIMARY
+        self.page.update()
         
+    def show_last_access(self, employee_id, last_access):
+        if self.detected_employee_id != employee_id:
+            return
+        if last_access is LOADING:
+            self.last_access_text.value = "Último acceso: cargando..."
+        elif last_access:
+            action_type = "Entrada" if last_access[0] == "IN" else "Salida"
+            self.last_access_text.value = f"Último acceso: {action_type}\n{last_access[1]}"
+        else:
+            self.last_access_text.value = "Sin registros previos"
+        self.page.update()
+
     def clear_detected_employee(self):
         """Clear detected employee info when face is lost"""
         self.detected_employee_id = None
@@ -272,6 +351,7 @@ class AttendanceApp:
         self.btn_salida.visible = False
         self.status_text.value = "Esperando cara..."
         self.status_text.color = AppColors.TEXT_SECONDARY
+        self.page.update()
         
     def register_access(self, action_type):
         """Register attendance when user clicks entrada/salida"""
@@ -292,11 +372,27 @@ class AttendanceApp:
         else:
             status_color = AppColors.SUCCESS
 
-        # Update DB
-        self.db.add_attendance(employee_id, action_type, status)
+        # Update DB (journaled and written in a batch by the executor)
+        name = self.detected_employee_name
+        punch_time = time.strftime('%H:%M:%S')
+        future = self.db_executor.mark_attendance(employee_id, action_type, status)
+        future.add_done_callback(lambda f: self._db_done(
+            lambda res: self.on_access_registered(res, name, action_type, status, status_color, punch_time), f))
         
+        # Clear detection after registration
+        self.clear_detected_employee()
+        self.status_text.value = "Registrando..."
+        self.page.update()
+
+    def on_access_registered(self, res, name, action_type, status, status_color, punch_time):
+        if not res:
+            # Rejected by DatabaseManager: too soon or same action as the last punch
+            self.status_text.value = f"Marca repetida, no se registró: {name}"
+            self.status_text.color = AppColors.DANGER
+            self.page.update()
+            return
         action_text = "Entrada" if action_type == "IN" else "Salida"
-        self.status_text.value = f"{action_text} registrada: {self.detected_employee_name}"
+        self.status_text.value = f"{action_text} registrada: {name}"
         self.status_text.color = status_color
         
         # Add to list
@@ -307,21 +403,19 @@ class AttendanceApp:
                         Icons.LOGIN if action_type == "IN" else Icons.LOGOUT,
                         color=status_color
                     ),
-                    title=Text(f"{self.detected_employee_name}"),
-                    subtitle=Text(f"{action_text} - {time.strftime('%H:%M:%S')} | {status}"),
+                    title=Text(f"{name}"),
+                    subtitle=Text(f"{action_text} - {punch_time} | {status}"),
                 ),
                 **AppStyles.CARD_STYLE
             )
         )
-        
-        # Clear detection after registration
-        self.clear_detected_employee()
         self.page.update()
 
     def show_employees(self):
         # Implementation for listing and adding employees
-        employees = self.db.get_all_employees()
-        
+        self.db_call(self.render_employees, self.db.get_all_employees)
+
+    def render_employees(self, employees):
         self.content_area.content = Column([
             Row([
                 Text("Gestión de Empleados", style=AppStyles.HERO_TEXT),
@@ -401,6 +495,8 @@ class AttendanceApp:
         self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, 480)
         faces_captured = []
         ids_captured = []
+        self.show_preview()
+        self.page.update()
         
         # We'll use a temp employee ID from count + 1
         temp_id = len(self.db.get_all_employees()) + 1
@@ -413,8 +509,9 @@ class AttendanceApp:
             if not ret: break
             
             faces, gray = self.engine.detect_faces(frame)
-            for (x, y, w, h) in faces:
-                faces_captured.append(gray[y:y+h, x:x+w])
+            aligned = self.engine.align_faces(gray, faces).copy()
+            for (x, y, w, h), face in zip(faces, aligned):
+                faces_captured.append(face)
                 ids_captured.append(temp_id)
                 count += 1
                 cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
@@ -422,10 +519,7 @@ class AttendanceApp:
             
             # Update UI feed
             try:
-                _, buffer = cv2.imencode(".jpg", frame, [int(cv2.IMWRITE_JPEG_QUALITY), 70])
-                img_base64 = base64.b64encode(buffer).decode("utf-8")
-                self.video_image.src_base64 = img_base64
-                self.page.update()
+                self.publish_preview(frame)
             except:
                 pass
                 
@@ -437,26 +531,43 @@ class AttendanceApp:
             # Save to DB
             self.db.add_employee(name, dni, email, np.array([]), "path") # Placeholder for actual blobs
             # Train engine
-            self.engine.train_model(faces_captured, ids_captured)
+            self.engine.train_model(faces_captured, ids_captured, aligned=True)
             self.page.snack_bar = SnackBar(Text("Empleado registrado y modelo entrenado!"))
             self.page.snack_bar.open = True
             self.show_employees()
 
     def show_reports(self):
-        logs = self.db.get_attendance_report()
+        # First page only, older rows are loaded on demand (keyset pages)
+        self.report_after = None
+        self.db_call(self.render_reports, self.db.get_attendance_page, REPORT_PAGE_SIZE)
+
+    def render_reports(self, logs):
+        self.report_list = ListView(expand=True)
+        self.report_more = ElevatedButton("Cargar más", icon=Icons.EXPAND_MORE, on_click=self.load_more_reports)
         self.content_area.content = Column([
             Text("Reporte de Asistencia", style=AppStyles.HERO_TEXT),
-            ListView(
-                expand=True,
-                controls=[
-                    ListTile(
-                        title=Text(f"{log[1]} - {log[3]}"),
-                        subtitle=Text(f"Fecha: {log[0]} | Status: {log[4]}"),
-                        trailing=Icon(Icons.CIRCLE, color=AppColors.SUCCESS if log[4]=="PRESENT" else AppColors.DANGER)
-                    ) for log in logs
-                ]
-            )
+            self.report_list,
+            self.report_more,
         ])
+        self.append_reports(logs)
+
+    def load_more_reports(self, e):
+        self.report_more.disabled = True
+        self.page.update()
+        self.db_call(self.append_reports, self.db.get_attendance_page, REPORT_PAGE_SIZE, self.report_after)
+
+    def append_reports(self, logs):
+        self.report_list.controls.extend(
+            ListTile(
+                title=Text(f"{log[1]} - {log[3]}"),
+                subtitle=Text(f"Fecha: {log[0]} | Status: {log[4]}"),
+                trailing=Icon(Icons.CIRCLE, color=AppColors.SUCCESS if log[4]=="PRESENT" else AppColors.DANGER)
+            ) for log in logs
+        )
+        if logs:
+            self.report_after = (logs[-1][0], logs[-1][5])
+        self.report_more.disabled = False
+        self.report_more.visible = len(logs) == REPORT_PAGE_SIZE
         self.page.update()
 
 def main(page: ft.Page):
@@ -7,21 +7,146 @@ from datetime import datetime
 from PyQt6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                              QHBoxLayout, QLabel, QPushButton, QStackedWidget, 
                              QListWidget, QTableWidget, QTableWidgetItem, 
-                             QDialog, QLineEdit, QFormLayout, QMessageBox, QFrame)
-from PyQt6.QtCore import QTimer, Qt, QThread, pyqtSignal, QSize
-from PyQt6.QtGui import QImage, QPixmap, QFont, QColor, QIcon
+                             QDialog, QLineEdit, QFormLayout, QMessageBox, QFrame,
+                             QTableView, QDateEdit, QComboBox, QSizePolicy)
+from PyQt6.QtCore import (QTimer, Qt, QThread, QObject, pyqtSignal, QSize,
+                          QAbstractTableModel, QModelIndex, QDate)
+from PyQt6.QtGui import QFont, QColor, QIcon
 import qtawesome as qta
 import pyttsx3
 import threading
 
-from database_manager import DatabaseManager
+from database_manager import DatabaseManager, LOADING
+from db_executor import DatabaseExecutor
 from face_engine import FaceEngine
+from frame_buffer import FrameBuffer
+from pipeline import FacePipeline
+from workers import ObjectDetectionWorker, FaceMeshWorker
+from overlay import OverlayRenderer
+from frame_view import FrameView
+
+class DatabaseBridge(QObject):
+    """Runs database calls on a DatabaseExecutor and hands the results to
+    callbacks on the GUI thread (the signal is queued across threads).
+
+    A failed call gets the exception in its `on_error` callback, if any,
+    and its message is emitted on `error` for the UI to show.
+    """
+    finished = pyqtSignal(object, object, object)
+    error = pyqtSignal(str)
+
+    def __init__(self, executor):
+        super().__init__()
+        self.executor = executor
+        self.finished.connect(self._deliver)
+
+    def call(self, callback, fn, *args, on_error=None):
+        future = self.executor.submit(fn, *args)
+        future.add_done_callback(lambda f: self.finished.emit(callback, on_error, f))
+        return future
+
+    def mark_attendance(self, callback, employee_id, action_type, status, on_error=None):
+        future = self.executor.mark_attendance(employee_id, action_type, status)
+        future.add_done_callback(lambda f: self.finished.emit(callback, on_error, f))
+        return future
+
+    def _deliver(self, callback, on_error, future):
+        try:
+            result = future.result()
+        except Exception as e:
+            if on_error is not None:
+                on_error(e)
+            self.error.emit(f"Error de base de datos: {e}")
+            return
+        callback(result)
+
+class PagedReportModel(QAbstractTableModel):
+    """Report table fetched page by page as the view scrolls.
+
+    `fetch_page(limit, after, date_from, date_to, employee_id)` is a
+    keyset-paginated DatabaseManager query (filters applied in SQL) run on
+    the database thread, and `key(row)` gives the `after` value of the
+    next page. Opening a report costs one page whatever the size of the
+    table. Only the first len(headers) columns of a row are shown.
+    """
+
+    def __init__(self, bridge, fetch_page, headers, key, page_size=200):
+        super().__init__()
+        self.bridge = bridge
+        self.fetch_page = fetch_page
+        self.headers = headers
+        self.key = key
+        self.page_size = page_size
+        self.rows = []
+        self.filters = (None, None, None)  # date_from, date_to, employee_id
+        self._after = None
+        self._exhausted = True
+        self._loading = False
+        self._generation = 0
+
+    def set_filters(self, date_from=None, date_to=None, employee_id=None):
+        """Restart from the newest row with new filters"""
+        self.beginResetModel()
+        self.filters = (date_from, date_to, employee_id)
+        self.rows = []
+        self._after = None
+        self._exhausted = False
+        self._loading = False
+        # Pages requested before the reset are dropped when they arrive
+        self._generation += 1
+        self.endResetModel()
+        self.fetchMore(QModelIndex())
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.rows)
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.headers)
+
+    def data(self, index, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and index.isValid():
+            return str(self.rows[index.row()][index.column()])
+        return None
+
+    def headerData(self, section, orientation, role=Qt.ItemDataRole.DisplayRole):
+        if role == Qt.ItemDataRole.DisplayRole and orientation == Qt.Orientation.Horizontal:
+            return self.headers[section]
+        return None
+
+    def canFetchMore(self, parent):
+        return not parent.isValid() and not self._exhausted
+
+    def fetchMore(self, parent):
+        if parent.isValid() or self._exhausted or self._loading:
+            return
+        self._loading = True
+        generation = self._generation
+        self.bridge.call(lambda page: self._add_page(generation, page),
+                         self.fetch_page, self.page_size, self._after, *self.filters,
+                         on_error=lambda e: self._page_failed(generation))
+
+    def _page_failed(self, generation):
+        # The next scroll (or filter change) asks for the same page again
+        if generation == self._generation:
+            self._loading = False
+
+    def _add_page(self, generation, page):
+        if generation != self._generation:
+            return
+        self._loading = False
+        self._exhausted = len(page) < self.page_size
+        if page:
+            self.beginInsertRows(QModelIndex(), len(self.rows), len(self.rows) + len(page) - 1)
+            self.rows.extend(page)
+            self._after = self.key(page[-1])
+            self.endInsertRows()
 
 class CameraThread(QThread):
-    change_pixmap_signal = pyqtSignal(np.ndarray)
-    
-    def __init__(self):
+    """Captures frames into a FrameBuffer, consumers take the newest one"""
+
+    def __init__(self, frame_buffer):
         super().__init__()
+        self.frame_buffer = frame_buffer
         self._run_flag = True
         self.cap = None
 
@@ -34,8 +159,9 @@ class CameraThread(QThread):
         while self._run_flag:
             ret, frame = self.cap.read()
             if ret:
-                self.change_pixmap_signal.emit(frame)
-            time.sleep(0.01)
+                self.frame_buffer.put(frame)
+            else:
+                time.sleep(0.01)
         
         if self.cap:
             self.cap.release()
@@ -44,6 +170,43 @@ class CameraThread(QThread):
         self._run_flag = False
         self.wait()
 
+class InferenceThread(QThread):
+    """Runs detection and recognition on the newest frame of a FrameBuffer.
+
+    Frames that arrive while a frame is being processed are skipped, and
+    the GUI thread only draws the last published result, so slow inference
+    never blocks the preview.
+    """
+    result_signal = pyqtSignal(dict)
+
+    def __init__(self, engine, frame_buffer, object_worker=None, mesh_worker=None):
+        super().__init__()
+        self.pipeline = FacePipeline(engine, object_worker=object_worker, mesh_worker=mesh_worker)
+        self.frame_buffer = frame_buffer
+        self._run_flag = True
+
+    def run(self):
+        last_seq = 0
+        while self._run_flag:
+            packet = self.frame_buffer.acquire(last_seq, timeout=0.1)
+            if packet is None:
+                if self.frame_buffer.closed:
+                    break
+                continue
+            try:
+                last_seq = packet.seq
+                result = self.pipeline.process(packet.image, packet.timestamp)
+            finally:
+                self.frame_buffer.release(packet)
+
+            result["seq"] = packet.seq
+            result["timestamp"] = packet.timestamp
+            self.result_signal.emit(result)
+
+    def stop(self):
+        self._run_flag = False
+        self.wait()
+
 class RegistrationThread(QThread):
     progress_signal = pyqtSignal(int, np.ndarray)
     finished_signal = pyqtSignal(bool, str)
@@ -72,8 +235,9 @@ class RegistrationThread(QThread):
             if not ret: break
             
             faces, gray = self.engine.detect_faces(frame)
-            for (x, y, w, h) in faces:
-                faces_captured.append(gray[y:y+h, x:x+w])
+            aligned = self.engine.align_faces(gray, faces).copy()
+            for (x, y, w, h), face in zip(faces, aligned):
+                faces_captured.append(face)
                 ids_captured.append(temp_id)
                 count += 1
                 cv2.rectangle(frame, (x, y), (x+w, y+h), (0, 255, 0), 2)
@@ -90,7 +254,7 @@ class RegistrationThread(QThread):
             if real_id:
                 # Use the real ID for training data
                 actual_ids = [real_id] * len(faces_captured)
-                self.engine.train_model(faces_captured, actual_ids)
+                self.engine.train_model(faces_captured, actual_ids, aligned=True)
                 self.finished_signal.emit(True, f"Empleado registrado con éxito (ID: {real_id})")
             else:
                 self.finished_signal.emit(False, "Error al guardar en la base de datos (DNI duplidado?)")
@@ -104,23 +268,41 @@ class MainWindow(QMainWindow):
         self.setMinimumSize(1100, 700)
         
         self.db = DatabaseManager()
+        # SQLite work of the GUI runs on its own thread, punches are
+        # journaled and written in batches
+        self.db_executor = DatabaseExecutor(self.db)
+        self.db_executor.start()
+        # Employee names and last punches for the recognition loop,
+        # lookups that miss are loaded there too instead of on this thread
+        self.db.directory.loader = self.db_executor.submit
+        self.db_executor.submit(self.db.directory.warm)
+        self.db_bridge = DatabaseBridge(self.db_executor)
+        self.db_bridge.error.connect(self.on_database_error)
         self.engine = FaceEngine()
         
         self.init_ui()
         self.apply_styles()
         
         self.camera_thread = None
+        self.inference_thread = None
+        self.object_worker = None
+        self.mesh_worker = None
+        self.frame_buffer = None
         self.is_camera_running = False
+        self.last_result = None
+        self.overlay = OverlayRenderer()
+        self.display_frame = None  # reused copy of the frame being drawn on
+
+        # The preview pulls the newest frame at display rate, so a slow
+        # GUI never works through a backlog of camera frames
+        self.display_timer = QTimer(self)
+        self.display_timer.setInterval(33)
+        self.display_timer.timeout.connect(self.refresh_frame)
         
         # Detection state
         self.detected_employee_id = None
         self.detected_employee_name = None
         
-        # Performance & Stability improvements
-        self.last_attendance_time = {} # Cooldown per employee
-        self.name_cache = {} # Avoid repeated DB queries every frame
-        self.recognition_frame_count = 0 # To skip recognition frames
-        
         # Voice Initialization
         try:
             self.voice_engine = pyttsx3.init()
@@ -235,7 +417,10 @@ class MainWindow(QMainWindow):
         """)
         self.video_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
         self.video_label.setScaledContents(False)
+        # The frame is scaled to the label, not the other way around
+        self.video_label.setSizePolicy(QSizePolicy.Policy.Ignored, QSizePolicy.Policy.Ignored)
         video_layout.addWidget(self.video_label, 1)  # Stretch
+        self.video_view = FrameView(self.video_label)
         content.addWidget(video_container, 2)  # 2/3 of space
 
         # Right: Controls & History - Responsive
@@ -342,8 +527,42 @@ class MainWindow(QMainWindow):
         page = QWidget()
         layout = QVBoxLayout(page)
         layout.addWidget(QLabel("Reportes de Asistencia"))
-        self.report_table = QTableWidget(0, 5)
-        self.report_table.setHorizontalHeaderLabels(["Fecha", "Nombre", "Hora", "Tipo", "Estado"])
+
+        # Filters, applied in SQL by the report model. The minimum date
+        # means "no limit"
+        filters = QHBoxLayout()
+        self.report_kind = QComboBox()
+        self.report_kind.addItems(["Marcas", "Resumen diario"])
+        self.report_kind.currentIndexChanged.connect(self.apply_report_filters)
+        filters.addWidget(self.report_kind)
+        self.report_from = QDateEdit()
+        self.report_to = QDateEdit()
+        for date_edit, text in ((self.report_from, "Desde: todo"), (self.report_to, "Hasta: todo")):
+            date_edit.setCalendarPopup(True)
+            date_edit.setDisplayFormat("yyyy-MM-dd")
+            date_edit.setMinimumDate(QDate(2000, 1, 1))
+            date_edit.setSpecialValueText(text)
+            date_edit.setDate(date_edit.minimumDate())
+            date_edit.dateChanged.connect(self.apply_report_filters)
+            filters.addWidget(date_edit)
+        self.report_employee = QComboBox()
+        self.report_employee.addItem("Todos los empleados", None)
+        self.report_employee.currentIndexChanged.connect(self.apply_report_filters)
+        filters.addWidget(self.report_employee, 1)
+        layout.addLayout(filters)
+
+        # Raw punches, and the per-day totals kept in daily_summary
+        self.report_models = [
+            PagedReportModel(self.db_bridge, self.db.get_attendance_page,
+                             ["Fecha", "Nombre", "DNI", "Tipo", "Estado"],
+                             key=lambda row: (row[0], row[5])),
+            PagedReportModel(self.db_bridge, self.db.get_daily_summary_page,
+                             ["Día", "Nombre", "DNI", "Primera entrada", "Última salida",
+                              "Horas", "Tardanzas", "Marcas"],
+                             key=lambda row: (row[0], row[8])),
+        ]
+        self.report_table = QTableView()
+        self.report_table.setModel(self.report_models[0])
         layout.addWidget(self.report_table)
         return page
 
@@ -363,9 +582,27 @@ class MainWindow(QMainWindow):
             self.stop_camera()
 
     def start_camera(self):
-        self.camera_thread = CameraThread()
-        self.camera_thread.change_pixmap_signal.connect(self.update_image)
+        self.last_result = None
+        self.last_display_seq = 0
+        # Consumers: inference, object worker, mesh worker and display
+        self.frame_buffer = FrameBuffer(slots=6)
+
+        # MobileNetSSD runs on its own cadence, only when the scene moves
+        self.object_worker = ObjectDetectionWorker(self.engine, self.frame_buffer)
+        self.object_worker.start()
+
+        # Face Mesh runs at a fixed rate, the overlay draws its cached landmarks
+        self.mesh_worker = FaceMeshWorker(self.engine, self.frame_buffer, rate=10.0)
+        self.mesh_worker.start()
+
+        self.inference_thread = InferenceThread(self.engine, self.frame_buffer,
+                                                self.object_worker, self.mesh_worker)
+        self.inference_thread.result_signal.connect(self.on_inference_result)
+        self.inference_thread.start()
+
+        self.camera_thread = CameraThread(self.frame_buffer)
         self.camera_thread.start()
+        self.display_timer.start()
         self.is_camera_running = True
         self.btn_start_cam.setText(" Detener Cámara")
         self.btn_start_cam.setIcon(qta.icon('fa5s.stop', color='white'))
@@ -373,9 +610,23 @@ class MainWindow(QMainWindow):
         self.cam_status_indicator.setVisible(True)
 
     def stop_camera(self):
+        self.display_timer.stop()
+        if self.frame_buffer:
+            self.frame_buffer.close()
         if self.camera_thread:
             self.camera_thread.stop()
             self.camera_thread = None
+        if self.inference_thread:
+            self.inference_thread.stop()
+            self.inference_thread = None
+        if self.object_worker:
+            self.object_worker.stop()
+            self.object_worker = None
+        if self.mesh_worker:
+            self.mesh_worker.stop()
+            self.mesh_worker = None
+        self.frame_buffer = None
+        self.last_result = None
         self.is_camera_running = False
         self.btn_start_cam.setText(" Iniciar Cámara")
         self.btn_start_cam.setIcon(qta.icon('fa5s.play', color='white'))
@@ -384,125 +635,83 @@ class MainWindow(QMainWindow):
         self.cam_status_indicator.setVisible(False)
         self.clear_detected_employee()
 
-    def update_image(self, frame):
-        self.recognition_frame_count += 1
-        
-        # Convert to gray for face detection
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        
-        # Only run heavy recognition every 5 frames (~6 times per second)
-        if self.recognition_frame_count % 5 == 0:
-            faces, _ = self.engine.detect_faces(frame)
-            self.last_faces = faces
-            self.last_gray = gray
-            # NEW: Detect Objects
-            self.last_objects = self.engine.detect_objects(frame)
-        else:
-            faces = getattr(self, 'last_faces', [])
-            gray = getattr(self, 'last_gray', gray)
-            objects = getattr(self, 'last_objects', [])
-
-        # Process and draw detections
+    def on_inference_result(self, result):
+        """Receive a result from InferenceThread and update the detection UI"""
+        if self.sender() is not self.inference_thread:
+            return  # Late result from a stopped worker
+        names = []
         face_detected = False
-        for (x, y, w, h) in faces:
-            # Use engine.identify which includes preprocessing
-            id_, conf = self.engine.identify(gray[y:y+h, x:x+w])
+        for id_, conf in result["identities"]:
             if conf < 65:  # Confidence threshold - Increased for better tolerance
                 face_detected = True
-                if id_ not in self.name_cache:
-                    self.name_cache[id_] = self.db.get_employee_name(id_)
-                
-                name = self.name_cache[id_]
-                self.draw_tech_face(frame, x, y, w, h, (0, 255, 0), name)
-                
-                # Update detection UI (don't auto-register)
-                if id_ != self.detected_employee_id:
+                name = self.db.directory.name(id_, wait=False)
+
+                # Update detection UI (don't auto-register), again once a
+                # name that was loading arrives
+                if id_ != self.detected_employee_id or name != self.detected_employee_name:
                     self.update_detected_employee(id_, name)
             else:
-                self.draw_tech_face(frame, x, y, w, h, (0, 0, 255), "Desconocido")
-        
+                name = None
+            names.append(name)
+        result["names"] = names
+
         # Clear detection if no face found
         if not face_detected and self.detected_employee_id:
             self.clear_detected_employee()
 
-        # Draw and Speak Objects
-        objects = getattr(self, 'last_objects', [])
-        for obj in objects:
-            label = obj["label"]
-            conf = obj["confidence"]
-            (sx, sy, ex, ey) = obj["box"]
-            
-            # Draw box
-            cv2.rectangle(frame, (sx, sy), (ex, ey), (255, 255, 0), 2)
-            cv2.putText(frame, f"{label}", (sx, sy - 10), 
-                        cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 0), 2)
-            
-            # Trigger Voice
-            self.announce_object(label)
+        # Speak Objects
+        for obj in result["objects"]:
+            self.announce_object(obj["label"])
+
+        self.last_result = result
+
+    def refresh_frame(self):
+        if not self.frame_buffer:
+            return
+        packet = self.frame_buffer.acquire(self.last_display_seq, timeout=0)
+        if packet is None:
+            return
+        try:
+            self.last_display_seq = packet.seq
+            self.update_image(packet.image)
+        finally:
+            self.frame_buffer.release(packet)
+
+    def update_image(self, frame):
+        # Detection and recognition run in InferenceThread, the GUI thread
+        # only composites the last published result over the live frame
+        # (drawn on a reused copy, the buffer slot goes back to the camera)
+        if self.display_frame is None or self.display_frame.shape != frame.shape:
+            self.display_frame = np.empty_like(frame)
+        np.copyto(self.display_frame, frame)
+        frame = self.display_frame
+
+        result = self.last_result
+        if result:
+            for (x, y, w, h), name in zip(result["faces"], result["names"]):
+                if name is not None:
+                    self.draw_tech_face(frame, x, y, w, h, (0, 255, 0), name)
+                else:
+                    self.draw_tech_face(frame, x, y, w, h, (0, 0, 255), "Desconocido")
+
+            # Draw Objects
+            for obj in result["objects"]:
+                label = obj["label"]
+                (sx, sy, ex, ey) = obj["box"]
+                cv2.rectangle(frame, (sx, sy), (ex, ey), (255, 255, 0), 2)
+                cv2.putText(frame, f"{label}", (sx, sy - 10), 
+                            cv2.FONT_HERSHEY_SIMPLEX, 0.5, (255, 255, 0), 2)
 
-        # Draw MediaPipe Face Mesh landmarks
-        self.engine.draw_face_mesh(frame)
+        # Draw the latest cached Face Mesh landmarks, never computed here
+        if self.mesh_worker:
+            self.engine.draw_landmarks(frame, self.mesh_worker.snapshot()["landmarks"])
 
-        # Convert to QImage and update UI
-        qt_img = self.convert_cv_qt(frame)
-        self.video_label.setPixmap(qt_img)
+        # Scaled into reused buffers and shared with the QPixmap, no Qt copies
+        self.video_view.show(frame)
 
     def draw_tech_face(self, img, x, y, w, h, color, label):
-        l = int(w * 0.15)
-        t = 2
-        
-        # Corners (Cyberpunk style)
-        # Top-left
-        cv2.line(img, (x, y), (x+l, y), color, t)
-        cv2.line(img, (x, y), (x, y+l), color, t)
-        # Top-right
-        cv2.line(img, (x+w, y), (x+w-l, y), color, t)
-        cv2.line(img, (x+w, y), (x+w, y+l), color, t)
-        # Bottom-left
-        cv2.line(img, (x, y+h), (x+l, y+h), color, t)
-        cv2.line(img, (x, y+h), (x, y+h-l), color, t)
-        # Bottom-right
-        cv2.line(img, (x+w, y+h), (x+w-l, y+h), color, t)
-        cv2.line(img, (x+w, y+h), (x+w, y+h-l), color, t)
-        
-        # --- NEW: Digital Scanner Mesh (Look like MediaPipe) ---
-        # Draw a subtle grid over the face
-        grid_color = (color[0], color[1], color[2])
-        alpha = 0.2
-        overlay = img.copy()
-        
-        # Vertical scan lines
-        for i in range(1, 4):
-            vx = x + int(w * i / 4)
-            cv2.line(overlay, (vx, y), (vx, y + h), grid_color, 1)
-        # Horizontal scan lines
-        for i in range(1, 4):
-            vy = y + int(h * i / 4)
-            cv2.line(overlay, (x, vy), (x + w, vy), grid_color, 1)
-        
-        # Scanning line effect (moves with time)
-        scan_y = y + int((h * (time.time() * 2 % 1)))
-        cv2.line(overlay, (x, scan_y), (x + w, scan_y), color, 2)
-        
-        cv2.addWeighted(overlay, alpha, img, 1 - alpha, 0, img)
-        
-        # Elegant label at the bottom
-        label_overlay = img.copy()
-        cv2.rectangle(label_overlay, (x, y + h + 5), (x + w, y + h + 30), color, -1)
-        cv2.addWeighted(label_overlay, 0.4, img, 0.6, 0, img)
-        
-        cv2.putText(img, label, (x + 10, y + h + 23), 
-                    cv2.FONT_HERSHEY_DUPLEX, 0.5, (255, 255, 255), 1, cv2.LINE_AA)
-
-
-
-    def convert_cv_qt(self, cv_img):
-        rgb_image = cv2.cvtColor(cv_img, cv2.COLOR_BGR2RGB)
-        h, w, ch = rgb_image.shape
-        bytes_per_line = ch * w
-        convert_to_Qt_format = QImage(rgb_image.data, w, h, bytes_per_line, QImage.Format.Format_RGB888)
-        p = convert_to_Qt_format.scaled(640, 480, Qt.AspectRatioMode.KeepAspectRatio)
-        return QPixmap.fromImage(p)
+        # Corners, scanner grid and label strip, blended only inside the box
+        self.overlay.draw_face(img, x, y, w, h, color, label)
 
     def announce_object(self, label):
         if self.voice_engine is None:
@@ -530,22 +739,26 @@ class MainWindow(QMainWindow):
         self.detected_employee_id = emp_id
         self.detected_employee_name = name
         
-        # Get last access
-        last_access = self.db.get_last_attendance(emp_id)
-        
         # Update UI
         self.employee_name_label.setText(name)
-        if last_access:
-            action_type = "Entrada" if last_access[0] == "IN" else "Salida"
-            self.last_access_label.setText(f"Último acceso: {action_type}\n{last_access[1]}")
-        else:
-            self.last_access_label.setText("Sin registros previos")
+        self.show_last_access(emp_id, self.db.directory.last_attendance(emp_id, wait=False))
         
         # Show buttons
         self.btn_entrada.setVisible(True)
         self.btn_salida.setVisible(True)
         self.status_label.setText("Empleado detectado - Seleccione acción")
     
+    def show_last_access(self, emp_id, last_access):
+        if self.detected_employee_id != emp_id:
+            return
+        if last_access is LOADING:
+            self.last_access_label.setText("Último acceso: cargando...")
+        elif last_access:
+            action_type = "Entrada" if last_access[0] == "IN" else "Salida"
+            self.last_access_label.setText(f"Último acceso: {action_type}\n{last_access[1]}")
+        else:
+            self.last_access_label.setText("Sin registros previos")
+
     def clear_detected_employee(self):
         """Clear detected employee info when face is lost"""
         self.detected_employee_id = None
@@ -570,9 +783,16 @@ class MainWindow(QMainWindow):
         if action_type == "IN" and (now_time.hour > 9 or (now_time.hour == 9 and now_time.minute > 15)):
             status = "LATE"
         
-        res = self.db.mark_attendance(emp_id, action_type, status)
+        self.db_bridge.mark_attendance(
+            lambda res: self.on_access_registered(res, name, action_type, now_time),
+            emp_id, action_type, status)
+
+        # Clear detection after registration
+        self.clear_detected_employee()
+        self.status_label.setText("Registrando...")
+
+    def on_access_registered(self, res, name, action_type, now_time):
         if res:
-            self.last_attendance_time[emp_id] = time.time()
             action_text = "Entrada" if action_type == "IN" else "Salida"
             icon = "🔵" if action_type == "IN" else "🔴"
             self.history_list.insertItem(0, f"{icon} {name} - {action_text} - {now_time.strftime('%H:%M:%S')}")
@@ -581,23 +801,50 @@ class MainWindow(QMainWindow):
                 self.history_list.takeItem(20)
             
             self.status_label.setText(f"{action_text} registrada: {name}")
-            
-            # Clear detection after registration
-            self.clear_detected_employee()
+        else:
+            # Rejected by DatabaseManager: too soon or same action as the last punch
+            self.status_label.setText(f"Marca repetida, no se registró: {name}")
+
+    def on_database_error(self, message):
+        self.status_label.setText(message)
 
     def refresh_employees(self):
-        employees = self.db.get_all_employees()
+        self.db_bridge.call(self.fill_employees, self.db.get_all_employees)
+
+    def fill_employees(self, employees):
         self.emp_table.setRowCount(len(employees))
         for i, emp in enumerate(employees):
             for j, val in enumerate(emp[:4]):
                 self.emp_table.setItem(i, j, QTableWidgetItem(str(val)))
 
     def refresh_reports(self):
-        logs = self.db.get_attendance_report()
-        self.report_table.setRowCount(len(logs))
-        for i, log in enumerate(logs):
-            for j, val in enumerate(log):
-                self.report_table.setItem(i, j, QTableWidgetItem(str(val)))
+        self.db_bridge.call(self.fill_report_employees, self.db.get_all_employees)
+        self.apply_report_filters()
+
+    def fill_report_employees(self, employees):
+        current = self.report_employee.currentData()
+        self.report_employee.blockSignals(True)
+        self.report_employee.clear()
+        self.report_employee.addItem("Todos los empleados", None)
+        for emp in employees:
+            self.report_employee.addItem(f"{emp[1]} ({emp[2]})", emp[0])
+        index = self.report_employee.findData(current)
+        self.report_employee.setCurrentIndex(max(index, 0))
+        self.report_employee.blockSignals(False)
+        if index < 0 and current is not None:
+            # The filtered employee no longer exists
+            self.apply_report_filters()
+
+    def apply_report_filters(self):
+        def selected(date_edit):
+            if date_edit.date() == date_edit.minimumDate():
+                return None
+            return date_edit.date().toString("yyyy-MM-dd")
+        model = self.report_models[self.report_kind.currentIndex()]
+        if self.report_table.model() is not model:
+            self.report_table.setModel(model)
+        model.set_filters(selected(self.report_from), selected(self.report_to),
+                          self.report_employee.currentData())
 
     def open_registration_dialog(self):
         self.stop_camera()
@@ -618,13 +865,14 @@ class MainWindow(QMainWindow):
         reg_video.setFixedSize(320, 240)
         reg_video.setStyleSheet("background: black")
         layout.addRow(reg_video)
+        reg_view = FrameView(reg_video, size=(320, 240))
         
         btn_reg = QPushButton("Escanear y Guardar")
         layout.addRow(btn_reg)
         
         def start_registration():
             self.reg_thread = RegistrationThread(name_in.text(), dni_in.text(), email_in.text(), self.db, self.engine)
-            self.reg_thread.progress_signal.connect(lambda count, frame: reg_video.setPixmap(self.convert_cv_qt_small(frame)))
+            self.reg_thread.progress_signal.connect(lambda count, frame: reg_view.show(frame))
             self.reg_thread.finished_signal.connect(lambda ok, msg: self.on_reg_finished(dialog, ok, msg))
             self.reg_thread.start()
             btn_reg.setEnabled(False)
@@ -632,13 +880,6 @@ class MainWindow(QMainWindow):
         btn_reg.clicked.connect(start_registration)
         dialog.exec()
 
-    def convert_cv_qt_small(self, cv_img):
-        rgb_image = cv2.cvtColor(cv_img, cv2.COLOR_BGR2RGB)
-        h, w, ch = rgb_image.shape
-        bytes_per_line = ch * w
-        img = QImage(rgb_image.data, w, h, bytes_per_line, QImage.Format.Format_RGB888)
-        return QPixmap.fromImage(img.scaled(320, 240, Qt.AspectRatioMode.KeepAspectRatio))
-
     def on_reg_finished(self, dialog, ok, msg):
         QMessageBox.information(self, "Registro", msg)
         if ok: dialog.accept()
@@ -763,7 +1004,7 @@ class MainWindow(QMainWindow):
             QLabel { color: #e2e8f0; }
             
             /* Tables */
-            QTableWidget { 
+            QTableWidget, QTableView { 
                 background-color: rgba(30, 41, 59, 0.6);
                 color: white;
                 border: none;
@@ -818,6 +1059,9 @@ class MainWindow(QMainWindow):
         """Handle window close event - stop camera before closing"""
         if self.is_camera_running:
             self.stop_camera()
+        # Writes the queued punches before closing the connections
+        self.db_executor.stop()
+        self.db.close()
         event.accept()
 
 if __name__ == "__main__":
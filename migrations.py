@@ -0,0 +1,220 @@
+import sqlite3
+import sys
+
+# Schema history, applied in order. The database stores the number of the
+# last applied migration in PRAGMA user_version; never edit a published
+# migration, append a new one instead.
+MIGRATIONS = [
+    # 1: initial schema (same tables init_db.py always created)
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS employees (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            dni TEXT UNIQUE NOT NULL,
+            email TEXT,
+            photo_path TEXT,
+            face_encoding BLOB,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        ''',
+        # Schedules Table (0-6 for Mon-Sun)
+        '''
+        CREATE TABLE IF NOT EXISTS schedules (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            employee_id INTEGER,
+            day_of_week INTEGER,
+            start_time TEXT,
+            end_time TEXT,
+            FOREIGN KEY (employee_id) REFERENCES employees (id)
+        )
+        ''',
+        '''
+        CREATE TABLE IF NOT EXISTS attendance (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            employee_id INTEGER,
+            timestamp TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            action_type TEXT, -- 'IN' or 'OUT'
+            status TEXT, -- 'PRESENT', 'LATE', 'LEFT_EARLY'
+            FOREIGN KEY (employee_id) REFERENCES employees (id)
+        )
+        ''',
+    ],
+    # 2: indexes for the last-event lookup and the report
+    [
+        # Covers get_last_attendance() without touching the table
+        '''
+        CREATE INDEX IF NOT EXISTS idx_attendance_employee_ts
+        ON attendance (employee_id, timestamp, action_type)
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_attendance_ts
+        ON attendance (timestamp)
+        ''',
+    ],
+    # 3: client-generated event ids, replaying a journaled punch is a no-op
+    [
+        "ALTER TABLE attendance ADD COLUMN event_id TEXT",
+        '''
+        CREATE UNIQUE INDEX IF NOT EXISTS idx_attendance_event
+        ON attendance (event_id)
+        ''',
+    ],
+    # 4: per employee and local day totals, kept up to date by
+    # DatabaseManager and backfilled here from the existing punches
+    [
+        '''
+        CREATE TABLE IF NOT EXISTS daily_summary (
+            employee_id INTEGER NOT NULL,
+            day TEXT NOT NULL, -- local date, YYYY-MM-DD
+            first_in TIMESTAMP,
+            last_out TIMESTAMP,
+            open_in TIMESTAMP, -- IN not closed by an OUT yet
+            worked_seconds INTEGER NOT NULL DEFAULT 0,
+            late_count INTEGER NOT NULL DEFAULT 0,
+            punches INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (employee_id, day)
+        ) WITHOUT ROWID
+        ''',
+        '''
+        CREATE INDEX IF NOT EXISTS idx_daily_summary_day
+        ON daily_summary (day)
+        ''',
+        # Same totals as replaying every punch in (timestamp, id) order
+        # through database_manager.SUMMARY_STATEMENTS: `seg` counts the
+        # OUTs before each punch of the day, so the INs of one segment are
+        # closed by the OUT with the same seg, and the earliest of them is
+        # the open IN it pairs with.
+        '''
+        INSERT INTO daily_summary (employee_id, day, first_in, last_out, open_in,
+                                   worked_seconds, late_count, punches)
+        WITH events AS (
+            SELECT employee_id, date(timestamp, 'localtime') AS day, action_type, status, timestamp,
+                   COALESCE(SUM(action_type = 'OUT') OVER (
+                       PARTITION BY employee_id, date(timestamp, 'localtime')
+                       ORDER BY timestamp, id
+                       ROWS BETWEEN UNBOUNDED PRECEDING AND 1 PRECEDING), 0) AS seg
+            FROM attendance
+            WHERE employee_id IS NOT NULL AND timestamp IS NOT NULL
+        ),
+        opened AS (
+            SELECT employee_id, day, seg, MIN(timestamp) AS open_in
+            FROM events WHERE action_type = 'IN'
+            GROUP BY employee_id, day, seg
+        ),
+        worked AS (
+            SELECT o.employee_id, o.day,
+                   SUM(MAX(0, strftime('%s', o.timestamp) - strftime('%s', i.open_in))) AS seconds
+            FROM events o JOIN opened i
+              ON i.employee_id = o.employee_id AND i.day = o.day AND i.seg = o.seg
+            WHERE o.action_type = 'OUT'
+            GROUP BY o.employee_id, o.day
+        ),
+        days AS (
+            SELECT employee_id, day,
+                   MIN(CASE WHEN action_type = 'IN' THEN timestamp END) AS first_in,
+                   MAX(CASE WHEN action_type = 'OUT' THEN timestamp END) AS last_out,
+                   TOTAL(status = 'LATE') AS late_count,
+                   COUNT(*) AS punches,
+                   TOTAL(action_type = 'OUT') AS outs
+            FROM events
+            GROUP BY employee_id, day
+        )
+        SELECT d.employee_id, d.day, d.first_in, d.last_out, i.open_in,
+               COALESCE(w.seconds, 0), CAST(d.late_count AS INTEGER), d.punches
+        FROM days d
+        LEFT JOIN opened i ON i.employee_id = d.employee_id AND i.day = d.day AND i.seg = d.outs
+        LEFT JOIN worked w ON w.employee_id = d.employee_id AND w.day = d.day
+        ''',
+    ],
+]
+
+SCHEMA_VERSION = len(MIGRATIONS)
+
+# Hot queries and the index their plan must use, asserted by
+# tests/test_migrations.py (and `python migrations.py` on a real database)
+QUERY_PLAN_CHECKS = [
+    ('''
+     SELECT action_type, timestamp FROM attendance
+     WHERE employee_id = ? ORDER BY timestamp DESC LIMIT 1
+     ''', (1,), "idx_attendance_employee_ts"),
+    ('''
+     SELECT a.timestamp, e.name, e.dni, a.action_type, a.status
+     FROM attendance a JOIN employees e ON a.employee_id = e.id
+     ORDER BY a.timestamp DESC
+     ''', (), "idx_attendance_ts"),
+    ('''
+     SELECT a.timestamp, e.name, e.dni, a.action_type, a.status, a.id
+     FROM attendance a JOIN employees e ON a.employee_id = e.id
+     WHERE (a.timestamp, a.id) < (?, ?)
+     ORDER BY a.timestamp DESC, a.id DESC LIMIT 200
+     ''', ("9999-12-31", 0), "idx_attendance_ts"),
+    ('''
+     SELECT a.timestamp, e.name, e.dni, a.action_type, a.status, a.id
+     FROM attendance a JOIN employees e ON a.employee_id = e.id
+     WHERE a.timestamp >= datetime(?, 'utc') AND a.timestamp < datetime(?, '+1 day', 'utc')
+     ORDER BY a.timestamp DESC, a.id DESC LIMIT 200
+     ''', ("2026-03-01", "2026-03-31"), "idx_attendance_ts"),
+    ('''
+     SELECT s.day, e.name FROM daily_summary s JOIN employees e ON s.employee_id = e.id
+     WHERE s.day >= ? AND (s.day, s.employee_id) < (?, ?)
+     ORDER BY s.day DESC, s.employee_id DESC LIMIT 200
+     ''', ("2000-01-01", "9999-12-31", 0), "idx_daily_summary_day"),
+]
+
+
+def schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """Upgrade the database in place, returns the list of applied versions.
+
+    Each migration runs in its own IMMEDIATE transaction together with the
+    user_version bump, so a crash leaves the database at the previous
+    version and concurrent processes never apply a migration twice.
+    """
+    applied = []
+    while schema_version(conn) < SCHEMA_VERSION:
+        conn.commit()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Another process may have migrated while we waited for the lock
+            version = schema_version(conn)
+            if version >= SCHEMA_VERSION:
+                conn.rollback()
+                break
+            for statement in MIGRATIONS[version]:
+                conn.execute(statement)
+            conn.execute(f"PRAGMA user_version = {version + 1}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(version + 1)
+    return applied
+
+
+def check_query_plans(conn):
+    """Problems found in the plans of QUERY_PLAN_CHECKS (empty list if none)"""
+    problems = []
+    for query, params, index in QUERY_PLAN_CHECKS:
+        plan = " | ".join(row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + query, params))
+        if index not in plan:
+            problems.append(f"{index} no se usa en: {' '.join(query.split())}\n    plan: {plan}")
+        elif "USE TEMP B-TREE" in plan:
+            problems.append(f"ordenamiento temporal en: {' '.join(query.split())}\n    plan: {plan}")
+    return problems
+
+
+if __name__ == "__main__":
+    db_path = sys.argv[1] if len(sys.argv) > 1 else "attendance.db"
+    conn = sqlite3.connect(db_path)
+    before = schema_version(conn)
+    migrate(conn)
+    print(f"{db_path}: esquema v{before} -> v{schema_version(conn)}")
+    problems = check_query_plans(conn)
+    for problem in problems:
+        print("ERROR:", problem)
+    conn.close()
+    sys.exit(1 if problems else 0)
@@ -0,0 +1,374 @@
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import cv2
+import numpy as np
+
+BOUNDARY = "frame"
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.0"
+
+    def do_GET(self):
+        stream = self.server.stream
+        path = self.path.split("?", 1)[0]
+        if path == "/stream.mjpg":
+            stream._serve_stream(self)
+        elif path == "/frame.jpg":
+            stream._serve_frame(self)
+        elif path == "/stats.json":
+            stream._serve_stats(self)
+        else:
+            self.send_error(404)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class PreviewController:
+    """Adapts the preview JPEG quality, width and frame rate to the client.
+
+    Fed by MJPEGServer with the encode time of each frame and, for each
+    frame sent, the time the write took, how many newer frames the client
+    skipped (backpressure: it reads slower than frames are published) and
+    the interval since its previous frame. Every `window` seconds:
+
+    - congested (frames skipped, encode over `encode_budget_ms`, or frames
+      arriving at under 2/3 of the rate they are encoded at): lower the
+      quality first, then the width, then the frame rate;
+    - healthy for `recover_windows` windows in a row: raise them back in
+      the opposite order.
+
+    Everything stays within the configured bounds. Only the preview is
+    scaled, recognition keeps the full camera frame.
+    """
+
+    def __init__(self, quality=(40, 85), width=(320, 640), fps=(5, 30),
+                 encode_budget_ms=10.0, window=1.0, recover_windows=3):
+        self.min_quality, self.max_quality = quality
+        self.min_width, self.max_width = width
+        self.min_fps, self.max_fps = fps
+        self.encode_budget_ms = encode_budget_ms
+        self.window = window
+        self.recover_windows = recover_windows
+
+        # Current settings, start at the best and back off if needed
+        self.quality = self.max_quality
+        self.width = self.max_width
+        self.fps = self.max_fps
+
+        self._lock = threading.Lock()
+        self._next_frame = 0.0
+        self._last_encode = None
+        self._window_start = time.monotonic()
+        self._healthy = 0
+        self._buffer = None
+        self._reset_window()
+        self.last = {}  # metrics of the last complete window
+
+        # Counters
+        self.decreases = 0
+        self.increases = 0
+        self.dropped = 0  # frames not published because of the frame rate
+
+    def due(self, now):
+        """True if a preview frame should be published at `now`"""
+        if now < self._next_frame:
+            self.dropped += 1
+            return False
+        # Keep the cadence, but do not burst after a pause
+        self._next_frame = max(self._next_frame + 1.0 / self.fps, now)
+        return True
+
+    def scale(self, frame):
+        """Frame at the current preview width, in a reused buffer"""
+        h, w = frame.shape[:2]
+        if w <= self.width:
+            return frame
+        size = (self.width, max(1, round(h * self.width / w)))
+        if self._buffer is None or self._buffer.shape[1::-1] != size:
+            self._buffer = np.empty((size[1], size[0], 3), np.uint8)
+        return cv2.resize(frame, size, dst=self._buffer, interpolation=cv2.INTER_AREA)
+
+    def record_encode(self, ms, now):
+        with self._lock:
+            self._encode_ms += ms
+            self._encoded += 1
+            if self._last_encode is not None:
+                self._produced += now - self._last_encode
+                self._produced_count += 1
+            self._last_encode = now
+
+    def record_send(self, ms, skipped, interval):
+        with self._lock:
+            self._send_ms += ms
+            self._sent += 1
+            self._skipped += skipped
+            if interval is not None:
+                self._interval += interval
+                self._intervals += 1
+
+    def update(self, now, clients=0):
+        """Close the measuring window when due and adjust the settings"""
+        if now - self._window_start < self.window:
+            return
+        with self._lock:
+            metrics = {
+                "encode_ms": self._encode_ms / self._encoded if self._encoded else 0.0,
+                "send_ms": self._send_ms / self._sent if self._sent else 0.0,
+                "skip_ratio": self._skipped / (self._sent + self._skipped) if self._sent else 0.0,
+                "interval_ms": 1000 * self._interval / self._intervals if self._intervals else 0.0,
+                # A slow camera loop is not a slow client
+                "source_interval_ms": (1000 * self._produced / self._produced_count
+                                       if self._produced_count else 0.0),
+                "frames_sent": self._sent,
+            }
+            self._reset_window()
+        self._window_start = now
+        self.last = metrics
+        if not metrics["frames_sent"] and not clients:
+            return  # nobody watching, nothing to learn
+
+        target_ms = max(1000.0 / self.fps, metrics["source_interval_ms"])
+        # A connected client that got nothing was blocked the whole window
+        congested = (not metrics["frames_sent"]
+                     or metrics["skip_ratio"] > 0.1
+                     or metrics["encode_ms"] > self.encode_budget_ms
+                     or metrics["interval_ms"] > 1.5 * target_ms)
+        if congested:
+            self._healthy = 0
+            self._decrease()
+        elif (metrics["skip_ratio"] < 0.02 and metrics["encode_ms"] < 0.5 * self.encode_budget_ms
+              and metrics["interval_ms"] < 1.2 * target_ms):
+            self._healthy += 1
+            if self._healthy >= self.recover_windows:
+                self._healthy = 0
+                self._increase()
+        else:
+            self._healthy = 0
+
+    def stats(self):
+        return dict(self.last, quality=self.quality, width=self.width, fps=self.fps,
+                    decreases=self.decreases, increases=self.increases, dropped=self.dropped)
+
+    def _decrease(self):
+        if self.quality > self.min_quality:
+            self.quality = max(self.min_quality, self.quality - 10)
+        elif self.width > self.min_width:
+            self.width = max(self.min_width, int(self.width * 0.75) // 16 * 16)
+        elif self.fps > self.min_fps:
+            self.fps = max(self.min_fps, int(self.fps * 0.75))
+        else:
+            return
+        self.decreases += 1
+
+    def _increase(self):
+        if self.fps < self.max_fps:
+            self.fps = min(self.max_fps, self.fps + max(1, self.fps // 4))
+        elif self.width < self.max_width:
+            self.width = min(self.max_width, int(self.width / 0.75) // 16 * 16)
+        elif self.quality < self.max_quality:
+            self.quality = min(self.max_quality, self.quality + 5)
+        else:
+            return
+        self.increases += 1
+
+    def _reset_window(self):
+        self._encode_ms = self._send_ms = self._interval = self._produced = 0.0
+        self._encoded = self._sent = self._skipped = self._intervals = self._produced_count = 0
+
+
+class MJPEGServer:
+    """Local HTTP server for the Flet video preview.
+
+    publish() JPEG-encodes a frame once and every client gets those bytes:
+    /stream.mjpg is a multipart/x-mixed-replace (MJPEG) stream for an
+    Image control or a browser, /frame.jpg the latest frame alone. A slow
+    client skips to the newest frame instead of queueing old ones. While
+    nobody has asked for frames for `idle_timeout` seconds, publish() does
+    not encode at all.
+
+    With a PreviewController the quality, width and frame rate of the
+    preview follow the client (see PreviewController), and /stats.json
+    reports the current settings and measurements.
+
+    Runs on daemon threads; bound to 127.0.0.1 by default, the preview is
+    not meant to leave the machine.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, quality=70, idle_timeout=2.0, controller=None):
+        self.host = host
+        self.port = port  # 0 picks a free port, see start()
+        self.quality = quality
+        self.idle_timeout = idle_timeout
+        self.controller = controller
+        self._httpd = None
+        self._cond = threading.Condition()
+        self._jpeg = None
+        self._seq = 0
+        self._running = False
+        self._last_request = 0.0
+
+        # Counters
+        self.clients = 0
+        self.published = 0
+        self.encoded = 0
+        self.frames_sent = 0
+        self.bytes_sent = 0
+
+    @property
+    def stream_url(self):
+        return f"http://{self.host}:{self.port}/stream.mjpg"
+
+    def frame_url(self, seq):
+        """URL of one frame, `seq` makes it unique so the client refetches"""
+        return f"http://{self.host}:{self.port}/frame.jpg?seq={seq}"
+
+    def start(self):
+        self._httpd = _Server((self.host, self.port), _Handler)
+        self._httpd.stream = self
+        self.port = self._httpd.server_address[1]
+        self._running = True
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        if self._httpd:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+    def publish(self, frame):
+        """Make `frame` (BGR) the current preview, returns its sequence number.
+
+        The number only changes when a new JPEG was made: not while idle,
+        nor for frames the controller's frame rate leaves out.
+        """
+        self.published += 1
+        now = time.monotonic()
+        with self._cond:
+            clients = self.clients
+            idle = (clients == 0 and self._jpeg is not None
+                    and now - self._last_request > self.idle_timeout)
+        if idle:
+            return self._seq
+
+        controller = self.controller
+        quality = self.quality
+        if controller is not None:
+            controller.update(now, clients)
+            if not controller.due(now):
+                return self._seq
+            frame = controller.scale(frame)
+            quality = controller.quality
+        start = time.perf_counter()
+        ok, buffer = cv2.imencode(".jpg", frame, [int(cv2.IMWRITE_JPEG_QUALITY), quality])
+        if controller is not None:
+            controller.record_encode((time.perf_counter() - start) * 1000, now)
+        if not ok:
+            return self._seq
+        with self._cond:
+            self._jpeg = buffer.tobytes()
+            self._seq += 1
+            self.encoded += 1
+            self._cond.notify_all()
+            return self._seq
+
+    def stats(self):
+        with self._cond:
+            stats = {
+                "clients": self.clients,
+                "published": self.published,
+                "encoded": self.encoded,
+                "frames_sent": self.frames_sent,
+                "bytes_sent": self.bytes_sent,
+                "quality": self.quality,
+            }
+        if self.controller is not None:
+            stats["preview"] = self.controller.stats()
+        return stats
+
+    def _serve_stats(self, handler):
+        body = json.dumps(self.stats()).encode("utf-8")
+        handler.send_response(200)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(body)))
+        handler.send_header("Cache-Control", "no-store")
+        handler.end_headers()
+        try:
+            handler.wfile.write(body)
+        except OSError:
+            pass
+
+    def _serve_frame(self, handler):
+        with self._cond:
+            self._last_request = time.monotonic()
+            jpeg = self._jpeg
+        if jpeg is None:
+            handler.send_error(503)
+            return
+        handler.send_response(200)
+        handler.send_header("Content-Type", "image/jpeg")
+        handler.send_header("Content-Length", str(len(jpeg)))
+        handler.send_header("Cache-Control", "no-store")
+        handler.end_headers()
+        try:
+            handler.wfile.write(jpeg)
+        except OSError:
+            return
+        self._count_sent(len(jpeg))
+
+    def _serve_stream(self, handler):
+        handler.send_response(200)
+        handler.send_header("Content-Type", f"multipart/x-mixed-replace; boundary={BOUNDARY}")
+        handler.send_header("Cache-Control", "no-store")
+        handler.end_headers()
+        with self._cond:
+            self.clients += 1
+        seq = 0
+        last_sent = None
+        try:
+            while True:
+                with self._cond:
+                    # Newest frame only, a slow client skips the ones in between
+                    while self._running and self._seq == seq:
+                        self._cond.wait(timeout=1.0)
+                    if not self._running:
+                        break
+                    skipped = self._seq - seq - 1 if seq else 0
+                    seq, jpeg = self._seq, self._jpeg
+                start = time.perf_counter()
+                handler.wfile.write(
+                    f"--{BOUNDARY}\r\nContent-Type: image/jpeg\r\n"
+                    f"Content-Length: {len(jpeg)}\r\n\r\n".encode("ascii"))
+                handler.wfile.write(jpeg)
+                handler.wfile.write(b"\r\n")
+                handler.wfile.flush()
+                now = time.perf_counter()
+                self._count_sent(len(jpeg))
+                if self.controller is not None:
+                    # The write blocks when the client does not keep up
+                    self.controller.record_send((now - start) * 1000, skipped,
+                                                now - last_sent if last_sent else None)
+                last_sent = now
+        except OSError:
+            pass  # client went away
+        finally:
+            with self._cond:
+                self.clients -= 1
+                self._last_request = time.monotonic()
+
+    def _count_sent(self, size):
+        with self._cond:
+            self.frames_sent += 1
+            self.bytes_sent += size
@@ -0,0 +1,109 @@
+import time
+import cv2
+import numpy as np
+
+GRID_ALPHA = 0.2
+LABEL_ALPHA = 0.4
+
+
+class OverlayRenderer:
+    """Draws the "tech" face boxes of the PyQt6 video feed.
+
+    Same pixels as the original draw_tech_face() (see tests/test_overlay.py),
+    which copied and blended the whole frame twice per face. Here only the
+    box and the label strip are blended, through preallocated scratch
+    buffers, and the static parts (corners and grid) are pixel indices
+    cached per box geometry; only the scan line is drawn every frame.
+    """
+
+    def __init__(self, cache_size=64):
+        self.cache_size = cache_size
+        self._sprites = {}
+        self._scratch = np.empty((0, 0, 3), np.uint8)
+
+        # Counters
+        self.sprite_hits = 0
+        self.sprite_misses = 0
+
+    def draw_face(self, img, x, y, w, h, color, label, now=None):
+        if now is None:
+            now = time.time()
+        t = 2
+        m = t  # thick lines spread one pixel around the box, keep a margin
+        img_h, img_w = img.shape[:2]
+        x0, y0 = max(x - m, 0), max(y - m, 0)
+        x1, y1 = min(x + w + m + 1, img_w), min(y + h + m + 1, img_h)
+
+        if x0 < x1 and y0 < y1:
+            roi = img[y0:y1, x0:x1]
+            fill = np.array(color, np.uint8)
+            corners, grid = self._sprite(w, h, x - x0, y - y0, x1 - x0, y1 - y0, t)
+            roi[corners] = fill
+
+            # Grid and scan line go on a copy that is blended back
+            overlay = self._buffer(roi.shape)
+            np.copyto(overlay, roi)
+            overlay[grid] = fill
+            scan_y = y + int((h * (now * 2 % 1)))
+            cv2.line(overlay, (x - x0, scan_y - y0), (x + w - x0, scan_y - y0), color, 2)
+            cv2.addWeighted(overlay, GRID_ALPHA, roi, 1 - GRID_ALPHA, 0, roi)
+
+        # Label strip
+        lx0, ly0 = max(x, 0), max(y + h + 5, 0)
+        lx1, ly1 = min(x + w + 1, img_w), min(y + h + 31, img_h)
+        if lx0 < lx1 and ly0 < ly1:
+            roi = img[ly0:ly1, lx0:lx1]
+            strip = self._buffer(roi.shape)
+            strip[:] = color
+            cv2.addWeighted(strip, LABEL_ALPHA, roi, 1 - LABEL_ALPHA, 0, roi)
+
+        cv2.putText(img, label, (x + 10, y + h + 23),
+                    cv2.FONT_HERSHEY_DUPLEX, 0.5, (255, 255, 255), 1, cv2.LINE_AA)
+
+    def stats(self):
+        return {
+            "sprites": len(self._sprites),
+            "sprite_hits": self.sprite_hits,
+            "sprite_misses": self.sprite_misses,
+        }
+
+    def _buffer(self, shape):
+        """View of the scratch buffer, grown when a bigger ROI shows up"""
+        rows, cols = shape[:2]
+        if self._scratch.shape[0] < rows or self._scratch.shape[1] < cols:
+            self._scratch = np.empty((max(rows, self._scratch.shape[0]),
+                                      max(cols, self._scratch.shape[1]), 3), np.uint8)
+        return self._scratch[:rows, :cols]
+
+    def _sprite(self, w, h, ox, oy, rw, rh, t):
+        """Corner and grid pixels (index arrays) of a box at (ox, oy) in a rw x rh ROI"""
+        key = (w, h, ox, oy, rw, rh, t)
+        sprite = self._sprites.get(key)
+        if sprite is not None:
+            self.sprite_hits += 1
+            return sprite
+        self.sprite_misses += 1
+        if len(self._sprites) >= self.cache_size:
+            self._sprites.clear()
+
+        corners = np.zeros((rh, rw), np.uint8)
+        l = int(w * 0.15)
+        x, y = ox, oy
+        for (ax, ay), (bx, by) in (
+                ((x, y), (x + l, y)), ((x, y), (x, y + l)),
+                ((x + w, y), (x + w - l, y)), ((x + w, y), (x + w, y + l)),
+                ((x, y + h), (x + l, y + h)), ((x, y + h), (x, y + h - l)),
+                ((x + w, y + h), (x + w - l, y + h)), ((x + w, y + h), (x + w, y + h - l))):
+            cv2.line(corners, (ax, ay), (bx, by), 1, t)
+
+        grid = np.zeros((rh, rw), np.uint8)
+        for i in range(1, 4):
+            vx = x + int(w * i / 4)
+            cv2.line(grid, (vx, y), (vx, y + h), 1, 1)
+        for i in range(1, 4):
+            vy = y + int(h * i / 4)
+            cv2.line(grid, (x, vy), (x + w, vy), 1, 1)
+
+        sprite = (np.nonzero(corners), np.nonzero(grid))
+        self._sprites[key] = sprite
+        return sprite
@@ -0,0 +1,62 @@
+import time
+import cv2
+
+from tracker import FaceTracker
+
+
+class FacePipeline:
+    """Detect -> track -> identify pipeline shared by the front ends.
+
+    The Haar cascade runs every `detect_interval` frames and the tracker
+    follows the faces in between. LBPH only runs on tracks whose identity
+    vote is still open (see IdentityVoter); `identities` holds committed
+    identities, (None, 100) while a track is still being voted on.
+    Objects come from the last snapshot of an optional
+    ObjectDetectionWorker, so MobileNetSSD never runs in this path.
+    Landmarks likewise come from an optional FaceMeshWorker; `landmarks`
+    and `landmark_points` are empty without one.
+    """
+
+    def __init__(self, engine, detect_interval=5, object_worker=None, mesh_worker=None):
+        self.engine = engine
+        self.tracker = FaceTracker()
+        self.detect_interval = detect_interval
+        self.object_worker = object_worker
+        self.mesh_worker = mesh_worker
+        self.frame_count = 0
+
+    def reset(self):
+        self.tracker.reset()
+        self.frame_count = 0
+
+    def process(self, frame, timestamp=None):
+        """Run one frame, returns a dict with one entry per tracked face"""
+        now = timestamp if timestamp is not None else time.time()
+
+        if self.frame_count % self.detect_interval == 0:
+            hints = [t.box for t in self.tracker.tracks]
+            faces, gray = self.engine.detect_faces(frame, hints)
+            tracks = self.tracker.update(gray, faces, now)
+        else:
+            gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+            tracks = self.tracker.predict(gray, now)
+
+        mesh = self.mesh_worker.snapshot() if self.mesh_worker else {"landmarks": [], "points": []}
+        pending = self.tracker.pending_identification(now)
+        if pending:
+            # Cached mesh landmarks give the eye positions for alignment
+            identities = self.engine.identify_batch(gray, [t.box for t in pending], mesh["points"])
+            for track, identity in zip(pending, identities):
+                track.add_result(identity, now)
+
+        self.frame_count += 1
+        objects = self.object_worker.snapshot()["objects"] if self.object_worker else []
+
+        return {
+            "faces": [t.box for t in tracks],
+            "track_ids": [t.id for t in tracks],
+            "identities": [t.identity for t in tracks],
+            "objects": objects,
+            "landmarks": mesh["landmarks"],
+            "landmark_points": mesh["points"],
+        }
@@ -0,0 +1,20 @@
+import os
+import sys
+import time
+
+import pytest
+
+# The modules live at the top level of the repository
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def local_time(monkeypatch):
+    # Days are local: UTC-3 puts the evening punches on the previous day
+    if not hasattr(time, "tzset"):
+        pytest.skip("needs time.tzset()")
+    monkeypatch.setenv("TZ", "America/Argentina/Buenos_Aires")
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
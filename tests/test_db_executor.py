@@ -0,0 +1,69 @@
+"""DatabaseExecutor journal: one locked journal per process, next to the database"""
+import json
+import os
+import uuid
+
+import numpy as np
+import pytest
+
+from database_manager import DatabaseManager, utc_now
+from db_executor import DatabaseExecutor
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    # Nothing may land in the working directory
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(tmp_path / "data")
+    db = DatabaseManager(str(tmp_path / "data" / "attendance.db"))
+    db.add_employee("Ana", "1", "ana@example.com", np.zeros(4), "")
+    yield db
+    db.close()
+
+
+def test_journal_next_to_the_database(db, tmp_path):
+    executor = DatabaseExecutor(db)
+    executor.start()
+    assert executor.journal.path == db.db_path + ".journal"
+    assert executor.mark_attendance(1, "IN", "ON_TIME").result(timeout=5)
+    executor.stop()
+    assert os.path.getsize(executor.journal.path) == 0
+    assert os.listdir(tmp_path) == ["data"]
+
+
+def test_second_process_gets_its_own_journal(db):
+    first = DatabaseExecutor(db)
+    second = DatabaseExecutor(db)
+    assert first.journal.path == db.db_path + ".journal"
+    assert second.journal.path == db.db_path + ".journal.1"
+    with pytest.raises(RuntimeError):
+        DatabaseExecutor(db, journal_path=first.journal.path)
+    first.stop()
+    second.stop()
+
+    # Released on stop
+    again = DatabaseExecutor(db, journal_path=first.journal.path)
+    again.stop()
+
+
+def test_orphan_journal_is_written_and_removed(db):
+    held = DatabaseExecutor(db)
+    orphan = db.db_path + ".journal.3"
+    event = {"event_id": uuid.uuid4().hex, "employee_id": 1, "action_type": "IN",
+             "status": "ON_TIME", "timestamp": utc_now()}
+    with open(orphan, "w", encoding="utf-8") as f:
+        f.write(json.dumps(event) + "\n")
+    empty = db.db_path + ".journal.1"
+    open(empty, "w").close()
+
+    executor = DatabaseExecutor(db)
+    # .journal is held and .journal.1 was free
+    assert executor.journal.path == empty
+    executor.start()
+    executor.stop()
+    held.stop()
+
+    stored = db.get_connection().execute(
+        "SELECT employee_id, action_type FROM attendance WHERE event_id = ?", (event["event_id"],)).fetchall()
+    assert stored == [(1, "IN")]
+    assert not os.path.exists(orphan)
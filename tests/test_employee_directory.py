@@ -0,0 +1,128 @@
+"""EmployeeDirectory invalidation: own commits keep the cache, others clear it"""
+import sqlite3
+import threading
+
+import numpy as np
+import pytest
+
+from database_manager import LOADING, DatabaseManager
+
+
+@pytest.fixture
+def db(tmp_path):
+    db = DatabaseManager(str(tmp_path / "attendance.db"))
+    # Probe data_version on every lookup
+    db.directory.check_interval = 0.0
+    yield db
+    db.close()
+
+
+def add(db, name, dni):
+    return db.add_employee(name, dni, f"{dni}@example.com", np.zeros(4), "")
+
+
+def test_own_writes_do_not_invalidate(db):
+    ana = add(db, "Ana", "1")
+    luis = add(db, "Luis", "2")
+    assert db.directory.name(ana) == "Ana"
+    assert db.directory.name(luis) == "Luis"
+    invalidations, misses = db.directory.invalidations, db.directory.misses
+
+    db.mark_attendance(ana, "IN", "ON_TIME")
+    db.rebuild_daily_summary()
+    # From another thread, with its own connection
+    worker = threading.Thread(target=db.mark_attendance, args=(luis, "IN", "ON_TIME"))
+    worker.start()
+    worker.join()
+
+    # The rows mark_attendance wrote
+    assert db.directory.last_attendance(ana) == db.get_last_attendance(ana)
+    assert db.directory.last_attendance(luis) == db.get_last_attendance(luis)
+    assert db.directory.last_attendance(ana)[0] == "IN"
+    assert db.directory.name(ana) == "Ana"
+    assert db.directory.invalidations == invalidations
+    assert db.directory.misses == misses
+
+
+def test_other_connection_invalidates(db):
+    ana = add(db, "Ana", "1")
+    assert db.directory.name(ana) == "Ana"
+    other = sqlite3.connect(db.db_path)
+    other.execute("UPDATE employees SET name = 'Ana María' WHERE id = ?", (ana,))
+    other.commit()
+    other.close()
+
+    invalidations = db.directory.invalidations
+    assert db.directory.name(ana) == "Ana María"
+    assert db.directory.invalidations == invalidations + 1
+
+
+def test_other_commit_before_own_still_invalidates(db):
+    ana = add(db, "Ana", "1")
+    luis = add(db, "Luis", "2")
+    assert db.directory.name(ana) == "Ana"
+    db.directory.check_interval = 3600.0  # no periodic probe in between
+    other = sqlite3.connect(db.db_path)
+    other.execute("UPDATE employees SET name = 'Ana María' WHERE id = ?", (ana,))
+    other.commit()
+    other.close()
+
+    db.mark_attendance(luis, "IN", "ON_TIME")
+    assert db.directory.name(ana) == "Ana María"
+
+
+class Loader:
+    """Stands in for DatabaseExecutor.submit, runs the queued calls on demand"""
+
+    def __init__(self):
+        self.calls = []
+
+    def __call__(self, fn, *args):
+        self.calls.append((fn, args))
+
+    def run(self):
+        calls, self.calls = self.calls, []
+        for fn, args in calls:
+            fn(*args)
+
+
+def test_miss_without_wait_is_loaded_by_the_loader(db, monkeypatch):
+    ana = add(db, "Ana", "1")
+    db.mark_attendance(ana, "OUT", "ON_TIME")
+    db.directory.invalidate()
+    db.directory.loader = loader = Loader()
+    # Nothing may query on the calling thread
+    monkeypatch.setattr(db.directory, "_read_version", lambda: pytest.fail("probed on the caller"))
+    monkeypatch.setattr(db, "get_connection", lambda: pytest.fail("queried on the caller"))
+
+    assert db.directory.get(ana, wait=False) is LOADING
+    assert db.directory.name(ana, wait=False) == "Cargando..."
+    assert db.directory.last_attendance(ana, wait=False) is LOADING
+    # One load queued however often the id is looked up, plus the probe
+    assert [fn.__name__ for fn, _ in loader.calls] == ["_checked_later", "_load"]
+
+    monkeypatch.undo()
+    loader.run()
+    assert db.directory.name(ana, wait=False) == "Ana"
+    assert db.directory.last_attendance(ana, wait=False) == db.get_last_attendance(ana)
+    assert db.directory.last_attendance(ana, wait=False)[0] == "OUT"
+    assert db.directory.name(99, wait=False) == "Cargando..."
+    loader.run()
+    assert db.directory.name(99, wait=False) == "Desconocido"
+
+
+def test_probe_without_wait_runs_on_the_loader(db):
+    ana = add(db, "Ana", "1")
+    db.directory.loader = loader = Loader()
+    assert db.directory.name(ana) == "Ana"
+    other = sqlite3.connect(db.db_path)
+    other.execute("UPDATE employees SET name = 'Ana María' WHERE id = ?", (ana,))
+    other.commit()
+    other.close()
+
+    # Still the cached name until the loader probes data_version
+    assert db.directory.name(ana, wait=False) == "Ana"
+    loader.run()
+    assert db.directory.name(ana, wait=False) == "Cargando..."
+    loader.run()
+    assert db.directory.name(ana, wait=False) == "Ana María"
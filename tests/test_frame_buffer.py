@@ -0,0 +1,79 @@
+"""FrameBuffer: latest frame wins, leased slots are never overwritten"""
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from frame_buffer import FrameBuffer
+
+
+def frame(value):
+    return np.full((4, 6, 3), value, dtype=np.uint8)
+
+
+def test_latest_frame_wins():
+    buffer = FrameBuffer()
+    for value in (1, 2, 3):
+        buffer.put(frame(value))
+    packet = buffer.acquire(timeout=0)
+    assert packet.seq == 3 and packet.image[0, 0, 0] == 3
+    buffer.release(packet)
+    # Frames 1 and 2 were replaced before anyone read them
+    assert buffer.stats() == {"written": 3, "reads": 1, "dropped": 2, "overruns": 0, "latest_seq": 3}
+
+    # Nothing newer than what was read
+    assert buffer.acquire(after_seq=3, timeout=0) is None
+    buffer.put(frame(4))
+    assert buffer.read(after_seq=3, timeout=0)[0] == 4
+
+
+def test_leased_frame_is_not_overwritten():
+    buffer = FrameBuffer(slots=3)
+    buffer.put(frame(1))
+    first = buffer.acquire(timeout=0)
+    buffer.put(frame(2))
+    second = buffer.acquire(timeout=0)
+    assert buffer.put(frame(3)) == 3
+
+    # The only free slot holds the latest frame, the new one is discarded
+    assert buffer.put(frame(4)) is None
+    assert buffer.overruns == 1
+    assert first.image[0, 0, 0] == 1 and second.image[0, 0, 0] == 2
+    with pytest.raises(ValueError):
+        first.image[0, 0, 0] = 9
+
+    buffer.release(first)
+    assert buffer.put(frame(5)) == 4
+    packet = buffer.acquire(timeout=0)
+    assert packet.slot == first.slot and packet.image[0, 0, 0] == 5
+    assert second.image[0, 0, 0] == 2
+    buffer.release(packet)
+    buffer.release(second)
+
+
+def test_acquire_waits_for_a_newer_frame():
+    buffer = FrameBuffer()
+    buffer.put(frame(1))
+    start = time.monotonic()
+    assert buffer.acquire(after_seq=1, timeout=0.05) is None
+    assert time.monotonic() - start >= 0.05
+
+    threading.Timer(0.02, buffer.put, (frame(2),)).start()
+    packet = buffer.acquire(after_seq=1, timeout=5)
+    assert packet.seq == 2
+    buffer.release(packet)
+
+
+def test_close_wakes_up_waiting_consumers():
+    buffer = FrameBuffer()
+    results = []
+    consumer = threading.Thread(target=lambda: results.append(buffer.acquire()))
+    consumer.start()
+    time.sleep(0.02)
+    buffer.close()
+    consumer.join(timeout=5)
+    assert not consumer.is_alive() and results == [None]
+
+    buffer.put(frame(1))
+    assert buffer.acquire(timeout=0) is None
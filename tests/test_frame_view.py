@@ -0,0 +1,75 @@
+"""FrameView shows the right pixels without copies in Qt"""
+import os
+
+import cv2
+import numpy as np
+import pytest
+
+pytest.importorskip("PyQt6")
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtGui import QImage
+from PyQt6.QtWidgets import QApplication, QLabel
+
+from frame_view import FrameView
+
+
+@pytest.fixture(scope="module")
+def app():
+    return QApplication.instance() or QApplication([])
+
+
+def to_rgb(pixmap):
+    image = pixmap.toImage().convertToFormat(QImage.Format.Format_RGB888)
+    ptr = image.constBits()
+    ptr.setsize(image.sizeInBytes())
+    rows = np.frombuffer(ptr, np.uint8).reshape(image.height(), image.bytesPerLine())
+    return rows[:, :image.width() * 3].reshape(image.height(), image.width(), 3).copy()
+
+
+def shown_rgb(label):
+    return to_rgb(label.pixmap())
+
+
+def test_same_size_frame_is_shown_as_is(app):
+    label = QLabel()
+    label.resize(640, 480)
+    view = FrameView(label)
+    frame = np.random.default_rng(0).integers(0, 256, (480, 640, 3), np.uint8)
+    view.show(frame)
+    np.testing.assert_array_equal(shown_rgb(label), cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+    assert view.stats() == {"frames": 1, "rebuilds": 1, "target": (640, 480)}
+
+
+def test_frames_alternate_buffers(app):
+    label = QLabel()
+    label.resize(320, 240)
+    view = FrameView(label)
+    rng = np.random.default_rng(1)
+    frames = [rng.integers(0, 256, (240, 320, 3), np.uint8) for _ in range(4)]
+    previous = None
+    for i, frame in enumerate(frames):
+        view.show(frame)
+        np.testing.assert_array_equal(shown_rgb(label), cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        if previous is not None:
+            # The pixmap shares its buffer: the frame on screen until now
+            # must not have been written over by this one
+            np.testing.assert_array_equal(to_rgb(previous), cv2.cvtColor(frames[i - 1], cv2.COLOR_BGR2RGB))
+        previous = label.pixmap()
+    assert view.rebuilds == 1
+
+
+def test_rescales_to_fit_and_rebuilds_on_resize(app):
+    label = QLabel()
+    label.resize(320, 320)
+    view = FrameView(label)
+    frame = np.zeros((480, 640, 3), np.uint8)
+    view.show(frame)
+    # Aspect ratio kept, like QImage.scaled(..., KeepAspectRatio)
+    assert view.stats()["target"] == (320, 240)
+    view.show(frame)
+    assert view.rebuilds == 1
+    label.resize(960, 720)
+    view.show(frame)
+    assert view.stats()["target"] == (960, 720)
+    assert view.rebuilds == 2
@@ -0,0 +1,183 @@
+import os
+import threading
+
+import numpy as np
+import pytest
+
+from face_engine import GalleryIndex, chi_square
+from gallery_store import GalleryStore
+
+BINS = 16
+CELLS = 4
+
+
+def random_gallery(seed, identities, samples=3):
+    rng = np.random.default_rng(seed)
+    histograms = rng.dirichlet(np.full(BINS, 0.3), size=(identities * samples, CELLS))
+    labels = np.repeat(np.arange(identities) * 10, samples)
+    return histograms.reshape(len(labels), -1).astype(np.float32), labels
+
+
+def enroll(index, histograms, labels, step):
+    """Insert the gallery with add(), `step` samples of one label at a time"""
+    for label in np.unique(labels):
+        rows = np.flatnonzero(labels == label)
+        for start in range(0, len(rows), step):
+            index.add(histograms[rows[start:start + step]], label)
+
+
+@pytest.mark.parametrize("identities", [5, 100])
+def test_add_matches_build(identities):
+    histograms, labels = random_gallery(identities, identities)
+    built = GalleryIndex(bins_per_cell=BINS, coarse_bins=4)
+    built.build(histograms, labels)
+    added = GalleryIndex(bins_per_cell=BINS, coarse_bins=4)
+    enroll(added, histograms, labels, step=2)
+
+    assert added.labels == built.labels
+    np.testing.assert_allclose(added.prototypes, built.prototypes, rtol=1e-5, atol=1e-7)
+    np.testing.assert_allclose(added.prototype_sums, built.prototype_sums, rtol=1e-6)
+    np.testing.assert_allclose(added.coarse, built.coarse, rtol=1e-5, atol=1e-7)
+
+
+def test_capacity_doubles():
+    histograms, labels = random_gallery(1, 40, samples=1)
+    index = GalleryIndex(bins_per_cell=BINS, coarse_bins=4)
+    buffers = set()
+    for row, label in zip(histograms, labels):
+        index.add(row[None, :], label)
+        buffers.add(id(index._records))
+        assert len(index._records) >= len(index)
+    # 16 -> 32 -> 64 rows, not one reallocation per employee
+    assert len(index._records) == 64
+    assert len(buffers) <= 3
+
+
+def test_search_reranks_on_samples():
+    histograms, labels = random_gallery(2, 8)
+    index = GalleryIndex(bins_per_cell=BINS, coarse_bins=4)
+    enroll(index, histograms, labels, step=3)
+    probes = histograms[::5] + 0.01
+    exact = chi_square(probes, histograms)
+    for result, distances in zip(index.search(probes, k=1), exact):
+        label, distance = result[0]
+        assert label == labels[distances.argmin()]
+        assert distance == pytest.approx(distances.min(), rel=1e-6)
+
+
+def test_exact_scan_below_min_ivf_size():
+    histograms, labels = random_gallery(6, 70)
+    index = GalleryIndex(bins_per_cell=BINS, coarse_bins=4, min_ivf_size=64)
+    first = labels < 630
+    enroll(index, histograms[first], labels[first], step=3)
+    # 63 labels: every prototype is scored
+    assert index.centroids is None
+    enroll(index, histograms[~first], labels[~first], step=3)
+    assert index.centroids is not None
+
+
+def test_search_while_adding():
+    histograms, labels = random_gallery(8, 200, samples=2)
+    index = GalleryIndex(bins_per_cell=BINS, coarse_bins=4, min_ivf_size=16)
+    enroll(index, histograms[:2], labels[:2], step=2)
+    errors = []
+
+    def register():
+        try:
+            enroll(index, histograms[2:], labels[2:], step=1)
+        except Exception as e:
+            errors.append(e)
+
+    worker = threading.Thread(target=register)
+    worker.start()
+    probes = histograms[::17] + 0.01
+    while worker.is_alive():
+        for result in index.search(probes, k=3):
+            # Every published label has its samples
+            assert result and all(label in index.samples for label, _ in result)
+    worker.join()
+    assert not errors
+    assert len(index) == 200
+
+
+def stored_gallery(tmp_path, identities=6):
+    histograms, labels = random_gallery(3, identities)
+    store = GalleryStore(str(tmp_path / "gallery.bin"))
+    store.append(histograms, labels)
+    return store
+
+
+def test_open_saves_and_reuses_the_sidecar(tmp_path, monkeypatch):
+    store = stored_gallery(tmp_path)
+    path = str(tmp_path / "gallery.idx")
+    first = GalleryIndex(bins_per_cell=BINS, coarse_bins=4, min_ivf_size=4, path=path)
+    assert not first.open(store)
+    assert first.centroids is not None
+
+    # A matching sidecar is used as is: no gallery read, no k-means
+    monkeypatch.setattr(GalleryIndex, "build", lambda *args: pytest.fail("gallery was read"))
+    monkeypatch.setattr(GalleryIndex, "_rebuild_lists", lambda *args: pytest.fail("k-means ran"))
+    second = GalleryIndex(bins_per_cell=BINS, coarse_bins=4, min_ivf_size=4, path=path)
+    assert second.open(store)
+    assert second.labels == first.labels
+    assert second.runs == first.runs
+    assert second.lists == first.lists
+    np.testing.assert_array_equal(second.centroids, first.centroids)
+    np.testing.assert_array_equal(second.prototypes, first.prototypes)
+    np.testing.assert_array_equal(second.prototype_sums, first.prototype_sums)
+    probes = np.asarray(store.histograms[::4], dtype=np.float32) + 0.01
+    assert second.search(probes, k=2) == first.search(probes, k=2)
+
+
+def test_add_then_save_matches_a_rebuild(tmp_path):
+    store = stored_gallery(tmp_path)
+    path = str(tmp_path / "gallery.idx")
+    index = GalleryIndex(bins_per_cell=BINS, coarse_bins=4, min_ivf_size=4, path=path)
+    index.open(store)
+    # Enough new employees to outgrow the preallocated rows
+    histograms, labels = random_gallery(4, 30)
+    for label in np.unique(labels):
+        rows = histograms[labels == label]
+        start = store.append(rows, np.full(len(rows), label + 1))
+        index.add(store.histograms[start:], label + 1, store.row_sums[start:], start)
+    index.save(store)
+
+    reopened = GalleryIndex(bins_per_cell=BINS, coarse_bins=4, min_ivf_size=4, path=path)
+    assert reopened.open(store)
+    assert reopened.lists == index.lists
+    probes = np.asarray(store.histograms[::7], dtype=np.float32) + 0.01
+    assert reopened.search(probes) == index.search(probes)
+
+    rebuilt = GalleryIndex(bins_per_cell=BINS, coarse_bins=4)
+    rebuilt.build(store.histograms, store.labels, store.row_sums)
+    assert reopened.labels == rebuilt.labels
+    np.testing.assert_allclose(reopened.prototypes, rebuilt.prototypes, rtol=1e-5, atol=1e-7)
+    np.testing.assert_allclose(reopened.coarse, rebuilt.coarse, rtol=1e-5, atol=1e-7)
+
+
+@pytest.mark.parametrize("change", ["other gallery", "gallery grew", "damaged"])
+def test_stale_sidecar_is_rebuilt(tmp_path, change):
+    store = stored_gallery(tmp_path)
+    path = str(tmp_path / "gallery.idx")
+    GalleryIndex(bins_per_cell=BINS, coarse_bins=4, path=path).open(store)
+    if change == "other gallery":
+        os.remove(store.path)
+        store = stored_gallery(tmp_path)
+    elif change == "gallery grew":
+        histograms, labels = random_gallery(5, 1)
+        store.append(histograms, labels + 1)
+    else:
+        with open(path, "r+b") as f:
+            f.seek(-8, os.SEEK_END)
+            tail = f.read(8)
+            f.seek(-8, os.SEEK_END)
+            f.write(bytes(b ^ 0xFF for b in tail))
+
+    index = GalleryIndex(bins_per_cell=BINS, coarse_bins=4, path=path)
+    assert not index.open(store)
+    rebuilt = GalleryIndex(bins_per_cell=BINS, coarse_bins=4)
+    rebuilt.build(store.histograms, store.labels)
+    assert index.labels == rebuilt.labels
+    np.testing.assert_allclose(index.prototypes, rebuilt.prototypes, rtol=1e-6)
+    # ... and saved again
+    assert GalleryIndex(bins_per_cell=BINS, coarse_bins=4, path=path).open(store)
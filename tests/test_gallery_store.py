@@ -0,0 +1,52 @@
+import os
+
+import numpy as np
+import pytest
+
+from gallery_store import GalleryStore
+
+
+def random_rows(seed, count, dim=32):
+    rng = np.random.default_rng(seed)
+    return rng.random((count, dim)).astype(np.float32), rng.integers(1, 50, count)
+
+
+def test_append_maps_labels_sums_and_histograms(tmp_path):
+    path = str(tmp_path / "gallery.bin")
+    store = GalleryStore(path)
+    histograms, labels = random_rows(0, 5)
+    assert store.append(histograms[:2], labels[:2]) == 0
+    assert store.append(histograms[2:], labels[2:]) == 2
+
+    reopened = GalleryStore(path)
+    assert len(reopened) == 5
+    assert reopened.file_id == store.file_id
+    np.testing.assert_array_equal(reopened.labels, labels)
+    np.testing.assert_array_equal(reopened.histograms, histograms.astype(np.float16))
+    np.testing.assert_array_equal(reopened.row_sums,
+                                  reopened.histograms.sum(axis=1, dtype=np.float64))
+
+
+def test_append_keeps_existing_rows_in_place(tmp_path):
+    path = str(tmp_path / "gallery.bin")
+    store = GalleryStore(path)
+    histograms, labels = random_rows(1, 300)
+    store.append(histograms[:100], labels[:100])
+    before = open(path, "rb").read()
+    inode = os.stat(path).st_ino
+    # Views handed out before an append stay valid
+    first = store.histograms[:100]
+
+    store.append(histograms[100:], labels[100:])
+    after = open(path, "rb").read()
+    assert os.stat(path).st_ino == inode
+    assert after[64:len(before)] == before[64:]
+    np.testing.assert_array_equal(first, histograms[:100].astype(np.float16))
+    assert len(GalleryStore(path)) == 300
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / "gallery.bin"
+    path.write_bytes(b"not a gallery".ljust(64, b"\0"))
+    with pytest.raises(ValueError):
+        GalleryStore(str(path))
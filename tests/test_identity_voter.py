@@ -0,0 +1,98 @@
+"""IdentityVoter and the per-track identification schedule of FaceTracker"""
+import numpy as np
+import pytest
+
+from tracker import FaceTracker, IdentityVoter
+
+GRAY = np.full((240, 320), 100, dtype=np.uint8)
+BOX = (40, 60, 80, 80)
+
+
+def test_identity_needs_votes_and_a_margin():
+    voter = IdentityVoter(window=7, threshold=65, min_votes=3, margin=2)
+    assert voter.decision() is None
+    voter.add(4, 40)
+    voter.add(4, 50)
+    assert voter.decision() is None  # Two votes
+    voter.add(9, 45)
+    voter.add(9, 45)
+    voter.add(4, 60)
+    assert voter.decision() is None  # Three votes, one ahead of the runner-up
+    voter.add(4, 30)
+    assert voter.decision() == (4, pytest.approx(45.0))
+
+
+def test_distances_above_the_threshold_vote_unknown():
+    voter = IdentityVoter(threshold=65)
+    for distance in (70, 80, 90):
+        voter.add(4, distance)
+    assert voter.decision() == (None, pytest.approx(80.0))
+
+
+def test_old_votes_leave_the_window():
+    voter = IdentityVoter(window=3, min_votes=3, margin=2)
+    for id_ in (4, 4, 9, 9, 9):
+        voter.add(id_, 40)
+    assert voter.decision() == (9, 40.0)
+
+
+def test_confirmed_employee_is_not_identified_again():
+    tracker = FaceTracker(vote_interval=0.1)
+    [track] = tracker.update(GRAY, [BOX], now=0.0)
+    now = 0.0
+    while not track.confirmed:
+        assert tracker.pending_identification(now) == [track]
+        track.add_result((4, 40), now)
+        # Sampled every vote_interval
+        assert tracker.pending_identification(now + 0.05) == []
+        now += 0.1
+    assert track.identity == (4, 40.0)
+    assert now == pytest.approx(0.3)
+
+    # Never again while the track lives
+    for later in (1.0, 10.0, 100.0):
+        tracker.update(GRAY, [BOX], now=later)
+        assert tracker.pending_identification(later) == []
+
+
+def test_confirmed_unknown_is_checked_again():
+    tracker = FaceTracker(vote_interval=0.1, unknown_refresh=2.0)
+    [track] = tracker.update(GRAY, [BOX], now=0.0)
+    for step in range(3):
+        track.add_result((None, 100), step * 0.1)
+    assert track.confirmed and track.identity[0] is None
+
+    assert tracker.pending_identification(1.0) == []
+    assert tracker.pending_identification(2.2) == [track]
+    assert not track.confirmed
+    # The vote starts over instead of reusing the unknown votes
+    track.add_result((4, 40), 2.2)
+    assert track.identity[0] is None and len(track.voter.window) == 1
+
+
+def test_vote_starts_over_when_the_track_is_lost():
+    tracker = FaceTracker(max_misses=1)
+    [track] = tracker.update(GRAY, [BOX], now=0.0)
+    track.add_result((4, 40), 0.0)
+    track.add_result((4, 40), 0.1)
+
+    # Lost before the vote was committed
+    tracker.update(GRAY, [], now=0.2)
+    assert tracker.update(GRAY, [], now=0.3) == []
+
+    [again] = tracker.update(GRAY, [BOX], now=0.4)
+    assert again is not track
+    assert not again.confirmed and again.identity == (None, 100)
+    assert len(again.voter.window) == 0
+    assert tracker.pending_identification(0.4) == [again]
+    # One more vote is not enough: the two votes of the lost track are gone
+    again.add_result((4, 40), 0.4)
+    assert not again.confirmed
+
+    # A confirmed identity does not survive reset() either
+    for step in range(2):
+        again.add_result((4, 40), 0.5 + step * 0.1)
+    assert again.confirmed
+    tracker.reset()
+    [fresh] = tracker.update(GRAY, [BOX], now=1.0)
+    assert not fresh.confirmed and tracker.pending_identification(1.0) == [fresh]
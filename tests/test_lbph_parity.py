@@ -0,0 +1,122 @@
+"""identify_batch() and lbp_histograms() against cv2.face.LBPHFaceRecognizer"""
+import cv2
+import numpy as np
+import pytest
+
+from face_engine import FaceEngine, FACE_SIZE
+
+pytestmark = pytest.mark.skipif(not hasattr(cv2, "face"), reason="needs opencv-contrib-python")
+
+
+def synthetic_face(person, rng, noise=20):
+    """Smooth random pattern per person plus per-sample noise"""
+    base = np.random.default_rng(person).integers(0, 256, (FACE_SIZE[1], FACE_SIZE[0]))
+    base = cv2.GaussianBlur(base.astype(np.uint8), (7, 7), 0).astype(np.int16)
+    return np.clip(base + rng.integers(-noise, noise + 1, base.shape), 0, 255).astype(np.uint8)
+
+
+@pytest.fixture
+def engine(tmp_path, monkeypatch):
+    # gallery.bin is created in the working directory
+    monkeypatch.chdir(tmp_path)
+    engine = FaceEngine(face_mesh=False, object_detection=False)
+    # Plain resize of the boxes, so the crops are exactly what cv2 sees
+    engine.alignment = False
+    return engine
+
+
+@pytest.fixture
+def gallery():
+    rng = np.random.default_rng(0)
+    faces, labels = [], []
+    for person in range(1, 7):
+        for _ in range(5):
+            faces.append(synthetic_face(person, rng))
+            labels.append(person)
+    return faces, labels
+
+
+def reference(engine, faces, labels):
+    recognizer = cv2.face.LBPHFaceRecognizer_create(
+        radius=engine.recognizer.getRadius(),
+        neighbors=engine.recognizer.getNeighbors(),
+        grid_x=engine.recognizer.getGridX(),
+        grid_y=engine.recognizer.getGridY())
+    recognizer.train([engine.preprocess_face(f) for f in faces], np.array(labels, dtype=np.int32))
+    return recognizer
+
+
+def test_histograms_match_opencv(engine, gallery):
+    faces, labels = gallery
+    recognizer = reference(engine, faces, labels)
+    stack = np.stack([engine.preprocess_face(f) for f in faces])
+
+    ours = engine.lbp_histograms(stack)
+    theirs = np.vstack([h.ravel() for h in recognizer.getHistograms()])
+    assert ours.shape == theirs.shape
+    np.testing.assert_allclose(ours, theirs, atol=1e-6)
+
+
+def probe_frame(persons, seed):
+    """Faces of `persons` side by side in one gray frame, with their boxes"""
+    rng = np.random.default_rng(seed)
+    probes = [synthetic_face(person, rng, noise=30) for person in persons]
+    gray = np.zeros((480, 640), np.uint8)
+    boxes = []
+    for i, probe in enumerate(probes):
+        x, y = 10 + i * 120, 40 + (i % 2) * 200
+        gray[y:y + FACE_SIZE[1], x:x + FACE_SIZE[0]] = probe
+        boxes.append((x, y, FACE_SIZE[0], FACE_SIZE[1]))
+    return probes, gray, boxes
+
+
+def test_identify_batch_matches_predict(engine, gallery):
+    faces, labels = gallery
+    recognizer = reference(engine, faces, labels)
+    engine.train_model(faces, labels, aligned=True)
+    # Same samples as cv2, without the float16 rounding of gallery.bin
+    histograms = np.vstack([h.ravel() for h in recognizer.getHistograms()])
+    engine.index.build(histograms, np.array(labels))
+
+    # Known people and one stranger (42) in one frame
+    probes, gray, boxes = probe_frame((1, 3, 5, 6, 42), seed=1)
+    results = engine.identify_batch(gray, boxes)
+    assert len(results) == len(boxes)
+    for probe, (label, distance) in zip(probes, results):
+        expected_label, expected_distance = recognizer.predict(engine.preprocess_face(probe))
+        assert label == expected_label
+        assert distance == pytest.approx(expected_distance, rel=1e-6)
+
+
+def test_identify_batch_with_stored_gallery(engine, gallery):
+    faces, labels = gallery
+    recognizer = reference(engine, faces, labels)
+    assert engine.train_model(faces, labels, aligned=True)
+
+    probes, gray, boxes = probe_frame((2, 4, 6, 42), seed=3)
+    for probe, (label, distance) in zip(probes, engine.identify_batch(gray, boxes)):
+        expected_label, expected_distance = recognizer.predict(engine.preprocess_face(probe))
+        assert label == expected_label
+        # gallery.bin keeps float16 histograms
+        assert distance == pytest.approx(expected_distance, rel=1e-3)
+
+
+def test_identify_batch_matches_identify(engine, gallery):
+    faces, labels = gallery
+    engine.train_model(faces, labels, aligned=True)
+    rng = np.random.default_rng(2)
+    probes = [synthetic_face(person, rng) for person in (2, 4)]
+    gray = np.hstack(probes)
+    boxes = [(0, 0, FACE_SIZE[0], FACE_SIZE[1]), (FACE_SIZE[0], 0, FACE_SIZE[0], FACE_SIZE[1])]
+
+    batch = engine.identify_batch(gray, boxes)
+    single = [engine.identify(probe) for probe in probes]
+    assert [label for label, _ in batch] == [label for label, _ in single] == [2, 4]
+    for (_, a), (_, b) in zip(batch, single):
+        assert a == pytest.approx(b)
+
+
+def test_untrained_engine_returns_unknown(engine):
+    gray = np.zeros((200, 200), np.uint8)
+    assert engine.identify_batch(gray, [(0, 0, 100, 100)]) == [(None, 100)]
+    assert engine.identify_batch(gray, []) == []
@@ -0,0 +1,112 @@
+"""Schema migrations and the query plans of the hot queries"""
+import random
+import sqlite3
+from datetime import datetime, timedelta
+
+import pytest
+
+import init_db
+from database_manager import DatabaseManager
+from migrations import MIGRATIONS, QUERY_PLAN_CHECKS, SCHEMA_VERSION, check_query_plans, migrate, schema_version
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "attendance.db"))
+    migrate(conn)
+    yield conn
+    conn.close()
+
+
+def plan(conn, query, params):
+    return " | ".join(row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + query, params))
+
+
+def test_migrate_to_current_version(tmp_path):
+    conn = sqlite3.connect(str(tmp_path / "attendance.db"))
+    assert migrate(conn) == list(range(1, SCHEMA_VERSION + 1))
+    assert schema_version(conn) == SCHEMA_VERSION
+    # A second run has nothing to do
+    assert migrate(conn) == []
+    conn.close()
+
+
+@pytest.mark.parametrize("query, params, index", QUERY_PLAN_CHECKS,
+                         ids=[index for _, _, index in QUERY_PLAN_CHECKS])
+def test_hot_query_uses_index(conn, query, params, index):
+    query_plan = plan(conn, query, params)
+    assert index in query_plan
+    assert "USE TEMP B-TREE" not in query_plan
+
+
+def test_check_query_plans_reports_missing_index(tmp_path):
+    path = str(tmp_path / "attendance.db")
+    conn = sqlite3.connect(path)
+    migrate(conn)
+    assert check_query_plans(conn) == []
+    conn.execute("DROP INDEX idx_attendance_ts")
+    conn.close()
+
+    # New connection: cached EXPLAIN statements keep their old plan
+    conn = sqlite3.connect(path)
+    problems = check_query_plans(conn)
+    conn.close()
+    assert len(problems) == sum(index == "idx_attendance_ts" for _, _, index in QUERY_PLAN_CHECKS)
+    assert all("idx_attendance_ts" in problem for problem in problems)
+
+
+def migrate_to(conn, version):
+    """Apply the first `version` migrations only, like an older release"""
+    for statements in MIGRATIONS[:version]:
+        for statement in statements:
+            conn.execute(statement)
+    conn.execute(f"PRAGMA user_version = {version}")
+    conn.commit()
+
+
+def random_punches(conn, seed=0, employees=5, count=400):
+    """Punches around local midnight, with repeats, gaps and LATE statuses"""
+    rng = random.Random(seed)
+    start = datetime(2026, 3, 1, 12, 0, 0)
+    for i in range(count):
+        ts = start + timedelta(minutes=rng.randrange(0, 6 * 24 * 60))
+        conn.execute(
+            "INSERT INTO attendance (employee_id, timestamp, action_type, status) VALUES (?, ?, ?, ?)",
+            (rng.randrange(1, employees + 1), ts.strftime("%Y-%m-%d %H:%M:%S"),
+             rng.choice(("IN", "IN", "OUT", "OUT", "OUT")), rng.choice(("ON_TIME", "LATE"))))
+    conn.commit()
+
+
+SUMMARY = "SELECT * FROM daily_summary ORDER BY employee_id, day"
+
+
+def test_summary_backfill_matches_replay(tmp_path, local_time):
+    path = str(tmp_path / "attendance.db")
+    conn = sqlite3.connect(path)
+    migrate_to(conn, 3)
+    random_punches(conn)
+    # Same path as init_db.py / python migrations.py
+    assert 4 in migrate(conn)
+    migrated = conn.execute(SUMMARY).fetchall()
+    conn.close()
+    assert migrated
+
+    db = DatabaseManager(path)
+    assert db.rebuild_daily_summary() == 400
+    replayed = db.get_connection().execute(SUMMARY).fetchall()
+    db.close()
+    assert migrated == replayed
+
+
+def test_init_db_fills_summary(tmp_path, monkeypatch, local_time):
+    monkeypatch.chdir(tmp_path)
+    conn = sqlite3.connect("attendance.db")
+    migrate_to(conn, 3)
+    random_punches(conn, seed=1, count=50)
+    conn.close()
+
+    init_db.init_db()
+    db = DatabaseManager("attendance.db")
+    punches = db.get_connection().execute("SELECT SUM(punches) FROM daily_summary").fetchone()[0]
+    db.close()
+    assert punches == 50
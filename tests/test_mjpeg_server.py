@@ -0,0 +1,73 @@
+"""MJPEGServer over real local HTTP"""
+import json
+import socket
+import time
+from urllib.request import urlopen
+
+import cv2
+import numpy as np
+import pytest
+
+from mjpeg_server import BOUNDARY, MJPEGServer
+
+
+@pytest.fixture
+def server():
+    server = MJPEGServer(idle_timeout=0.2).start()
+    yield server
+    server.stop()
+
+
+def frame(value):
+    return np.full((120, 160, 3), value, np.uint8)
+
+
+def fetch(url):
+    with urlopen(url, timeout=5) as response:
+        assert response.headers["Content-Type"] == "image/jpeg"
+        return cv2.imdecode(np.frombuffer(response.read(), np.uint8), cv2.IMREAD_COLOR)
+
+
+def test_frame_jpg_is_the_latest_frame(server):
+    seq = server.publish(frame(40))
+    # The request marks the preview as watched, so the next frame is encoded
+    assert abs(int(fetch(server.frame_url(seq)).mean()) - 40) <= 2
+    seq = server.publish(frame(200))
+    image = fetch(server.frame_url(seq))
+    assert image.shape == (120, 160, 3)
+    assert abs(int(image.mean()) - 200) <= 2
+
+
+def test_stream_sends_multipart_frames(server):
+    server.publish(frame(10))
+    host, port = server.stream_url.split("/")[2].split(":")
+    with socket.create_connection((host, int(port)), timeout=5) as sock:
+        sock.sendall(b"GET /stream.mjpg HTTP/1.0\r\n\r\n")
+        data = b""
+        for value in (60, 120, 180):
+            time.sleep(0.05)
+            server.publish(frame(value))
+        deadline = time.monotonic() + 5
+        while data.count(b"--" + BOUNDARY.encode("ascii")) < 2 and time.monotonic() < deadline:
+            data += sock.recv(1 << 16)
+    assert b"multipart/x-mixed-replace" in data
+    assert data.count(b"\xff\xd8") >= 2  # JPEG start markers
+
+
+def test_idle_server_does_not_encode(server):
+    server.publish(frame(0))
+    encoded = server.encoded
+    time.sleep(0.3)  # past idle_timeout without any request
+    for _ in range(5):
+        server.publish(frame(0))
+    assert server.encoded == encoded
+    assert server.published == 6
+
+
+def test_stats_json(server):
+    server.publish(frame(0))
+    url = server.stream_url.replace("/stream.mjpg", "/stats.json")
+    with urlopen(url, timeout=5) as response:
+        stats = json.load(response)
+    assert stats["encoded"] == 1
+    assert stats["quality"] == server.quality
@@ -0,0 +1,76 @@
+"""OverlayRenderer against the original full-frame draw_tech_face()"""
+import cv2
+import numpy as np
+import pytest
+
+from overlay import GRID_ALPHA, LABEL_ALPHA, OverlayRenderer
+
+
+def reference_draw_face(img, x, y, w, h, color, label, now):
+    """The original draw_tech_face() of main_qt.py, the golden output"""
+    l = int(w * 0.15)
+    t = 2
+    cv2.line(img, (x, y), (x+l, y), color, t)
+    cv2.line(img, (x, y), (x, y+l), color, t)
+    cv2.line(img, (x+w, y), (x+w-l, y), color, t)
+    cv2.line(img, (x+w, y), (x+w, y+l), color, t)
+    cv2.line(img, (x, y+h), (x+l, y+h), color, t)
+    cv2.line(img, (x, y+h), (x, y+h-l), color, t)
+    cv2.line(img, (x+w, y+h), (x+w-l, y+h), color, t)
+    cv2.line(img, (x+w, y+h), (x+w, y+h-l), color, t)
+
+    overlay = img.copy()
+    for i in range(1, 4):
+        vx = x + int(w * i / 4)
+        cv2.line(overlay, (vx, y), (vx, y + h), color, 1)
+    for i in range(1, 4):
+        vy = y + int(h * i / 4)
+        cv2.line(overlay, (x, vy), (x + w, vy), color, 1)
+    scan_y = y + int((h * (now * 2 % 1)))
+    cv2.line(overlay, (x, scan_y), (x + w, scan_y), color, 2)
+    cv2.addWeighted(overlay, GRID_ALPHA, img, 1 - GRID_ALPHA, 0, img)
+
+    label_overlay = img.copy()
+    cv2.rectangle(label_overlay, (x, y + h + 5), (x + w, y + h + 30), color, -1)
+    cv2.addWeighted(label_overlay, LABEL_ALPHA, img, 1 - LABEL_ALPHA, 0, img)
+
+    cv2.putText(img, label, (x + 10, y + h + 23),
+                cv2.FONT_HERSHEY_DUPLEX, 0.5, (255, 255, 255), 1, cv2.LINE_AA)
+
+
+def random_faces(rng, count, width, height):
+    faces = []
+    for _ in range(count):
+        w = int(rng.integers(40, 260))
+        h = int(w * rng.uniform(0.9, 1.3))
+        # Some boxes run past the frame edges
+        x = int(rng.integers(-w // 2, width - w // 2))
+        y = int(rng.integers(-h // 2, height - h // 2))
+        color = (0, 255, 0) if rng.random() < 0.5 else (0, 0, 255)
+        faces.append((x, y, w, h, color, "Desconocido" if color[1] == 0 else "Empleado"))
+    return faces
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_same_pixels_as_original(seed, width=640, height=480):
+    rng = np.random.default_rng(seed)
+    # One renderer across frames, so cached sprites are reused too
+    renderer = OverlayRenderer(cache_size=16)
+    for _ in range(100):
+        frame = rng.integers(0, 256, (height, width, 3), np.uint8)
+        faces = random_faces(rng, int(rng.integers(1, 9)), width, height)
+        now = float(rng.uniform(0, 1e6))
+        expected, actual = frame.copy(), frame.copy()
+        for face in faces:
+            reference_draw_face(expected, *face, now)
+            renderer.draw_face(actual, *face, now=now)
+        np.testing.assert_array_equal(actual, expected)
+    assert renderer.sprite_hits + renderer.sprite_misses > 0
+
+
+def test_sprites_are_cached():
+    renderer = OverlayRenderer()
+    frame = np.zeros((480, 640, 3), np.uint8)
+    for n in range(10):
+        renderer.draw_face(frame, 100, 80, 120, 140, (0, 255, 0), "Empleado", now=n / 30.0)
+    assert renderer.stats() == {"sprites": 1, "sprite_hits": 9, "sprite_misses": 1}
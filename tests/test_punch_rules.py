@@ -0,0 +1,84 @@
+"""Repeated punches rejected by mark_attendance_batch (PUNCH_INSERT)"""
+import sqlite3
+import uuid
+
+import numpy as np
+import pytest
+
+from database_manager import DatabaseManager
+
+
+@pytest.fixture
+def db(tmp_path, local_time):
+    db = DatabaseManager(str(tmp_path / "attendance.db"))
+    db.add_employee("Ana", "1", "ana@example.com", np.zeros(4), "")
+    yield db
+    db.close()
+
+
+def punch(action_type, timestamp, status="ON_TIME"):
+    return {"event_id": uuid.uuid4().hex, "employee_id": 1, "action_type": action_type,
+            "status": status, "timestamp": timestamp}
+
+
+def stored(db):
+    return db.get_connection().execute(
+        "SELECT action_type, timestamp FROM attendance ORDER BY timestamp").fetchall()
+
+
+def summary(db):
+    return db.get_connection().execute("SELECT * FROM daily_summary ORDER BY day").fetchall()
+
+
+def test_rejected_inside_the_cooldown(db):
+    # UTC, 08:00 and 08:00:30 local
+    assert db.mark_attendance_batch([punch("IN", "2026-03-02 11:00:00")]) == [True]
+    assert db.mark_attendance_batch([punch("OUT", "2026-03-02 11:00:30")]) == [False]
+    # ... also by the database when this process did not see the punch
+    db.last_events.clear()
+    assert db.mark_attendance_batch([punch("OUT", "2026-03-02 11:00:59")]) == [False]
+    assert db.mark_attendance_batch([punch("OUT", "2026-03-02 11:01:01")]) == [True]
+    assert len(stored(db)) == 2
+
+
+def test_same_action_rejected_on_the_same_local_day(db):
+    assert db.mark_attendance_batch([punch("IN", "2026-03-02 11:00:00")]) == [True]
+    assert db.mark_attendance_batch([punch("IN", "2026-03-02 15:00:00")]) == [False]
+    # 01:00 UTC on the 3rd is still the 2nd locally
+    assert db.mark_attendance_batch([punch("IN", "2026-03-03 01:00:00")]) == [False]
+    # 04:00 UTC on the 3rd is the next local day
+    assert db.mark_attendance_batch([punch("IN", "2026-03-03 04:00:00")]) == [True]
+
+
+def test_out_of_order_replay_is_kept(db):
+    # OUT at 17:00 local, then a journal replays the IN of 08:00
+    assert db.mark_attendance_batch([punch("OUT", "2026-03-02 20:00:00")]) == [True]
+    assert db.mark_attendance_batch([punch("IN", "2026-03-02 11:00:00")]) == [True]
+    assert stored(db) == [("IN", "2026-03-02 11:00:00"), ("OUT", "2026-03-02 20:00:00")]
+    # Checked against its own predecessor: a second 08:00 IN still repeats it
+    assert db.mark_attendance_batch([punch("IN", "2026-03-02 11:00:20")]) == [False]
+
+    # The day is refolded in timestamp order
+    replayed = summary(db)
+    assert replayed[0][5] == 9 * 3600
+    db.rebuild_daily_summary()
+    assert summary(db) == replayed
+
+
+def test_other_process_between_check_and_insert(db, monkeypatch):
+    assert db.mark_attendance_batch([punch("IN", "2026-03-02 11:00:00")]) == [True]
+    check = db._in_cooldown
+
+    def other_kiosk_punches(event):
+        passed = check(event)
+        other = sqlite3.connect(db.db_path)
+        other.execute("INSERT INTO attendance (employee_id, action_type, status, timestamp) "
+                      "VALUES (1, 'OUT', 'ON_TIME', '2026-03-02 20:00:00')")
+        other.commit()
+        other.close()
+        return passed
+
+    monkeypatch.setattr(db, "_in_cooldown", other_kiosk_punches)
+    # Passes this process's check, the database sees the other OUT
+    assert db.mark_attendance_batch([punch("OUT", "2026-03-02 20:00:10")]) == [False]
+    assert stored(db) == [("IN", "2026-03-02 11:00:00"), ("OUT", "2026-03-02 20:00:00")]
@@ -0,0 +1,71 @@
+"""PagedReportModel keeps paginating after a failed page"""
+import os
+import sqlite3
+import time
+
+import numpy as np
+import pytest
+
+pytest.importorskip("PyQt6")
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PyQt6.QtCore import QModelIndex
+from PyQt6.QtWidgets import QApplication
+
+from database_manager import DatabaseManager
+from db_executor import DatabaseExecutor
+from main_qt import DatabaseBridge, PagedReportModel
+
+
+@pytest.fixture(scope="module")
+def app():
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture
+def bridge(tmp_path, app):
+    db = DatabaseManager(str(tmp_path / "attendance.db"))
+    db.add_employee("Ana", "1", "ana@example.com", np.zeros(4), "")
+    for day in range(5):
+        db.mark_attendance_batch([{"event_id": None, "employee_id": 1, "action_type": "IN",
+                                   "status": "ON_TIME", "timestamp": f"2026-03-0{day + 1} 11:00:00"}])
+    executor = DatabaseExecutor(db)
+    executor.start()
+    bridge = DatabaseBridge(executor)
+    bridge.db = db
+    yield bridge
+    executor.stop()
+    db.close()
+
+
+def wait_for(app, condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline
+        app.processEvents()
+        time.sleep(0.005)
+
+
+def test_failed_page_is_reported_and_retried(app, bridge):
+    failures = [sqlite3.OperationalError("database is locked")]
+    errors = []
+    bridge.error.connect(errors.append)
+
+    def fetch_page(*args):
+        if failures:
+            raise failures.pop()
+        return bridge.db.get_attendance_page(*args)
+
+    model = PagedReportModel(bridge, fetch_page, ["Fecha", "Nombre"],
+                             key=lambda row: (row[0], row[5]), page_size=2)
+    model.set_filters()
+    wait_for(app, lambda: errors)
+    assert errors == ["Error de base de datos: database is locked"]
+    assert model.rowCount() == 0 and model.canFetchMore(QModelIndex())
+
+    # Not stuck loading: the next request fetches the page
+    while model.canFetchMore(QModelIndex()):
+        rows = model.rowCount()
+        model.fetchMore(QModelIndex())
+        wait_for(app, lambda: model.rowCount() > rows or not model.canFetchMore(QModelIndex()))
+    assert model.rowCount() == 5
@@ -0,0 +1,49 @@
+"""Date filters of the attendance report and the daily summary"""
+import random
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pytest
+
+from database_manager import DatabaseManager
+
+
+@pytest.fixture
+def db(tmp_path, local_time):
+    db = DatabaseManager(str(tmp_path / "attendance.db"))
+    for i in range(3):
+        db.add_employee(f"Empleado {i}", str(i), f"{i}@example.com", np.zeros(4), "")
+    # UTC timestamps around local midnight (UTC-3)
+    rng = random.Random(0)
+    start = datetime(2026, 3, 1, 0, 0, 0)
+    conn = db.get_connection()
+    for _ in range(300):
+        ts = start + timedelta(minutes=rng.randrange(0, 5 * 24 * 60))
+        conn.execute(
+            "INSERT INTO attendance (employee_id, timestamp, action_type, status) VALUES (?, ?, ?, ?)",
+            (rng.randrange(1, 4), ts.strftime("%Y-%m-%d %H:%M:%S"), rng.choice(("IN", "OUT")), "ON_TIME"))
+    conn.commit()
+    db.rebuild_daily_summary()
+    yield db
+    db.close()
+
+
+def local_day(timestamp):
+    utc = datetime.strptime(timestamp, "%Y-%m-%d %H:%M:%S").replace(tzinfo=timezone.utc)
+    return utc.astimezone().strftime("%Y-%m-%d")
+
+
+@pytest.mark.parametrize("date_from, date_to", [
+    ("2026-03-01", "2026-03-01"),
+    ("2026-03-02", "2026-03-03"),
+    ("2026-02-28", "2026-03-05"),
+])
+def test_attendance_page_filters_local_days(db, date_from, date_to):
+    rows = db.get_attendance_page(limit=1000, date_from=date_from, date_to=date_to)
+    everything = db.get_attendance_page(limit=1000)
+    expected = {row[5] for row in everything if date_from <= local_day(row[0]) <= date_to}
+    assert {row[5] for row in rows} == expected
+
+    # Same days as the summary
+    summary = db.get_daily_summary_page(limit=1000, date_from=date_from, date_to=date_to)
+    assert len(rows) == sum(row[7] for row in summary)
@@ -0,0 +1,85 @@
+"""FaceTracker: IoU association and Lucas-Kanade prediction between detections"""
+import cv2
+import numpy as np
+import pytest
+
+from tracker import FaceTracker, iou
+
+PATCH = cv2.normalize(
+    cv2.GaussianBlur(np.random.default_rng(0).integers(0, 256, (80, 80)).astype(np.float32), (0, 0), 2),
+    None, 0, 255, cv2.NORM_MINMAX).astype(np.uint8)
+
+
+def scene(*corners):
+    """Flat gray frame with the textured patch at each (x, y)"""
+    gray = np.full((240, 320), 100, dtype=np.uint8)
+    for x, y in corners:
+        gray[y:y + 80, x:x + 80] = PATCH
+    return gray
+
+
+def test_iou():
+    assert iou((0, 0, 10, 10), (0, 0, 10, 10)) == 1.0
+    assert iou((0, 0, 10, 10), (5, 0, 10, 10)) == pytest.approx(50 / 150)
+    assert iou((0, 0, 10, 10), (10, 0, 10, 10)) == 0.0
+
+
+def test_track_follows_the_face_between_detections():
+    tracker = FaceTracker()
+    [track] = tracker.update(scene((40, 60)), [(40, 60, 80, 80)], now=0.0)
+
+    # Three frames without detection, 4 px right and 2 px down each
+    for step in range(1, 4):
+        assert tracker.predict(scene((40 + 4 * step, 60 + 2 * step)), now=step * 0.1) == [track]
+    x, y, _, _ = track.box
+    assert abs(x - 52) <= 1 and abs(y - 66) <= 1
+    assert track.misses == 0 and track.last_seen == pytest.approx(0.3)
+
+    # The next detection lands on the predicted box and keeps the ID
+    assert tracker.update(scene((56, 68)), [(56, 68, 80, 80)], now=0.4) == [track]
+    assert track.box == (56, 68, 80, 80)
+
+
+def test_each_face_keeps_its_own_track():
+    tracker = FaceTracker()
+    left, right = tracker.update(scene((20, 60), (200, 60)), [(20, 60, 80, 80), (200, 60, 80, 80)], now=0.0)
+    assert left.id != right.id
+    # Detection order does not matter, only the overlap
+    assert tracker.update(scene((24, 60), (196, 60)), [(196, 60, 80, 80), (24, 60, 80, 80)], now=0.1) == [left, right]
+    assert left.box == (24, 60, 80, 80) and right.box == (196, 60, 80, 80)
+
+
+def test_track_is_dropped_when_lost():
+    tracker = FaceTracker(max_misses=2)
+    [track] = tracker.update(scene((40, 60)), [(40, 60, 80, 80)], now=0.0)
+
+    # The face leaves and the cascade finds nothing for more than max_misses updates
+    empty = scene()
+    for step in range(1, 3):
+        assert tracker.update(empty, [], now=step * 0.1) == [track]
+        assert track.misses == step
+    assert tracker.update(empty, [], now=0.3) == []
+
+    # Coming back starts a new track
+    [again] = tracker.update(scene((40, 60)), [(40, 60, 80, 80)], now=0.4)
+    assert again.id != track.id
+
+
+def test_track_without_points_is_dropped_by_predict():
+    tracker = FaceTracker(max_misses=2)
+    # A detection on a flat area leaves no corners to follow
+    [track] = tracker.update(scene(), [(40, 60, 80, 80)], now=0.0)
+    assert track.points is None
+    for step in range(1, 3):
+        assert tracker.predict(scene(), now=step * 0.1) == [track]
+        assert track.misses == step and track.box == (40, 60, 80, 80)
+    assert tracker.predict(scene(), now=0.3) == []
+
+
+def test_unmatched_detection_starts_a_new_track():
+    tracker = FaceTracker()
+    [track] = tracker.update(scene((20, 60)), [(20, 60, 80, 80)], now=0.0)
+    # Far away from the track: no overlap, new ID; the old one counts a miss
+    first, second = tracker.update(scene((200, 60)), [(200, 60, 80, 80)], now=0.1)
+    assert first is track and track.misses == 1
+    assert second.id != track.id
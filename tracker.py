@@ -0,0 +1,195 @@
+import itertools
+from collections import Counter, deque
+import cv2
+import numpy as np
+
+
+def iou(a, b):
+    """Intersection over union of two (x, y, w, h) boxes"""
+    ax, ay, aw, ah = a
+    bx, by, bw, bh = b
+    iw = min(ax + aw, bx + bw) - max(ax, bx)
+    ih = min(ay + ah, by + bh) - max(ay, by)
+    if iw <= 0 or ih <= 0:
+        return 0.0
+    inter = iw * ih
+    return inter / float(aw * ah + bw * bh - inter)
+
+
+class IdentityVoter:
+    """Fuses the LBPH results of one track over a sliding window.
+
+    Every result votes for its id when the distance is below `threshold`
+    and for "unknown" otherwise. An identity is committed once it has at
+    least `min_votes` votes and leads the runner-up by `margin`; its
+    distance is the mean of the winning votes.
+    """
+
+    UNKNOWN = None
+
+    def __init__(self, window=7, threshold=65, min_votes=3, margin=2):
+        self.window = deque(maxlen=window)
+        self.threshold = threshold
+        self.min_votes = min_votes
+        self.margin = margin
+
+    def add(self, id_, distance):
+        vote = id_ if id_ is not None and distance < self.threshold else self.UNKNOWN
+        self.window.append((vote, distance))
+
+    def reset(self):
+        self.window.clear()
+
+    def decision(self):
+        """Committed (id, distance), (None, distance) for unknown, or None"""
+        counts = Counter(vote for vote, _ in self.window).most_common()
+        if not counts:
+            return None
+        winner, votes = counts[0]
+        runner_up = counts[1][1] if len(counts) > 1 else 0
+        if votes < self.min_votes or votes - runner_up < self.margin:
+            return None
+        distances = [d for vote, d in self.window if vote == winner]
+        return winner, float(sum(distances) / len(distances))
+
+
+class Track:
+    """One followed face with its own recognized identity"""
+
+    def __init__(self, track_id, box, now):
+        self.id = track_id
+        self.box = box
+        self.created_at = now
+        self.last_seen = now
+        self.misses = 0
+        self.points = None
+        self.voter = IdentityVoter()
+        self.identity = (None, 100)
+        self.confirmed = False
+        self.identified_at = None
+
+    def add_result(self, identity, now):
+        """Feed one LBPH result, commits the identity when the vote is clear"""
+        self.voter.add(*identity)
+        self.identified_at = now
+        decision = self.voter.decision()
+        if decision is not None:
+            self.identity = decision
+            self.confirmed = True
+            self.voter.reset()
+
+
+class FaceTracker:
+    """Keeps stable track IDs for faces between cascade detections.
+
+    update() associates fresh detections with existing tracks by IoU and
+    starts tracks for unmatched detections. predict() moves every track
+    on frames without detection using the median Lucas-Kanade optical flow
+    of corner points inside the box. Tracks that are not matched or lose
+    their points for more than `max_misses` updates are dropped.
+    """
+
+    def __init__(self, iou_threshold=0.3, max_misses=3, vote_interval=0.1,
+                 unknown_refresh=2.0, min_points=4):
+        self.iou_threshold = iou_threshold
+        self.max_misses = max_misses
+        self.vote_interval = vote_interval
+        self.unknown_refresh = unknown_refresh
+        self.min_points = min_points
+        self.tracks = []
+        self.prev_gray = None
+        self._ids = itertools.count(1)
+
+    def reset(self):
+        self.tracks = []
+        self.prev_gray = None
+
+    def update(self, gray, detections, now):
+        """Associate cascade detections (x, y, w, h) with the current tracks"""
+        detections = [tuple(int(v) for v in box) for box in detections]
+        pairs = sorted(
+            ((iou(track.box, box), t, d)
+             for t, track in enumerate(self.tracks)
+             for d, box in enumerate(detections)),
+            reverse=True)
+
+        matched_tracks, matched_detections = set(), set()
+        for overlap, t, d in pairs:
+            if overlap < self.iou_threshold:
+                break
+            if t in matched_tracks or d in matched_detections:
+                continue
+            track = self.tracks[t]
+            track.box = detections[d]
+            track.last_seen = now
+            track.misses = 0
+            matched_tracks.add(t)
+            matched_detections.add(d)
+
+        for t, track in enumerate(self.tracks):
+            if t not in matched_tracks:
+                track.misses += 1
+        for d, box in enumerate(detections):
+            if d not in matched_detections:
+                self.tracks.append(Track(next(self._ids), box, now))
+
+        self.tracks = [t for t in self.tracks if t.misses <= self.max_misses]
+        for track in self.tracks:
+            track.points = self._seed_points(gray, track.box)
+        self.prev_gray = gray
+        return self.tracks
+
+    def predict(self, gray, now):
+        """Move the tracks to the current frame with optical flow"""
+        if self.prev_gray is None or self.prev_gray.shape != gray.shape:
+            self.prev_gray = gray
+            return self.tracks
+
+        h_img, w_img = gray.shape[:2]
+        for track in self.tracks:
+            if track.points is None or len(track.points) < self.min_points:
+                track.misses += 1
+                continue
+            new_points, status, _ = cv2.calcOpticalFlowPyrLK(
+                self.prev_gray, gray, track.points, None, winSize=(15, 15), maxLevel=2)
+            good = status.ravel() == 1
+            if good.sum() < self.min_points:
+                track.misses += 1
+                track.points = None
+                continue
+            dx, dy = np.median(new_points[good] - track.points[good], axis=0).ravel()
+            x, y, w, h = track.box
+            x = int(round(min(max(x + dx, 0), w_img - w)))
+            y = int(round(min(max(y + dy, 0), h_img - h)))
+            track.box = (x, y, w, h)
+            track.points = new_points[good].reshape(-1, 1, 2)
+            track.last_seen = now
+
+        self.tracks = [t for t in self.tracks if t.misses <= self.max_misses]
+        self.prev_gray = gray
+        return self.tracks
+
+    def pending_identification(self, now):
+        """Tracks that need another LBPH vote.
+
+        Unconfirmed tracks are sampled every `vote_interval` seconds. A track
+        confirmed as an employee is never recognized again until it is lost;
+        one confirmed as unknown is re-checked after `unknown_refresh`.
+        """
+        pending = []
+        for track in self.tracks:
+            if track.confirmed:
+                if track.identity[0] is not None or now - track.identified_at < self.unknown_refresh:
+                    continue
+                track.confirmed = False
+            if track.identified_at is None or now - track.identified_at >= self.vote_interval:
+                pending.append(track)
+        return pending
+
+    def _seed_points(self, gray, box):
+        x, y, w, h = box
+        mask = np.zeros(gray.shape[:2], dtype=np.uint8)
+        # Inner part of the box, avoids background corners
+        mask[y + h // 5:y + h - h // 5, x + w // 5:x + w - w // 5] = 255
+        return cv2.goodFeaturesToTrack(gray, maxCorners=30, qualityLevel=0.01,
+                                       minDistance=5, mask=mask)
@@ -0,0 +1,128 @@
+import threading
+import cv2
+import numpy as np
+
+
+class FrameWorker(threading.Thread):
+    """Base for helpers that process the newest frame at their own rate.
+
+    Every `interval` seconds the worker leases the newest frame of the
+    FrameBuffer and calls process(). A dict returned by process() becomes
+    the new snapshot; consumers read it with snapshot(), which never waits
+    for the worker.
+    """
+
+    def __init__(self, frame_buffer, interval, snapshot):
+        super().__init__(daemon=True)
+        self.frame_buffer = frame_buffer
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._snapshot = snapshot
+
+    def snapshot(self):
+        with self._lock:
+            return dict(self._snapshot)
+
+    def enabled(self):
+        return True
+
+    def process(self, packet):
+        raise NotImplementedError
+
+    def run(self):
+        if not self.enabled():
+            return
+        last_seq = 0
+        while not self._stop_event.is_set():
+            packet = self.frame_buffer.acquire(last_seq, timeout=0.5)
+            if packet is None:
+                if self.frame_buffer.closed:
+                    break
+                continue
+            try:
+                last_seq = packet.seq
+                snapshot = self.process(packet)
+            finally:
+                self.frame_buffer.release(packet)
+            if snapshot is not None:
+                with self._lock:
+                    self._snapshot = snapshot
+            self._stop_event.wait(self.interval)
+
+    def stop(self):
+        self._stop_event.set()
+        if self.is_alive():
+            self.join()
+
+
+class ObjectDetectionWorker(FrameWorker):
+    """Runs MobileNetSSD on its own cadence, away from the face pipeline.
+
+    The newest frame is compared with the one of the last inference through
+    a small blurred thumbnail. The network only runs when more than
+    `motion_threshold` of the thumbnail changed, or when the cached result
+    is older than `max_age` seconds. snapshot() returns
+    {"timestamp", "seq", "objects"}.
+    """
+
+    def __init__(self, engine, frame_buffer, interval=1.0, motion_threshold=0.02,
+                 pixel_threshold=25, max_age=10.0):
+        super().__init__(frame_buffer, interval, {"timestamp": 0.0, "seq": 0, "objects": []})
+        self.engine = engine
+        self.motion_threshold = motion_threshold
+        self.pixel_threshold = pixel_threshold
+        self.max_age = max_age
+        self._reference = None
+        self._reference_time = 0.0
+        self.runs = 0
+        self.skipped = 0
+
+    def enabled(self):
+        return self.engine.net is not None
+
+    def process(self, packet):
+        thumb = self._thumbnail(packet.image)
+        stale = packet.timestamp - self._reference_time > self.max_age
+        if self._reference is not None and not stale and not self._moved(self._reference, thumb):
+            self.skipped += 1
+            return None
+        objects = self.engine.detect_objects(packet.image)
+        self._reference = thumb
+        self._reference_time = packet.timestamp
+        self.runs += 1
+        return {"timestamp": packet.timestamp, "seq": packet.seq, "objects": objects}
+
+    def _thumbnail(self, frame):
+        gray = cv2.cvtColor(cv2.resize(frame, (80, 60), interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gray, (5, 5), 0)
+
+    def _moved(self, reference, thumb):
+        changed = np.count_nonzero(cv2.absdiff(reference, thumb) > self.pixel_threshold)
+        return changed > self.motion_threshold * thumb.size
+
+
+class FaceMeshWorker(FrameWorker):
+    """Runs MediaPipe Face Mesh at `rate` Hz and caches the landmarks.
+
+    snapshot() returns {"timestamp", "seq", "landmarks", "points"}, where
+    `landmarks` are the MediaPipe results (for FaceEngine.draw_landmarks)
+    and `points` one (N, 2) float32 array of pixel coordinates per face,
+    ready to be reused by other stages.
+    """
+
+    def __init__(self, engine, frame_buffer, rate=10.0):
+        super().__init__(frame_buffer, 1.0 / rate,
+                         {"timestamp": 0.0, "seq": 0, "landmarks": [], "points": []})
+        self.engine = engine
+
+    def enabled(self):
+        return self.engine.face_mesh is not None
+
+    def process(self, packet):
+        landmarks = self.engine.face_landmarks(packet.image)
+        h, w = packet.image.shape[:2]
+        points = [np.array([(lm.x * w, lm.y * h) for lm in face.landmark], dtype=np.float32)
+                  for face in landmarks]
+        return {"timestamp": packet.timestamp, "seq": packet.seq,
+                "landmarks": landmarks, "points": points}